@@ -1,12 +1,31 @@
 import streamlit as st
-import pandas as pd
-from datetime import date
-from fpdf import FPDF
-import base64
+import os
+
+# Prima del login solo streamlit e metriche: pandas, numpy, motori e fpdf si
+# caricano dopo l'autenticazione (vedi IMPORT DELL'APP), così il primo render
+# della pagina di login dopo un avvio a freddo non li aspetta.
+import metriche
+from metriche import cronometra, misura
+
+metriche.avvia_scrittura_periodica()        # solo con SIMULATORE_PROMETHEUS_FILE
 
 # --- 1. CONFIGURAZIONE PAGINA ---
 st.set_page_config(page_title="Studio Gaetani | Sport Advisor", page_icon="🏅", layout="wide")
 
+CARTELLA_STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+@st.cache_resource
+def _asset(nome: str) -> str:
+    """Contenuto di un file in static/ (letto una volta per processo)."""
+    with open(os.path.join(CARTELLA_STATIC, nome), encoding="utf-8") as f:
+        return f.read()
+
+
+def _stile(nome: str) -> None:
+    st.markdown(f"<style>\n{_asset(nome)}</style>", unsafe_allow_html=True)
+
+
 # --- 2. GESTIONE LOGIN ---
 def check_password():
     """Gestisce il login."""
@@ -14,21 +33,14 @@ def check_password():
         if st.session_state["username"] in st.secrets["passwords"] and \
            st.session_state["password"] == st.secrets["passwords"][st.session_state["username"]]:
             st.session_state["password_correct"] = True
+            st.session_state["utente"] = st.session_state["username"]
             del st.session_state["password"]
             del st.session_state["username"]
         else:
             st.session_state["password_correct"] = False
 
     if "password_correct" not in st.session_state:
-        st.markdown("""
-        <style>
-        .stApp {background: linear-gradient(180deg, #001529 0%, #001e3c 100%);}
-        h1, h3 {color: white; text-align: center; font-family: 'Helvetica Neue', sans-serif;}
-        .stTextInput > label {color: #D4AF37 !important; font-weight: bold;}
-        .stButton > button {background-color: #D4AF37; color: #001529; width: 100%; font-weight: bold; border: none;}
-        #MainMenu, header, footer {visibility: hidden;}
-        </style>
-        """, unsafe_allow_html=True)
+        _stile("login.css")
         col1, col2, col3 = st.columns([1,2,1])
         with col2:
             st.markdown("<h1 style='font-size: 60px; text-align:center;'>🏅</h1>", unsafe_allow_html=True)
@@ -47,7 +59,9 @@ def check_password():
     else:
         return True
 
-if not check_password():
+with misura("pagina.login"):
+    autenticato = check_password()
+if not autenticato:
     st.stop()
 
 # ==============================================================================
@@ -55,348 +69,212 @@ if not check_password():
 # ==============================================================================
 
 # ─────────────────────────────────────────────────────────────────────────────
-# PARAMETRI CONFIGURABILI
-# Aggiornare SOLO questo dizionario a ogni variazione normativa annuale.
-# Fonti: D.Lgs. 36/2021; INPS Circ. 27/2025; AdE CG 14/2025; L. 190/2014
+# IMPORT DELL'APP (dopo il login; nei rerun sono già in sys.modules)
 # ─────────────────────────────────────────────────────────────────────────────
-PARAMS = {
-    # ── SOGLIE (art. 36 c.6 e art. 35 c.8-bis D.Lgs. 36/2021) ─────────────
-    "soglia_fiscale":        15_000.0,   # No-tax area fiscale (multi-committente, anno solare)
-    "soglia_prev":            5_000.0,   # Franchigia previdenziale INPS
-    "soglia_forfettario":    85_000.0,   # Max ricavi regime forfettario (L. 190/2014)
-
-    # ── RIDUZIONE IVS (art. 35 c.8-ter D.Lgs. 36/2021) ─────────────────────
-    # ATTENZIONE: scade il 31/12/2027. Verificare rinnovo.
-    "riduzione_ivs":          0.50,
-    "scadenza_riduzione_ivs": date(2027, 12, 31),
-
-    # ── ALIQUOTE PREVIDENZIALI GS (INPS Circ. 27/2025) ──────────────────────
-    # Co.co.co. sportivo non assicurato altrove:
-    #   IVS 25% applicata su BIC_IVS (= BIC_lorda × 50%)
-    #   Aggiuntive 2,03% (DIS-COLL 1,31% + maternità 0,50% + malattia 0,22%)
-    #   applicate sull'INTERA BIC_lorda (NO riduzione 50%)
-    "aliq_ivs_cococo":        0.25,
-    "aliq_add_cococo":        0.0203,
-    "quota_lav_cococo":       1/3,        # Ripartizione: 1/3 lavoratore, 2/3 committente
-    # Co.co.co. già assicurato/pensionato: IVS 24%
-    "aliq_ivs_cococo_assicurato": 0.24,
-
-    # Autonomo P.IVA sportivo non assicurato altrove:
-    #   IVS 25% su BIC_IVS (= BIC_lorda × 50%)
-    #   Aggiuntive 1,07% (malattia 0,22% + maternità 0,50% + ISCRO 0,35%)
-    #   applicate sull'INTERA BIC_lorda (NO riduzione 50%)
-    "aliq_ivs_piva":          0.25,
-    "aliq_add_piva":          0.0107,
-
-    # Massimale / minimale GS 2025 (INPS Circ. 27/2025)
-    "massimale_gs":         120_607.0,
-    "minimale_gs":           18_555.0,
-
-    # ── FISCO FORFETTARIO (L. 190/2014; AdE CG 14/2025) ─────────────────────
-    # NOTA AdE CG 14/2025: il coefficiente si applica ai compensi AL NETTO dei
-    # 15.000 € di esenzione, non all'intero fatturato.
-    # Formula corretta: reddito_lordo = (fatturato - soglia_fiscale) × coeff_redd
-    "coeff_redditivita":      0.78,       # ATECO 85.51.09 (ex 85.51.00)
-    "aliq_forfettario_ord":   0.15,       # Regime ordinario (> 5 anni)
-    "aliq_forfettario_new":   0.05,       # Nuova attività (primi 5 anni)
-
-    # ── IRPEF ORDINARIA – Scaglioni 2025 (TUIR art. 11, L. Bilancio 2025) ───
-    # Lista di tuple: (limite_superiore, aliquota)
-    # ultimo scaglione: limite = None (illimitato)
-    "scaglioni_irpef": [
-        (28_000.0, 0.23),
-        (50_000.0, 0.35),
-        (None,     0.43),
-    ],
-
-    # ── RITENUTA D'ACCONTO (art. 25 DPR 600/1973) ───────────────────────────
-    "aliq_ritenuta_acconto":  0.20,       # Applicata dal committente sull'eccedenza 15k
-}
-
-# ─────────────────────────────────────────────────────────────────────────────
-# UTILITY: IRPEF progressiva a scaglioni
-# ─────────────────────────────────────────────────────────────────────────────
-def calcola_irpef(imponibile: float) -> float:
-    """
-    Calcola IRPEF lorda applicando gli scaglioni progressivi configurati.
-    Fonte: TUIR art. 11, aggiornato L. Bilancio 2025.
-    """
-    if imponibile <= 0:
-        return 0.0
-    imposta = 0.0
-    prev = 0.0
-    for limite, aliq in PARAMS["scaglioni_irpef"]:
-        if limite is None:
-            imposta += (imponibile - prev) * aliq
-            break
-        fascia = min(imponibile, limite) - prev
-        if fascia <= 0:
-            break
-        imposta += fascia * aliq
-        prev = limite
-        if imponibile <= limite:
-            break
-    return round(imposta, 2)
-
-# ─────────────────────────────────────────────────────────────────────────────
-# UTILITY: warning scadenza riduzione IVS
-# ─────────────────────────────────────────────────────────────────────────────
-def check_riduzione_ivs_attiva() -> bool:
-    """
-    Restituisce True se la riduzione 50% IVS è ancora in vigore.
-    Art. 35 c. 8-ter D.Lgs. 36/2021: valida fino al 31/12/2027.
-    """
-    return date.today() <= PARAMS["scadenza_riduzione_ivs"]
+import base64  # noqa: E402
+import io  # noqa: E402
+import sqlite3  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from datetime import date  # noqa: E402
+from uuid import uuid4  # noqa: E402
+
+import pandas as pd  # noqa: E402
+
+from archivio import DIMENSIONE_PAGINA, Archivio  # noqa: E402
+from lavori import GestoreLavori, LavoroAnnullato, TroppiLavori  # noqa: E402
+from motore import PARAMS, check_riduzione_ivs_attiva  # noqa: E402
+from parametri import anni_disponibili, anno_corrente, parametri  # noqa: E402
+from cache import (  # noqa: E402
+    CACHE, calcoli_avanzati_piva, calcolo_inverso_piva, calcola_cococo, calcolo_inverso_cococo,
+)
+from roster import elabora_roster, leggi_rosa  # noqa: E402
+from paghe import elabora_paghe, leggi_pagamenti  # noqa: E402
+from ottimizzatore import ottimizza_rosa  # noqa: E402
+from griglia import DIMENSIONI, VALORI_GRIGLIA, griglia_whatif, importi_griglia, pivot  # noqa: E402
+from confronto import METRICHE, grafico_confronto, punti_griglia, punti_incrocio  # noqa: E402
+from simulazione import (  # noqa: E402
+    DISTRIBUZIONI, Committente, istogramma, riepilogo_simulazione, simula,
+)
 
-# ─────────────────────────────────────────────────────────────────────────────
-# MOTORE DI CALCOLO P.IVA FORFETTARIA (CORRETTO)
-# ─────────────────────────────────────────────────────────────────────────────
-def calcoli_avanzati_piva(compenso_base: float, apply_rivalsa: bool,
-                          apply_bollo: bool, aliquota_imp: float) -> dict:
-    """
-    Calcola il netto P.IVA forfettaria sportiva applicando la normativa corretta.
-
-    CORREZIONI rispetto alla versione precedente:
-    ──────────────────────────────────────────────
-    BUG #1 – Imponibile forfettario (AdE CG 14/2025):
-        VECCHIO: reddito_forf = fatturato × 0.78 → imponibile = reddito_forf - INPS - 15.000
-        CORRETTO: componenti_pos = fatturato - 15.000 → reddito_forf = componenti_pos × 0.78
-                  imponibile = reddito_forf - INPS
-        Il vecchio metodo applicava il coeff. 78% anche sulla franchigia €15.000,
-        producendo un imponibile fiscale più basso (tasse sottostimate di ~€2.500 su €30k).
-
-    BUG #2 – Calcolo INPS (art. 35 c.8-ter D.Lgs. 36/2021):
-        VECCHIO: inps = (BIC_lorda × 50%) × 26.07%
-                 → sbagliato: le aggiuntive (1,07%) beneficiavano della riduzione 50%
-        CORRETTO: contrib_IVS  = (BIC_lorda × 50%) × 25%      [IVS: riduzione applicata]
-                  contrib_add  = BIC_lorda          × 1,07%    [aggiuntive: NO riduzione]
-                  inps_totale  = contrib_IVS + contrib_add
-    """
-    riduzione_attiva = check_riduzione_ivs_attiva()
-    riduzione = PARAMS["riduzione_ivs"] if riduzione_attiva else 1.0
 
-    # A. FATTURATO LORDO (Compenso + eventuale rivalsa 4%)
-    rivalsa_val = compenso_base * 0.04 if apply_rivalsa else 0.0
-    fatturato_lordo = compenso_base + rivalsa_val
+@st.cache_resource
+def _archivio() -> Archivio:
+    """Archivio SQLite dei calcoli (uno per processo, connessioni per thread)."""
+    return Archivio()
 
-    # B. CALCOLO INPS – BASE PREVIDENZIALE
-    # BIC_lorda = fatturato lordo − franchigia previdenziale €5.000 (art. 35 c.8-bis)
-    BIC_lorda = max(0.0, fatturato_lordo - PARAMS["soglia_prev"])
-    BIC_IVS   = BIC_lorda * riduzione                              # 50% fino al 2027
 
-    contrib_IVS = BIC_IVS   * PARAMS["aliq_ivs_piva"]             # 25% su BIC ridotta
-    contrib_add = BIC_lorda * PARAMS["aliq_add_piva"]             # 1,07% su BIC intera
-    inps_totale = contrib_IVS + contrib_add                        # 100% a carico autonomo
+def _archivia(regime: str, tipo: str, ingresso: dict, risultato, anno: int) -> None:
+    """Salva un calcolo nell'archivio per il cliente indicato nella barra laterale."""
+    try:
+        _archivio().registra(regime, tipo, ingresso, risultato, anno=anno,
+                             cliente=st.session_state.get("cliente", "").strip(),
+                             utente=st.session_state.get("utente", ""))
+    except sqlite3.Error as e:
+        st.toast(f"Calcolo non archiviato: {e}", icon="⚠️")
 
-    # C. CALCOLO REDDITO FORFETTARIO (FISCO)
-    # AdE CG 14/2025: coeff. 78% sui compensi AL NETTO della franchigia fiscale €15.000
-    componenti_pos    = max(0.0, fatturato_lordo - PARAMS["soglia_fiscale"])
-    reddito_forfett   = componenti_pos * PARAMS["coeff_redditivita"]
 
-    # D. IMPONIBILE FISCALE: reddito forfettario − INPS versata
-    imponibile_fiscale = max(0.0, reddito_forfett - inps_totale)
-    tasse = imponibile_fiscale * aliquota_imp
+def _euro(valore, decimali: int = 2) -> str:
+    """Importo da tabella: migliaia con la virgola, segno meno tipografico, vuoto se NaN."""
+    if pd.isna(valore):
+        return ""
+    testo = f"{abs(valore):,.{decimali}f}"
+    return f"−{testo}" if valore < 0 else testo
 
-    # E. NETTO LAVORATORE
-    bollo_val = 2.0 if apply_bollo and fatturato_lordo > 77.47 else 0.0
-    netto = fatturato_lordo - inps_totale - tasse
 
-    return {
-        "compenso":         compenso_base,
-        "rivalsa":          rivalsa_val,
-        "fatturato":        fatturato_lordo,
-        "BIC_lorda":        BIC_lorda,
-        "BIC_IVS":          BIC_IVS,
-        "contrib_IVS":      contrib_IVS,
-        "contrib_add":      contrib_add,
-        "inps":             inps_totale,
-        "componenti_pos":   componenti_pos,
-        "reddito_forf":     reddito_forfett,
-        "imponibile_forf":  imponibile_fiscale,
-        "tasse":            tasse,
-        "bollo":            bollo_val,
-        "netto":            netto,
-        "riduzione_attiva": riduzione_attiva,
-    }
+def _percentuale(valore: float) -> str:
+    """Aliquota in percentuale all'italiana, senza decimali superflui (0.0107 → "1,07%")."""
+    return f"{valore * 100:.2f}".rstrip("0").rstrip(".").replace(".", ",") + "%"
 
-# ─────────────────────────────────────────────────────────────────────────────
-# CALCOLO INVERSO P.IVA (binary search – logica invariata, usa funzione corretta)
-# ─────────────────────────────────────────────────────────────────────────────
-def calcolo_inverso_piva(netto_target: float, apply_rivalsa: bool,
-                         apply_bollo: bool, aliquota_imp: float) -> dict:
-    """Reverse engineering con Binary Search."""
-    low, high = 0.0, netto_target * 2.5
-    for _ in range(100):
-        mid = (low + high) / 2
-        res = calcoli_avanzati_piva(mid, apply_rivalsa, apply_bollo, aliquota_imp)
-        diff = res["netto"] - netto_target
-        if abs(diff) < 0.01:
-            return res
-        elif diff > 0:
-            high = mid
-        else:
-            low = mid
-    return calcoli_avanzati_piva(high, apply_rivalsa, apply_bollo, aliquota_imp)
 
-# ─────────────────────────────────────────────────────────────────────────────
-# MOTORE DI CALCOLO CO.CO.CO. (CORRETTO)
-# ─────────────────────────────────────────────────────────────────────────────
-def calcola_cococo(lordo: float, gia_assicurato: bool = False) -> dict:
+def _tabella_importi(df: pd.DataFrame, decimali: int = 2):
     """
-    Calcola il netto co.co.co. sportivo dilettantistico con normativa corretta.
+    Tabella numerica formattata al momento della visualizzazione.
 
-    CORREZIONI rispetto alla versione precedente:
-    ──────────────────────────────────────────────
-    BUG #3 – Aliquota INPS co.co.co. incompleta:
-        VECCHIO: aliquota_inps_tot = 25% applicata su BIC_IVS (50% di BIC_lorda)
-                 → mancavano le aliquote aggiuntive DIS-COLL + malattia + maternità (2,03%)
-        CORRETTO: contrib_IVS = BIC_IVS   × 25%    [solo IVS beneficia della riduzione 50%]
-                  contrib_add = BIC_lorda × 2,03%   [aggiuntive su base intera]
-
-    BUG #4 – IRPEF flat 23%:
-        VECCHIO: irpef = imponibile × 0.23 (scaglione unico)
-        CORRETTO: scaglioni progressivi 23% / 35% / 43% (TUIR art.11, L. Bilancio 2025)
-
-    AGGIUNTO: costo_committente = lordo + quota_committente_INPS (2/3 dei contributi totali)
+    In session_state restano i valori (float, NaN per le righe separatore);
+    le stringhe esistono solo nello Styler passato a st.table.
     """
-    riduzione_attiva = check_riduzione_ivs_attiva()
-    riduzione = PARAMS["riduzione_ivs"] if riduzione_attiva else 1.0
-
-    aliq_ivs = (PARAMS["aliq_ivs_cococo_assicurato"] if gia_assicurato
-                else PARAMS["aliq_ivs_cococo"])
-
-    # B. CALCOLO INPS
-    BIC_lorda = max(0.0, lordo - PARAMS["soglia_prev"])
-    BIC_IVS   = BIC_lorda * riduzione                     # 50% fino al 2027
+    return df.style.format(lambda v: _euro(v, decimali))
 
-    contrib_IVS = BIC_IVS   * aliq_ivs                   # 25% (o 24%) su BIC ridotta
-    contrib_add = BIC_lorda * PARAMS["aliq_add_cococo"]  # 2,03% su BIC intera
-    contrib_tot  = contrib_IVS + contrib_add
-
-    quota_lav   = contrib_tot * PARAMS["quota_lav_cococo"]   # 1/3 lavoratore
-    quota_comm  = contrib_tot * (1 - PARAMS["quota_lav_cococo"])  # 2/3 committente
-
-    # C. CALCOLO FISCALE
-    # Soglia €15.000 sul lordo + deduzione INPS quota lavoratore (art. 10 TUIR)
-    imponibile_irpef = max(0.0, lordo - PARAMS["soglia_fiscale"] - quota_lav)
-    ritenuta_acconto = max(0.0, lordo - PARAMS["soglia_fiscale"]) * PARAMS["aliq_ritenuta_acconto"]
-    irpef_lorda      = calcola_irpef(imponibile_irpef)
-    saldo_irpef      = max(0.0, irpef_lorda - ritenuta_acconto)
-
-    # D. NETTO E COSTO COMMITTENTE
-    netto            = lordo - quota_lav - irpef_lorda
-    costo_committente = lordo + quota_comm
 
+# ─────────────────────────────────────────────────────────────────────────────
+# LAVORI IN BACKGROUND (lavori.py)
+# ─────────────────────────────────────────────────────────────────────────────
+@st.cache_resource
+def _gestore_lavori() -> GestoreLavori:
+    """Tabella dei lavori e pool che li esegue (uno per processo server, condiviso tra le sessioni)."""
+    return GestoreLavori()
+
+
+def _avvia_lavoro(chiave: str, tipo: str, funzione, *args, descrizione: str = "", **kwargs) -> None:
+    """Avvia un lavoro e ne tiene l'id in session_state[f"lavoro_{chiave}"]."""
+    utente = st.session_state.get("utente") or st.session_state.setdefault("id_sessione", uuid4().hex)
+    try:
+        lavoro = _gestore_lavori().avvia(tipo, funzione, *args, utente=utente,
+                                         descrizione=descrizione, **kwargs)
+    except TroppiLavori as e:
+        st.warning(f"⏳ {e}")
+        return
+    st.session_state[f"lavoro_{chiave}"] = lavoro.id
+
+
+def _lavoro_attivo(chiave: str) -> bool:
+    lavoro = _gestore_lavori().lavoro(st.session_state.get(f"lavoro_{chiave}"))
+    return lavoro is not None and lavoro.attivo
+
+
+def _lavoro_concluso(chiave: str):
+    """Il lavoro della sessione per `chiave`, se è appena finito (restituito una sola volta)."""
+    id_lavoro = st.session_state.get(f"lavoro_{chiave}")
+    if id_lavoro is None:
+        return None
+    lavoro = _gestore_lavori().lavoro(id_lavoro)
+    if lavoro is not None and lavoro.attivo:
+        return None
+    del st.session_state[f"lavoro_{chiave}"]
+    return lavoro                                   # None se scaduto dalla tabella
+
+
+@st.fragment(run_every=1.0)
+def _avanzamento_lavoro(chiave: str, etichetta: str) -> None:
+    """Barra di avanzamento del lavoro in corso, aggiornata ogni secondo, con il pulsante Annulla."""
+    gestore = _gestore_lavori()
+    lavoro = gestore.lavoro(st.session_state.get(f"lavoro_{chiave}"))
+    if lavoro is None or not lavoro.attivo:
+        st.rerun()                                  # la tab legge il risultato
+    if lavoro.stato == "in coda":
+        davanti = gestore.davanti(lavoro)
+        testo = f"{etichetta}: in coda" + (f" ({davanti} lavori prima)" if davanti else "") + "…"
+    else:
+        testo = f"{etichetta}… {lavoro.avanzamento:.0%} ({lavoro.durata:.0f} s)"
+    c1, c2 = st.columns([5, 1])
+    c1.progress(lavoro.avanzamento, text=testo)
+    c2.button("Annulla", key=f"annulla_{chiave}", on_click=lavoro.annulla,
+              disabled=lavoro.annullato)
+
+
+def _lavoro_roster(avanzamento, contenuto: bytes, nome: str, **opzioni) -> dict:
+    """Elabora il roster in un CSV temporaneo; il parziale è il CSV scritto fin lì."""
+    sorgente = io.BytesIO(contenuto)
+    sorgente.size = len(contenuto)
+    uscita = tempfile.NamedTemporaryFile("w", suffix=".csv", newline="",
+                                         encoding="utf-8", delete=False)
+    risultato = {"percorso": uscita.name, "nome": nome, "totali": None}
+    try:
+        with uscita:
+            avanzamento(0.0, risultato)
+            risultato["totali"] = elabora_roster(
+                sorgente, nome, uscita, on_progress=lambda f: avanzamento(f, risultato), **opzioni)
+    except LavoroAnnullato:
+        raise                                       # il CSV parziale resta per lo scaricamento
+    except Exception:
+        os.remove(uscita.name)
+        raise
+    return risultato
+
+
+def _totali_roster(percorso: str) -> dict:
+    """Totali di un CSV di roster (per i risultati parziali di un lavoro annullato)."""
+    colonne = ["regime", "netto", "costo_committente", "fuori_forfettario"]
+    try:
+        out = pd.read_csv(percorso, usecols=colonne)
+    except pd.errors.EmptyDataError:                # annullato prima dell'intestazione
+        out = pd.DataFrame(columns=colonne)
+    cococo = int((out["regime"] == "cococo").sum())
+    return {"righe": len(out), "piva": len(out) - cococo, "cococo": cococo,
+            "netto": float(out["netto"].sum()),
+            "costo_committente": float(out["costo_committente"].sum()),
+            "fuori_forfettario": int(out["fuori_forfettario"].astype(bool).sum())}
+
+
+def _lavoro_fatture(avanzamento, record: list) -> dict:
+    """ZIP di fatture in un file temporaneo; il parziale conta i PDF già scritti."""
+    from fattura import genera_fatture_zip
+    uscita = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+    risultato = {"percorso": uscita.name, "n": 0}
+
+    def _progresso(frazione):
+        risultato["n"] = round(frazione * len(record))
+        avanzamento(frazione, risultato)
+
+    try:
+        with uscita:
+            avanzamento(0.0, risultato)
+            risultato["n"] = genera_fatture_zip(record, uscita, on_progress=_progresso)
+    except LavoroAnnullato:
+        raise                                       # lo ZIP si chiude con i PDF già aggiunti
+    except Exception:
+        os.remove(uscita.name)
+        raise
+    return risultato
+
+
+def _lavoro_simulazione(avanzamento, committenti, scenari, aliquota_imp, gia_assicurato,
+                        anno, seme) -> dict:
+    """Simulazione Monte Carlo ridotta a ciò che la tab mostra (senza i netti per scenario)."""
+    ris = simula(committenti, scenari, aliquota_imp, gia_assicurato, anno=anno, seme=seme,
+                 on_progress=avanzamento)
     return {
-        "lordo":              lordo,
-        "BIC_lorda":          BIC_lorda,
-        "BIC_IVS":            BIC_IVS,
-        "contrib_IVS":        contrib_IVS,
-        "contrib_add":        contrib_add,
-        "contrib_tot":        contrib_tot,
-        "quota_lav":          quota_lav,
-        "quota_comm":         quota_comm,
-        "imponibile_irpef":   imponibile_irpef,
-        "ritenuta_acconto":   ritenuta_acconto,
-        "irpef_lorda":        irpef_lorda,
-        "saldo_irpef":        saldo_irpef,
-        "netto":              netto,
-        "costo_committente":  costo_committente,
-        "riduzione_attiva":   riduzione_attiva,
+        "riepilogo": riepilogo_simulazione(ris),
+        "istogramma": istogramma(ris),
+        "committenti": ris["committenti"],
+        "prob_sopra_soglia": ris["prob_sopra_soglia"],
+        "prob_piva_migliore": ris["prob_piva_migliore"],
+        "scenari": ris["scenari"], "seme": ris["seme"],
     }
 
-# ─────────────────────────────────────────────────────────────────────────────
-# FUNZIONE PDF (invariata – solo aggiornato testo note legali)
-# ─────────────────────────────────────────────────────────────────────────────
-def create_pdf(dati):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="FATTURA PRO-FORMA / NOTA DI COMPETENZA", ln=1, align='C')
-    pdf.line(10, 25, 200, 25)
-    pdf.ln(10)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(95, 10, txt="FORNITORE (Emittente):", border=0)
-    pdf.cell(95, 10, txt="CLIENTE (Destinatario):", border=0, ln=1)
-    pdf.set_font("Arial", '', 10)
-    y_start = pdf.get_y()
-    pdf.multi_cell(95, 5, txt=dati['mittente'])
-    y_end_left = pdf.get_y()
-    pdf.set_xy(105, y_start)
-    pdf.multi_cell(95, 5, txt=dati['destinatario'])
-    y_end_right = pdf.get_y()
-    pdf.set_xy(10, max(y_end_left, y_end_right) + 10)
-    pdf.set_fill_color(240, 240, 240)
-    pdf.cell(200, 8, txt=f"Documento n. {dati['numero']} del {dati['data']}", ln=1, fill=True)
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(130, 8, txt="Descrizione", border=1)
-    pdf.cell(60, 8, txt="Importo", border=1, align='R', ln=1)
-    pdf.set_font("Arial", '', 10)
-    pdf.cell(130, 8, txt=dati['descrizione'], border=1)
-    pdf.cell(60, 8, txt=f"EUR {dati['compenso']:,.2f}", border=1, align='R', ln=1)
-    if dati['rivalsa'] > 0:
-        pdf.cell(130, 8, txt="Rivalsa INPS 4% (L. 662/96)", border=1)
-        pdf.cell(60, 8, txt=f"EUR {dati['rivalsa']:,.2f}", border=1, align='R', ln=1)
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(130, 8, txt="TOTALE LORDO", border=0, align='R')
-    pdf.cell(60, 8, txt=f"EUR {dati['totale_lordo']:,.2f}", border=1, align='R', ln=1)
-    if dati['bollo'] > 0:
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(130, 8, txt="Bollo (Art. 15 DPR 633/72)", border=0, align='R')
-        pdf.cell(60, 8, txt=f"EUR {dati['bollo']:,.2f}", border=0, align='R', ln=1)
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(130, 8, txt="TOTALE A PAGARE", border=0, align='R')
-        pdf.cell(60, 8, txt=f"EUR {dati['totale_pagare']:,.2f}", border=0, align='R', ln=1)
-    pdf.ln(20)
-    pdf.set_font("Arial", '', 8)
-    pdf.set_text_color(100, 100, 100)
-    pdf.multi_cell(0, 4, txt=(
-        "Operazione in franchigia da IVA ai sensi della Legge 190/2014 (Regime Forfettario).\n"
-        "Operazione non soggetta a ritenuta alla fonte ai sensi dell'art. 1 c. 67 L. 190/2014.\n"
-        "Prestazione sportiva ai sensi del D.Lgs. 36/2021 e successive modificazioni.\n"
-        "Compensi soggetti alla franchigia fiscale di € 15.000 (art. 36 c. 6 D.Lgs. 36/2021)."
-    ))
-    return pdf.output(dest='S').encode('latin-1')
 
 # ─────────────────────────────────────────────────────────────────────────────
-# CSS LUXURY (invariato)
+# CSS LUXURY (static/stile.css)
 # ─────────────────────────────────────────────────────────────────────────────
-st.markdown("""
-    <style>
-    .stApp { background: linear-gradient(180deg, #001529 0%, #001e3c 100%); }
-    #MainMenu, header, footer, [data-testid="stToolbar"] {visibility: hidden; display: none;}
-    h1, h2, h3, h4, h5, h6, p, li, div, label, span { color: #ffffff; font-family: 'Helvetica Neue', sans-serif; }
-    .sport-header { color: #D4AF37; text-transform: uppercase; letter-spacing: 2px; font-weight: 800; border-bottom: 2px solid #D4AF37; padding-bottom: 10px; margin-bottom: 20px; }
-    a { color: #D4AF37 !important; text-decoration: none; font-weight: bold; }
-    .stNumberInput > label, .stTextInput > label, .stSelectbox > label, .stDateInput > label, .stCheckbox > label { color: #D4AF37 !important; font-weight: bold; }
-    div[data-baseweb="select"] > div, div[data-baseweb="input"] > div { background-color: #002a52 !important; color: white !important; border: 2px solid #D4AF37 !important; }
-    div[data-baseweb="select"] span, input { color: white !important; }
-    div[data-baseweb="select"] svg { fill: white !important; }
-    div[data-baseweb="popover"] div, ul[data-baseweb="menu"] { background-color: #001529 !important; border: 1px solid #D4AF37 !important; }
-    li[data-baseweb="option"] { color: white !important; }
-    li[data-baseweb="option"]:hover { background-color: #D4AF37 !important; color: #001529 !important; }
-    .stButton>button { background-color: #D4AF37; color: #001529 !important; font-weight: bold; border: none; padding: 0.8rem 1rem; width: 100%; text-transform: uppercase; }
-    .stButton>button:hover { background-color: #ffffff; }
-    .result-card { background-color: #ffffff; padding: 20px; border-radius: 10px; border-left: 8px solid #D4AF37; margin-bottom: 20px; }
-    .result-card h1, .result-card h3, .result-card h4, .result-card p, .result-card span, .result-card div, .result-card small { color: #001529 !important; }
-    .warn-card { background-color: #fff3cd; padding: 14px 18px; border-radius: 8px; border-left: 6px solid #FFC107; margin-bottom: 16px; }
-    .warn-card p, .warn-card span, .warn-card div { color: #664d03 !important; font-size: 0.9em; }
-    .dataframe { background-color: white; color: #333 !important; border-radius: 5px; }
-    .dataframe th { background-color: #D4AF37 !important; color: #001529 !important; }
-    .dataframe td { color: #333 !important; }
-    [data-testid="stSidebar"] { background-color: #000f1f; border-right: 1px solid #D4AF37; }
-    </style>
-""", unsafe_allow_html=True)
+_stile("stile.css")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # HEADER
 # ─────────────────────────────────────────────────────────────────────────────
 col_head1, col_head2 = st.columns([1, 4])
 with col_head1:
-    st.image("https://images.unsplash.com/photo-1517836357463-d25dfeac3438?ixlib=rb-4.0.3&auto=format&fit=crop&w=150&q=80", width=120)
+    st.image(_asset("logo.svg"), width=120)
 with col_head2:
     st.title("STUDIO GAETANI")
     st.markdown("<h3 style='color: #D4AF37;'>Sport Tax Advisor & Management</h3>", unsafe_allow_html=True)
@@ -412,7 +290,7 @@ if not check_riduzione_ivs_attiva():
         "La riduzione del 50% sulla base imponibile IVS (art. 35 c. 8-ter D.Lgs. 36/2021) "
         f"era valida fino al {PARAMS['scadenza_riduzione_ivs'].strftime('%d/%m/%Y')}.  \n"
         "I calcoli previdenziali potrebbero non essere aggiornati. "
-        "Verificare la normativa vigente e aggiornare il parametro `riduzione_ivs` in `PARAMS`."
+        "Verificare la normativa vigente e aggiornare il parametro `riduzione_ivs` in `parametri.py`."
     )
 elif (PARAMS["scadenza_riduzione_ivs"] - date.today()).days < 180:
     st.warning(
@@ -425,8 +303,11 @@ elif (PARAMS["scadenza_riduzione_ivs"] - date.today()).days < 180:
 # SIDEBAR
 # ─────────────────────────────────────────────────────────────────────────────
 st.sidebar.header("⚙️ Profilo Sportivo")
+anni = anni_disponibili()
+anno_fiscale = st.sidebar.selectbox("Anno fiscale:", anni, index=anni.index(anno_corrente()))
+P_anno = parametri(anno_fiscale)
 regime_scelta = st.sidebar.radio("Regime P.IVA:", ["Start-up (5%)", "Ordinario (15%)"], index=0)
-aliquota_tassa = PARAMS["aliq_forfettario_new"] if "Start-up" in regime_scelta else PARAMS["aliq_forfettario_ord"]
+aliquota_tassa = P_anno["aliq_forfettario_new"] if "Start-up" in regime_scelta else P_anno["aliq_forfettario_ord"]
 
 gia_assicurato = st.sidebar.checkbox(
     "Già assicurato / pensionato",
@@ -434,6 +315,9 @@ gia_assicurato = st.sidebar.checkbox(
     help="Se il lavoratore è già coperto da altra posizione previdenziale (es. dipendente), "
          "l'aliquota IVS co.co.co. è 24% invece di 25% (INPS Circ. 27/2025)."
 )
+st.sidebar.text_input("Cliente:", key="cliente",
+                      help="I calcoli di P.IVA, Co.co.co. e Confronto sono archiviati con "
+                           "questo nome (tab Archivio).")
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("🔗 Link Utili Sport")
@@ -452,50 +336,113 @@ st.sidebar.caption(
     "D.Lgs. 36/2021 (riforma sport)  \n"
     "INPS Circ. 27/2025  \n"
     "AdE CG 14/2025  \n"
-    "L. Bilancio 2025"
+    f"L. Bilancio {anno_fiscale}"
 )
 
 if st.sidebar.button("Esci / Logout"):
     del st.session_state["password_correct"]
+    st.session_state.pop("utente", None)
     st.rerun()
 
+
+def _amministratore() -> bool:
+    """Utente elencato in `amministratori` nei secrets."""
+    try:
+        return st.session_state.get("utente") in st.secrets.get("amministratori", [])
+    except FileNotFoundError:
+        return False
+
+
+def _cambia_metriche() -> None:
+    metriche.abilita(st.session_state["metriche_attive"])
+
+
+def pannello_prestazioni() -> None:
+    """Durate dei punti caldi e statistiche della cache (solo amministratori)."""
+    with st.sidebar.expander("📈 Prestazioni"):
+        # Il flag è del processo server: il toggle ne mostra lo stato a ogni
+        # rerun e lo cambia solo quando un amministratore lo sposta.
+        st.session_state["metriche_attive"] = metriche.attive()
+        st.toggle("Registra tempi (tutto il server)", key="metriche_attive",
+                  on_change=_cambia_metriche,
+                  help="Vale per tutti gli utenti collegati, non solo per questa sessione.")
+        righe = metriche.REGISTRO.riepilogo()
+        if righe:
+            df = pd.DataFrame(righe).set_index("nome")
+            df = df.assign(**{c.replace("_s", " (ms)"): df[c] * 1000
+                              for c in ("media_s", "p50_s", "p95_s", "p99_s", "max_s")})
+            st.dataframe(df[["conteggio", "media (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "max (ms)"]],
+                         width="stretch")
+        else:
+            st.caption("Nessuna misura registrata.")
+        stat = CACHE.statistiche()
+        st.caption(f"Cache risultati: {stat['voci']}/{stat['dimensione_massima']} voci · "
+                   f"hit rate {stat['hit_rate']:.0%} ({stat['hit']} hit, {stat['miss']} miss)")
+        occ = _gestore_lavori().occupazione()
+        st.caption(f"Lavori in background: {occ['in_corso']}/{occ['massimo_in_corso']} in corso, "
+                   f"{occ['in_coda']} in coda")
+        st.download_button("Scarica metriche (Prometheus)", metriche.esporta_prometheus(),
+                           file_name="simulatore.prom", mime="text/plain")
+        if st.button("Azzera misure", key="metriche_svuota"):
+            metriche.REGISTRO.svuota()
+            st.rerun()
+
+
+if _amministratore():
+    pannello_prestazioni()
+
 # ─────────────────────────────────────────────────────────────────────────────
 # TABS
 # ─────────────────────────────────────────────────────────────────────────────
-tab_piva, tab_cococo, tab_confronto, tab_fattura = st.tabs([
-    "📊 P.IVA Sportiva", "🤝 Assunzione Co.co.co", "⚖️ Confronto", "📝 Genera Fattura PDF"
+(tab_piva, tab_cococo, tab_confronto, tab_fattura, tab_roster, tab_simulazione,
+ tab_archivio) = st.tabs([
+    "📊 P.IVA Sportiva", "🤝 Assunzione Co.co.co", "⚖️ Confronto", "📝 Genera Fattura PDF",
+    "📂 Import Roster", "🎲 Simulazione", "🗄️ Archivio"
 ])
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TAB 1 – P.IVA SPORTIVA
 # ═══════════════════════════════════════════════════════════════════════════════
-with tab_piva:
+@st.fragment
+@cronometra("tab.piva")
+def sezione_piva(P_anno, anno_fiscale, aliquota_tassa):
     st.markdown("<div class='sport-header'>Gestione P.IVA Sportiva – Regime Forfettario</div>", unsafe_allow_html=True)
 
-    # Note informative
+    # Note informative (valori dell'anno fiscale scelto)
+    scadenza = P_anno["scadenza_riduzione_ivs"].strftime("%d/%m/%Y")
+    if P_anno.riduzione_attiva:
+        riduzione = (f"Fino al **{scadenza}** l'aliquota IVS ({_percentuale(P_anno['aliq_ivs_piva'])}) "
+                     f"si applica solo al **{_percentuale(P_anno['riduzione_ivs'])} della base "
+                     "contributiva**.")
+    else:
+        riduzione = (f"Scaduta il **{scadenza}**: nel {anno_fiscale} l'aliquota IVS "
+                     f"({_percentuale(P_anno['aliq_ivs_piva'])}) si applica all'**intera base "
+                     "contributiva**.")
     with st.expander("ℹ️ Come funzionano i calcoli – fonti normative"):
-        st.markdown("""
-        **Soglia fiscale €15.000** (art. 36 c. 6 D.Lgs. 36/2021):  
-        I compensi percepiti da ASD/SSD/FSN non concorrono al reddito imponibile fino a €15.000 
-        complessivi nell'anno solare (criterio di cassa, multi-committente cumulativo).
+        st.markdown(f"""
+        **Soglia fiscale €{P_anno['soglia_fiscale']:,.0f}** (art. 36 c. 6 D.Lgs. 36/2021):  
+        I compensi percepiti da ASD/SSD/FSN non concorrono al reddito imponibile fino a 
+        €{P_anno['soglia_fiscale']:,.0f} complessivi nell'anno solare (criterio di cassa, 
+        multi-committente cumulativo).
 
         **Imponibile forfettario** (AdE Consulenza Giuridica 14/2025):  
-        Il coefficiente di redditività (78%) si applica ai compensi **al netto** dei €15.000.  
-        Formula: `(fatturato − €15.000) × 78% − INPS versata`
+        Il coefficiente di redditività ({_percentuale(P_anno['coeff_redditivita'])}) si applica ai 
+        compensi **al netto** dei €{P_anno['soglia_fiscale']:,.0f}.  
+        Formula: `(fatturato − €{P_anno['soglia_fiscale']:,.0f}) × {_percentuale(P_anno['coeff_redditivita'])} − INPS versata`
 
         **INPS – Riduzione 50% IVS** (art. 35 c. 8-ter D.Lgs. 36/2021):  
-        Fino al **31/12/2027** l'aliquota IVS (25%) si applica solo al **50% della base contributiva**.  
-        Le aliquote aggiuntive (malattia 0,22% + maternità 0,50% + ISCRO 0,35% = 1,07%) si applicano 
-        sull'**intera base** (no riduzione 50%).
+        {riduzione}  
+        Le aliquote aggiuntive (malattia + maternità + ISCRO = {_percentuale(P_anno['aliq_add_piva'])}) 
+        si applicano sull'**intera base** (no riduzione 50%).
 
-        **Franchigia previdenziale** €5.000 (art. 35 c. 8-bis): nessun contributo INPS 
-        sui primi €5.000 annui.
+        **Franchigia previdenziale** €{P_anno['soglia_prev']:,.0f} (art. 35 c. 8-bis): nessun 
+        contributo INPS sui primi €{P_anno['soglia_prev']:,.0f} annui.
         """)
 
     # Avviso soglia forfettario
     st.markdown(f"""
     <div class='warn-card'>
-    <p>⚠️ <b>Soglia regime forfettario: €{PARAMS['soglia_forfettario']:,.0f}</b> – 
+    <p>⚠️ <b>Soglia regime forfettario: €{P_anno['soglia_forfettario']:,.0f}</b> – 
     L'intero fatturato (inclusa la fascia esente €15.000) concorre al test.
     Se superi questa soglia, seleziona la modalità P.IVA Ordinaria nella Tab Confronto.</p>
     </div>
@@ -513,183 +460,215 @@ with tab_piva:
                                help="Obbligatorio su fatture esenti IVA superiori a €77,47.")
 
     # Validazione soglia forfettario
-    if val_input > PARAMS["soglia_forfettario"]:
+    if val_input > P_anno["soglia_forfettario"]:
         st.error(
             f"⛔ L'importo inserito (€{val_input:,.0f}) supera la soglia del regime forfettario "
-            f"(€{PARAMS['soglia_forfettario']:,.0f}). Il regime forfettario non è applicabile. "
+            f"(€{P_anno['soglia_forfettario']:,.0f}). Il regime forfettario non è applicabile. "
             "Usa la Tab Confronto con P.IVA Ordinaria."
         )
     elif st.button("CALCOLA", key="btn_piva"):
         if "Lordo" in mode:
-            res = calcoli_avanzati_piva(val_input, flag_riv, flag_bol, aliquota_tassa)
-            titolo, val_show = "Netto Disponibile", res['netto']
+            res = calcoli_avanzati_piva(val_input, flag_riv, flag_bol, aliquota_tassa, anno=anno_fiscale)
+            titolo, val_show = "Netto Disponibile", res.netto
         else:
-            res = calcolo_inverso_piva(val_input, flag_riv, flag_bol, aliquota_tassa)
-            titolo, val_show = "Compenso da Chiedere", res['compenso']
+            res = calcolo_inverso_piva(val_input, flag_riv, flag_bol, aliquota_tassa, anno=anno_fiscale)
+            titolo, val_show = "Compenso da Chiedere", res.compenso
+        _archivia("piva", "diretto" if "Lordo" in mode else "inverso",
+                  {"importo": val_input, "rivalsa": flag_riv, "bollo": flag_bol,
+                   "aliquota": aliquota_tassa}, res, anno_fiscale)
 
-        st.markdown(f"""
+        scheda = f"""
         <div class="result-card">
             <h3>{titolo}:</h3>
             <h1 style="color: #002a52 !important;">€ {val_show:,.2f}</h1>
-            <small>Fatturato Reale Incassato: € {res['fatturato']:,.2f}</small>
+            <small>Fatturato Reale Incassato: € {res.fatturato:,.2f}</small>
         </div>
-        """, unsafe_allow_html=True)
-
-        rid_label = "SÌ (50% – art. 35 c.8-ter, fino 31/12/2027)" if res['riduzione_attiva'] else "NO (scaduta)"
-
-        df = pd.DataFrame({
-            "Voce": [
-                "1. Compenso Base",
-                "2. Rivalsa INPS 4% (facoltativa)",
-                "👉 FATTURATO LORDO",
-                "── CALCOLO PREVIDENZIALE ──────────────",
-                f"3. Franchigia prev. (−€{PARAMS['soglia_prev']:,.0f} – art.35 c.8-bis)",
-                "4. BIC lorda (base imponibile contributi)",
-                f"5. Riduzione 50% IVS applicata: {rid_label}",
-                "6. BIC ridotta (base IVS)",
-                f"7. Contributi IVS ({PARAMS['aliq_ivs_piva']*100:.0f}% su BIC ridotta)",
-                f"8. Contrib. aggiuntive ({PARAMS['aliq_add_piva']*100:.2f}% su BIC intera)",
-                "9. INPS TOTALE (a carico lavoratore)",
-                "── CALCOLO FISCALE ────────────────────",
-                f"10. Franchigia fiscale (−€{PARAMS['soglia_fiscale']:,.0f} – art.36 c.6)",
-                "11. Componenti positivi (fatturato − €15k)",
-                f"12. Reddito forfettario ({int(PARAMS['coeff_redditivita']*100)}% su comp. positivi – AdE CG 14/2025)",
-                "13. Deduci INPS versata",
-                "14. Imponibile fiscale netto",
-                f"15. Imposta sostitutiva ({int(aliquota_tassa*100)}%)",
-                "── NETTO ──────────────────────────────",
-                "💰 NETTO REALE LAVORATORE",
-            ],
-            "Importo (€)": [
-                f"{res['compenso']:,.2f}",
-                f"{res['rivalsa']:,.2f}",
-                f"{res['fatturato']:,.2f}",
-                "─────────────────",
-                f"−{PARAMS['soglia_prev']:,.2f}",
-                f"{res['BIC_lorda']:,.2f}",
-                rid_label,
-                f"{res['BIC_IVS']:,.2f}",
-                f"−{res['contrib_IVS']:,.2f}",
-                f"−{res['contrib_add']:,.2f}",
-                f"−{res['inps']:,.2f}",
-                "─────────────────",
-                f"−{PARAMS['soglia_fiscale']:,.2f}",
-                f"{res['componenti_pos']:,.2f}",
-                f"{res['reddito_forf']:,.2f}",
-                f"−{res['inps']:,.2f}",
-                f"{res['imponibile_forf']:,.2f}",
-                f"−{res['tasse']:,.2f}",
-                "─────────────────",
-                f"€ {res['netto']:,.2f}",
-            ]
-        })
-        st.table(df)
-
-        aliq_eff = (res['inps'] + res['tasse']) / res['fatturato'] * 100 if res['fatturato'] > 0 else 0
-        st.markdown(f"""
+        """
+
+        rid_label = "SÌ (50% – art. 35 c.8-ter, fino 31/12/2027)" if res.riduzione_attiva else "NO (scaduta)"
+
+        with misura("tab.piva.tabella"):
+            df = pd.DataFrame({
+                "Voce": [
+                    "1. Compenso Base",
+                    "2. Rivalsa INPS 4% (facoltativa)",
+                    "👉 FATTURATO LORDO",
+                    "── CALCOLO PREVIDENZIALE ──────────────",
+                    f"3. Franchigia prev. (−€{P_anno['soglia_prev']:,.0f} – art.35 c.8-bis)",
+                    "4. BIC lorda (base imponibile contributi)",
+                    f"5. Riduzione 50% IVS applicata: {rid_label}",
+                    "6. BIC ridotta (base IVS)",
+                    f"7. Contributi IVS ({P_anno['aliq_ivs_piva']*100:.0f}% su BIC ridotta)",
+                    f"8. Contrib. aggiuntive ({P_anno['aliq_add_piva']*100:.2f}% su BIC intera)",
+                    "9. INPS TOTALE (a carico lavoratore)",
+                    "── CALCOLO FISCALE ────────────────────",
+                    f"10. Franchigia fiscale (−€{P_anno['soglia_fiscale']:,.0f} – art.36 c.6)",
+                    "11. Componenti positivi (fatturato − €15k)",
+                    f"12. Reddito forfettario ({int(P_anno['coeff_redditivita']*100)}% su comp. positivi – AdE CG 14/2025)",
+                    "13. Deduci INPS versata",
+                    "14. Imponibile fiscale netto",
+                    f"15. Imposta sostitutiva ({int(aliquota_tassa*100)}%)",
+                    "── NETTO ──────────────────────────────",
+                    "💰 NETTO REALE LAVORATORE",
+                ],
+                "Importo (€)": [
+                    res.compenso,
+                    res.rivalsa,
+                    res.fatturato,
+                    None,
+                    -P_anno['soglia_prev'],
+                    res.BIC_lorda,
+                    None,
+                    res.BIC_IVS,
+                    -res.contrib_IVS,
+                    -res.contrib_add,
+                    -res.inps,
+                    None,
+                    -P_anno['soglia_fiscale'],
+                    res.componenti_pos,
+                    res.reddito_forf,
+                    -res.inps,
+                    res.imponibile_forf,
+                    -res.tasse,
+                    None,
+                    res.netto,
+                ]
+            }).set_index("Voce").astype(float)
+
+        aliq_eff = (res.inps + res.tasse) / res.fatturato * 100 if res.fatturato > 0 else 0
+        st.session_state["ris_piva"] = {"scheda": scheda, "tabella": df, "sintesi": f"""
         <div class="result-card">
             <p>📊 <b>Pressione fiscale + contributiva effettiva:</b> {aliq_eff:.1f}%
-            &nbsp;|&nbsp; INPS: €{res['inps']:,.2f}
-            &nbsp;|&nbsp; Imposta: €{res['tasse']:,.2f}</p>
+            &nbsp;|&nbsp; INPS: €{res.inps:,.2f}
+            &nbsp;|&nbsp; Imposta: €{res.tasse:,.2f}</p>
         </div>
-        """, unsafe_allow_html=True)
+        """}
+
+    # Ultimo risultato in session_state: resta a video, senza ricalcoli né
+    # tabelle ricostruite, fino al prossimo CALCOLA.
+    ris_piva = st.session_state.get("ris_piva")
+    if ris_piva and val_input <= P_anno["soglia_forfettario"]:
+        st.markdown(ris_piva["scheda"], unsafe_allow_html=True)
+        st.table(_tabella_importi(ris_piva["tabella"]))
+        st.markdown(ris_piva["sintesi"], unsafe_allow_html=True)
+
+
+with tab_piva:
+    sezione_piva(P_anno, anno_fiscale, aliquota_tassa)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TAB 2 – CO.CO.CO.
 # ═══════════════════════════════════════════════════════════════════════════════
-with tab_cococo:
+@st.fragment
+@cronometra("tab.cococo")
+def sezione_cococo(P_anno, anno_fiscale, gia_assicurato):
     st.markdown("<div class='sport-header'>Assunzione Co.co.co Sportivo Dilettantistico</div>", unsafe_allow_html=True)
 
     with st.expander("ℹ️ Come funzionano i calcoli – fonti normative"):
-        st.markdown("""
-        **Soglia fiscale €15.000** (art. 36 c. 6): stessa del forfettario. Ritenuta d'acconto 
-        20% (art. 25 DPR 600/1973) applicata solo sulla parte eccedente.
+        st.markdown(f"""
+        **Soglia fiscale €{P_anno['soglia_fiscale']:,.0f}** (art. 36 c. 6): stessa del forfettario. 
+        Ritenuta d'acconto {_percentuale(P_anno['aliq_ritenuta_acconto'])} (art. 25 DPR 600/1973) applicata 
+        solo sulla parte eccedente.
 
         **INPS – Ripartizione** (art. 35 D.Lgs. 36/2021):  
         I contributi si ripartiscono: **1/3 lavoratore** e **2/3 committente**.  
         Il costo reale per l'ASD/SSD è quindi **lordo + 2/3 dei contributi totali**.
 
         **Aliquote INPS co.co.co.** (INPS Circ. 27/2025):  
-        - IVS 25% (o 24% se già assicurato) sul 50% della base contributiva  
-        - Aggiuntive 2,03% (DIS-COLL + malattia + maternità) sull'intera base contributiva  
+        - IVS {_percentuale(P_anno['aliq_ivs_cococo'])} (o {_percentuale(P_anno['aliq_ivs_cococo_assicurato'])} 
+          se già assicurato) sul {_percentuale(P_anno.riduzione)} della base contributiva  
+        - Aggiuntive {_percentuale(P_anno['aliq_add_cococo'])} (DIS-COLL + malattia + maternità) 
+          sull'intera base contributiva  
 
-        **IRPEF**: scaglioni progressivi 23%/35%/43% (TUIR art. 11, L. Bilancio 2025).
+        **IRPEF {anno_fiscale}**: scaglioni progressivi {'/'.join(f'{a*100:.0f}%' for a in P_anno.aliquote_irpef)} (TUIR art. 11, L. Bilancio {anno_fiscale}).
         """)
 
-    lordo_dip = st.number_input("Compenso Lordo Annuo (€)", value=20000.0, step=500.0, min_value=0.0)
+    mode_dip = st.radio("Modalità:", ["Dal Lordo al Netto", "Dal Netto al Lordo (Reverse)"],
+                        horizontal=True, key="mode_dip")
+    lordo_dip = st.number_input("Importo Annuo (€)", value=20000.0, step=500.0, min_value=0.0)
 
     if st.button("CALCOLA", key="btn_dip"):
-        res = calcola_cococo(lordo_dip, gia_assicurato=gia_assicurato)
-        rid_label = "Sì (50%)" if res['riduzione_attiva'] else "No (scaduta)"
-        aliq_ivs_label = PARAMS['aliq_ivs_cococo_assicurato'] if gia_assicurato else PARAMS['aliq_ivs_cococo']
+        if "Lordo" in mode_dip:
+            res = calcola_cococo(lordo_dip, gia_assicurato=gia_assicurato, anno=anno_fiscale)
+        else:
+            res = calcolo_inverso_cococo(lordo_dip, gia_assicurato=gia_assicurato, anno=anno_fiscale)
+        _archivia("cococo", "diretto" if "Lordo" in mode_dip else "inverso",
+                  {"importo": lordo_dip, "assicurato": gia_assicurato}, res, anno_fiscale)
+        rid_label = "Sì (50%)" if res.riduzione_attiva else "No (scaduta)"
+        aliq_ivs_label = P_anno['aliq_ivs_cococo_assicurato'] if gia_assicurato else P_anno['aliq_ivs_cococo']
 
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown(f"""
+        scheda_netto = f"""
             <div class="result-card">
                 <h3>💰 Netto Lavoratore:</h3>
-                <h1 style="color: #002a52 !important;">€ {res['netto']:,.2f}</h1>
+                <h1 style="color: #002a52 !important;">€ {res.netto:,.2f}</h1>
                 <small>Al netto di INPS quota lavoratore + IRPEF</small>
-            </div>""", unsafe_allow_html=True)
-        with c2:
-            st.markdown(f"""
+            </div>"""
+        scheda_costo = f"""
             <div class="result-card" style="border-left-color: #b8860b;">
                 <h3>🏢 Costo Committente (ASD/SSD):</h3>
-                <h1 style="color: #002a52 !important;">€ {res['costo_committente']:,.2f}</h1>
-                <small>Lordo €{res['lordo']:,.0f} + INPS quota committente €{res['quota_comm']:,.2f}</small>
-            </div>""", unsafe_allow_html=True)
-
-        df = pd.DataFrame({
-            "Voce": [
-                "1. Compenso Lordo",
-                "── CALCOLO PREVIDENZIALE ──────────────",
-                f"2. Franchigia prev. (−€{PARAMS['soglia_prev']:,.0f})",
-                "3. BIC lorda",
-                f"4. Riduzione 50% IVS: {rid_label}",
-                "5. BIC ridotta (base IVS)",
-                f"6. Contributi IVS ({aliq_ivs_label*100:.0f}% su BIC ridotta)",
-                f"7. Contrib. aggiuntive ({PARAMS['aliq_add_cococo']*100:.2f}% su BIC intera)",
-                "8. CONTRIBUTI TOTALI",
-                "9. Quota lavoratore (1/3)",
-                "10. Quota committente (2/3)",
-                "── CALCOLO FISCALE ────────────────────",
-                f"11. Soglia no-tax (−€{PARAMS['soglia_fiscale']:,.0f})",
-                "12. Deduci INPS quota lavoratore",
-                "13. Imponibile IRPEF",
-                "14. Ritenuta d'acconto (20% su eccedenza)",
-                "15. IRPEF lorda (scaglioni progressivi)",
-                "16. Saldo IRPEF in dichiarazione",
-                "── RIEPILOGO ──────────────────────────",
-                "💰 NETTO LAVORATORE",
-                "🏢 COSTO COMMITTENTE",
-            ],
-            "Importo (€)": [
-                f"{res['lordo']:,.2f}",
-                "─────────────────",
-                f"−{PARAMS['soglia_prev']:,.2f}",
-                f"{res['BIC_lorda']:,.2f}",
-                rid_label,
-                f"{res['BIC_IVS']:,.2f}",
-                f"−{res['contrib_IVS']:,.2f}",
-                f"−{res['contrib_add']:,.2f}",
-                f"{res['contrib_tot']:,.2f}",
-                f"−{res['quota_lav']:,.2f}",
-                f"+{res['quota_comm']:,.2f} (a carico ASD)",
-                "─────────────────",
-                f"−{PARAMS['soglia_fiscale']:,.2f}",
-                f"−{res['quota_lav']:,.2f}",
-                f"{res['imponibile_irpef']:,.2f}",
-                f"−{res['ritenuta_acconto']:,.2f} (anticipo)",
-                f"−{res['irpef_lorda']:,.2f}",
-                f"−{res['saldo_irpef']:,.2f}",
-                "─────────────────",
-                f"€ {res['netto']:,.2f}",
-                f"€ {res['costo_committente']:,.2f}",
-            ]
-        })
-        st.table(df)
+                <h1 style="color: #002a52 !important;">€ {res.costo_committente:,.2f}</h1>
+                <small>Lordo €{res.lordo:,.0f} + INPS quota committente €{res.quota_comm:,.2f}</small>
+            </div>"""
+
+        with misura("tab.cococo.tabella"):
+            df = pd.DataFrame({
+                "Voce": [
+                    "1. Compenso Lordo",
+                    "── CALCOLO PREVIDENZIALE ──────────────",
+                    f"2. Franchigia prev. (−€{P_anno['soglia_prev']:,.0f})",
+                    "3. BIC lorda",
+                    f"4. Riduzione 50% IVS: {rid_label}",
+                    "5. BIC ridotta (base IVS)",
+                    f"6. Contributi IVS ({aliq_ivs_label*100:.0f}% su BIC ridotta)",
+                    f"7. Contrib. aggiuntive ({P_anno['aliq_add_cococo']*100:.2f}% su BIC intera)",
+                    "8. CONTRIBUTI TOTALI",
+                    "9. Quota lavoratore (1/3)",
+                    "10. Quota committente (2/3, a carico ASD)",
+                    "── CALCOLO FISCALE ────────────────────",
+                    f"11. Soglia no-tax (−€{P_anno['soglia_fiscale']:,.0f})",
+                    "12. Deduci INPS quota lavoratore",
+                    "13. Imponibile IRPEF",
+                    "14. Ritenuta d'acconto (20% su eccedenza, anticipo)",
+                    "15. IRPEF lorda (scaglioni progressivi)",
+                    "16. Saldo IRPEF in dichiarazione",
+                    "── RIEPILOGO ──────────────────────────",
+                    "💰 NETTO LAVORATORE",
+                    "🏢 COSTO COMMITTENTE",
+                ],
+                "Importo (€)": [
+                    res.lordo,
+                    None,
+                    -P_anno['soglia_prev'],
+                    res.BIC_lorda,
+                    None,
+                    res.BIC_IVS,
+                    -res.contrib_IVS,
+                    -res.contrib_add,
+                    res.contrib_tot,
+                    -res.quota_lav,
+                    res.quota_comm,
+                    None,
+                    -P_anno['soglia_fiscale'],
+                    -res.quota_lav,
+                    res.imponibile_irpef,
+                    -res.ritenuta_acconto,
+                    -res.irpef_lorda,
+                    -res.saldo_irpef,
+                    None,
+                    res.netto,
+                    res.costo_committente,
+                ]
+            }).set_index("Voce").astype(float)
+        st.session_state["ris_cococo"] = {"netto": scheda_netto, "costo": scheda_costo, "tabella": df}
+
+    ris_cococo = st.session_state.get("ris_cococo")
+    if ris_cococo:
+        c1, c2 = st.columns(2)
+        c1.markdown(ris_cococo["netto"], unsafe_allow_html=True)
+        c2.markdown(ris_cococo["costo"], unsafe_allow_html=True)
+        st.table(_tabella_importi(ris_cococo["tabella"]))
 
-        st.markdown(f"""
+        st.markdown("""
         <div class='warn-card'>
         <p>📋 <b>Adempimenti committente:</b> Il committente (ASD/SSD) deve versare i contributi (quota 2/3)
         tramite F24 entro il 16 del mese successivo al pagamento del compenso.
@@ -698,10 +677,89 @@ with tab_cococo:
         </div>
         """, unsafe_allow_html=True)
 
+
+with tab_cococo:
+    sezione_cococo(P_anno, anno_fiscale, gia_assicurato)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # TAB 3 – CONFRONTO
 # ═══════════════════════════════════════════════════════════════════════════════
-with tab_confronto:
+def _mostra_confronto(budget, aliquota_tassa, piva, dip):
+    """Schede e tabella del confronto (dall'ultimo risultato in session_state)."""
+    # ── Netto lavoratore ────────────────────────────────────────────────
+    st.subheader("Dal punto di vista del Lavoratore")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(f"""
+        <div class="result-card" style="border-left-color: #002a52;">
+            <h4>🏃 P.IVA Forfettaria ({int(aliquota_tassa*100)}%)</h4>
+            <h2>Netto: € {piva.netto:,.0f}</h2>
+            <small>INPS: €{piva.inps:,.0f} | Tasse: €{piva.tasse:,.0f}</small><br>
+            <small>Pressione effettiva: {(piva.inps+piva.tasse)/budget*100:.1f}%</small>
+        </div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""
+        <div class="result-card" style="border-left-color: #b8860b;">
+            <h4>📝 Co.co.co Sportivo</h4>
+            <h2>Netto: € {dip.netto:,.0f}</h2>
+            <small>INPS quota lav.: €{dip.quota_lav:,.0f} | IRPEF: €{dip.irpef_lorda:,.0f}</small><br>
+            <small>Pressione effettiva: {(dip.quota_lav+dip.irpef_lorda)/budget*100:.1f}%</small>
+        </div>""", unsafe_allow_html=True)
+
+    # ── Costo committente ────────────────────────────────────────────────
+    st.subheader("Dal punto di vista del Committente (ASD/SSD)")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(f"""
+        <div class="result-card" style="border-left-color: #002a52;">
+            <h4>🏃 Se usa P.IVA</h4>
+            <h2>Costo: € {budget:,.0f}</h2>
+            <small>Nessun onere contributivo aggiuntivo.<br>
+            Il lavoratore versa INPS in proprio.</small>
+        </div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""
+        <div class="result-card" style="border-left-color: #b8860b;">
+            <h4>📝 Se usa Co.co.co.</h4>
+            <h2>Costo: € {dip.costo_committente:,.0f}</h2>
+            <small>+€{dip.quota_comm:,.0f} di INPS quota committente (2/3).<br>
+            Versamento F24 entro il 16 del mese succ.</small>
+        </div>""", unsafe_allow_html=True)
+
+    # ── Tabella comparativa sintetica ────────────────────────────────────
+    vincitore_lav   = "P.IVA" if piva.netto >= dip.netto else "Co.co.co."
+    vincitore_comm  = "P.IVA" if budget <= dip.costo_committente else "Co.co.co."
+    diff_netto      = abs(piva.netto - dip.netto)
+    diff_costo      = abs(budget - dip.costo_committente)
+
+    with misura("tab.confronto.tabella"):
+        df_comp = pd.DataFrame({
+            "P.IVA Forfettaria": [budget, piva.inps, piva.tasse, piva.netto, budget,
+                                  (piva.inps + piva.tasse) / budget * 100],
+            "Co.co.co. Sportivo": [budget, dip.quota_lav, dip.irpef_lorda, dip.netto,
+                                   dip.costo_committente,
+                                   (dip.quota_lav + dip.irpef_lorda) / budget * 100],
+        }, index=pd.Index([
+            "Compenso lordo",
+            "INPS totale lavoratore (co.co.co.: quota 1/3)",
+            "IRPEF / Imposta sostitutiva",
+            "NETTO LAVORATORE",
+            "COSTO COMMITTENTE",
+            "Pressione fiscale+prev. (lavoratore)",
+        ], name="Voce"))
+    importi = pd.IndexSlice[df_comp.index[:-1], :]
+    st.table(df_comp.style.format(lambda v: f"€ {_euro(v, 0)}", subset=importi)
+                          .format("{:.1f}%", subset=pd.IndexSlice[df_comp.index[-1:], :]))
+
+    st.info(
+        f"📌 **Convenienza lavoratore:** {vincitore_lav} (+€{diff_netto:,.0f} di netto)  \n"
+        f"📌 **Convenienza committente:** {vincitore_comm} (−€{diff_costo:,.0f} di costo)"
+    )
+
+
+@st.fragment
+@cronometra("tab.confronto")
+def sezione_confronto(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato):
     st.markdown("<div class='sport-header'>Confronto P.IVA Forfettaria vs Co.co.co Sportivo</div>", unsafe_allow_html=True)
 
     st.markdown("""
@@ -714,98 +772,129 @@ with tab_confronto:
 
     budget = st.number_input("Compenso / Budget Lordo (€)", value=25000.0, step=500.0, min_value=0.0)
 
-    if budget > PARAMS["soglia_forfettario"]:
-        st.warning(f"⚠️ Budget > €{PARAMS['soglia_forfettario']:,.0f}: il regime forfettario non è applicabile.")
+    if budget > P_anno["soglia_forfettario"]:
+        st.warning(f"⚠️ Budget > €{P_anno['soglia_forfettario']:,.0f}: il regime forfettario non è applicabile.")
 
     if st.button("CONFRONTA", key="btn_conf"):
-        piva = calcoli_avanzati_piva(budget, False, False, aliquota_tassa)
-        dip  = calcola_cococo(budget, gia_assicurato=gia_assicurato)
+        confronto = st.session_state["ris_confronto"] = {
+            "budget": budget, "aliquota_tassa": aliquota_tassa,
+            "piva": calcoli_avanzati_piva(budget, False, False, aliquota_tassa, anno=anno_fiscale),
+            "dip": calcola_cococo(budget, gia_assicurato=gia_assicurato, anno=anno_fiscale),
+        }
+        _archivia("confronto", "confronto",
+                  {"importo": budget, "aliquota": aliquota_tassa, "assicurato": gia_assicurato},
+                  {"piva": confronto["piva"]._asdict(), "cococo": confronto["dip"]._asdict()},
+                  anno_fiscale)
+    if "ris_confronto" in st.session_state:
+        _mostra_confronto(**st.session_state["ris_confronto"])
+
+    # ── Analisi su tutta la fascia di importi ───────────────────────────────
+    st.markdown("---")
+    st.subheader("📈 Punto di pareggio su tutta la fascia di importi")
+    c1, c2 = st.columns(2)
+    with c1:
+        sweep_max = st.number_input("Importo massimo (€)", value=float(P_anno["soglia_forfettario"]),
+                                    step=5000.0, min_value=1000.0, key="sweep_max")
+    with c2:
+        sweep_passo = st.selectbox("Risoluzione (€)", [1.0, 0.1, 0.01], key="sweep_passo")
+
+    if st.button("ANALIZZA FASCIA", key="btn_sweep"):
+        # Solo i punti del grafico (nodi + griglia rada): stesse curve dello
+        # sweep completo alla risoluzione scelta, senza valutarne milioni.
+        st.session_state["sweep"] = {
+            "grafico": grafico_confronto(aliquota_tassa, gia_assicurato, anno_fiscale,
+                                         sweep_max, sweep_passo),
+            "incroci": punti_incrocio(aliquota_tassa, gia_assicurato, anno_fiscale, sweep_max),
+            "punti": punti_griglia(sweep_max, sweep_passo),
+        }
+
+    if "sweep" in st.session_state:
+        risultato_sweep = st.session_state["sweep"]
+        incroci = risultato_sweep["incroci"]
+        etichette = {"netto": "Netto lavoratore", "costo_committente": "Costo committente"}
+        if incroci.empty:
+            st.info("Nessun cambio di convenienza nella fascia analizzata.")
+        else:
+            st.info("  \n".join(
+                f"📌 **{etichette[r.metrica]}:** da € {r.importo:,.2f} conviene {r.conviene_dopo}"
+                for r in incroci.itertuples()
+            ))
+        st.caption(f"Fascia di {risultato_sweep['punti']:,} importi; "
+                   f"{len(risultato_sweep['grafico']):,} punti nel grafico (nodi delle curve inclusi).")
+        import altair as alt
+        grafico = risultato_sweep["grafico"]
+        for metrica, (col_piva, col_coco) in METRICHE.items():
+            dati = grafico.melt("importo", [col_piva, col_coco], var_name="regime", value_name="euro")
+            dati["regime"] = dati["regime"].map({col_piva: "P.IVA", col_coco: "Co.co.co."})
+            curve = alt.Chart(dati).mark_line().encode(
+                x=alt.X("importo:Q", title="Importo lordo (€)"),
+                y=alt.Y("euro:Q", title=etichette[metrica] + " (€)"),
+                color=alt.Color("regime:N", scale=alt.Scale(range=["#D4AF37", "#4FA3FF"])),
+                tooltip=["importo:Q", "regime:N", alt.Tooltip("euro:Q", format=",.2f")],
+            )
+            linee = alt.Chart(incroci[incroci["metrica"] == metrica]).mark_rule(
+                color="white", strokeDash=[4, 4]).encode(x="importo:Q")
+            st.altair_chart((curve + linee).interactive(), width="stretch")
+
+    # ── Griglia what-if ──────────────────────────────────────────────────────
+    st.markdown("---")
+    st.subheader("🧮 Griglia what-if")
+    st.caption("Tutte le combinazioni di importo, regime, assicurato, rivalsa, bollo, riduzione IVS e "
+               "anno sono calcolate una volta e tenute in cache: cambiare fetta non ricalcola nulla.")
+    c1, c2, c3 = st.columns(3)
+    g_min = c1.number_input("Da (€)", value=0.0, min_value=0.0, step=1000.0, key="griglia_min")
+    g_max = c2.number_input("A (€)", value=float(P_anno["soglia_forfettario"]), min_value=0.0,
+                            step=1000.0, key="griglia_max")
+    g_passo = c3.number_input("Passo (€)", value=1000.0, min_value=10.0, step=100.0, key="griglia_passo")
+    try:
+        griglia = griglia_whatif(importi_griglia(g_min, g_max, g_passo))
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    etichette_valori = {"netto": "Netto lavoratore", "imposte": "Imposte (sostitutiva / IRPEF)",
+                        "inps": "INPS a carico lavoratore", "costo_committente": "Costo committente"}
+    c1, c2 = st.columns(2)
+    valore = c1.selectbox("Valore", VALORI_GRIGLIA, format_func=etichette_valori.get, key="griglia_valore")
+    confronta_per = c2.selectbox("Confronta per", DIMENSIONI[:-1], index=2, key="griglia_colonne")
+    livelli = griglia.index.levels
+    regime_sidebar = ("P.IVA start-up" if aliquota_tassa == P_anno["aliq_forfettario_new"]
+                      else "P.IVA ordinaria")
+    predefiniti = {"anno": anno_fiscale, "riduzione_ivs": P_anno.riduzione_attiva,
+                   "regime": regime_sidebar, "assicurato": gia_assicurato,
+                   "rivalsa": True, "bollo": True}
+    fissi = {}
+    colonne_filtri = st.columns(len(DIMENSIONI) - 2)
+    for col, dim in zip(colonne_filtri, [d for d in DIMENSIONI[:-1] if d != confronta_per]):
+        opzioni = list(livelli[griglia.index.names.index(dim)])
+        fissi[dim] = col.selectbox(dim.replace("_", " ").capitalize(), opzioni,
+                                   index=opzioni.index(predefiniti[dim]), key=f"griglia_{dim}")
+    with misura("tab.confronto.griglia"):
+        tabella = pivot(griglia, valore, confronta_per, **fissi)
+
+    import altair as alt
+    dati = tabella.stack().rename(valore).reset_index()
+    dati[confronta_per] = dati[confronta_per].astype(str)
+    dati["importo_fine"] = dati["importo"] + g_passo
+    st.altair_chart(alt.Chart(dati).mark_rect().encode(
+        x=alt.X("importo:Q", title="Importo lordo (€)"), x2="importo_fine:Q",
+        y=alt.Y(f"{confronta_per}:N", title=confronta_per.replace("_", " ").capitalize()),
+        color=alt.Color(f"{valore}:Q", title=etichette_valori[valore] + " (€)",
+                        scale=alt.Scale(scheme="goldgreen")),
+        tooltip=["importo:Q", f"{confronta_per}:N", alt.Tooltip(f"{valore}:Q", format=",.2f")],
+    ), width="stretch")
+    st.dataframe(tabella.style.format("€ {:,.2f}"), width="stretch")
 
-        # ── Netto lavoratore ────────────────────────────────────────────────
-        st.subheader("Dal punto di vista del Lavoratore")
-        c1, c2 = st.columns(2)
-        with c1:
-            delta_piva = ((piva['netto'] / budget) - 1) * 100 if budget > 0 else 0
-            st.markdown(f"""
-            <div class="result-card" style="border-left-color: #002a52;">
-                <h4>🏃 P.IVA Forfettaria ({int(aliquota_tassa*100)}%)</h4>
-                <h2>Netto: € {piva['netto']:,.0f}</h2>
-                <small>INPS: €{piva['inps']:,.0f} | Tasse: €{piva['tasse']:,.0f}</small><br>
-                <small>Pressione effettiva: {(piva['inps']+piva['tasse'])/budget*100:.1f}%</small>
-            </div>""", unsafe_allow_html=True)
-        with c2:
-            delta_dip = ((dip['netto'] / budget) - 1) * 100 if budget > 0 else 0
-            st.markdown(f"""
-            <div class="result-card" style="border-left-color: #b8860b;">
-                <h4>📝 Co.co.co Sportivo</h4>
-                <h2>Netto: € {dip['netto']:,.0f}</h2>
-                <small>INPS quota lav.: €{dip['quota_lav']:,.0f} | IRPEF: €{dip['irpef_lorda']:,.0f}</small><br>
-                <small>Pressione effettiva: {(dip['quota_lav']+dip['irpef_lorda'])/budget*100:.1f}%</small>
-            </div>""", unsafe_allow_html=True)
-
-        # ── Costo committente ────────────────────────────────────────────────
-        st.subheader("Dal punto di vista del Committente (ASD/SSD)")
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown(f"""
-            <div class="result-card" style="border-left-color: #002a52;">
-                <h4>🏃 Se usa P.IVA</h4>
-                <h2>Costo: € {budget:,.0f}</h2>
-                <small>Nessun onere contributivo aggiuntivo.<br>
-                Il lavoratore versa INPS in proprio.</small>
-            </div>""", unsafe_allow_html=True)
-        with c2:
-            st.markdown(f"""
-            <div class="result-card" style="border-left-color: #b8860b;">
-                <h4>📝 Se usa Co.co.co.</h4>
-                <h2>Costo: € {dip['costo_committente']:,.0f}</h2>
-                <small>+€{dip['quota_comm']:,.0f} di INPS quota committente (2/3).<br>
-                Versamento F24 entro il 16 del mese succ.</small>
-            </div>""", unsafe_allow_html=True)
-
-        # ── Tabella comparativa sintetica ────────────────────────────────────
-        vincitore_lav   = "P.IVA" if piva['netto'] >= dip['netto'] else "Co.co.co."
-        vincitore_comm  = "P.IVA" if budget <= dip['costo_committente'] else "Co.co.co."
-        diff_netto      = abs(piva['netto'] - dip['netto'])
-        diff_costo      = abs(budget - dip['costo_committente'])
 
-        df_comp = pd.DataFrame({
-            "Voce": [
-                "Compenso lordo",
-                "INPS totale lavoratore",
-                "IRPEF / Imposta sostitutiva",
-                "NETTO LAVORATORE",
-                "COSTO COMMITTENTE",
-                "Pressione fiscale+prev. (lavoratore)",
-            ],
-            "P.IVA Forfettaria": [
-                f"€ {budget:,.0f}",
-                f"€ {piva['inps']:,.0f}",
-                f"€ {piva['tasse']:,.0f}",
-                f"€ {piva['netto']:,.0f}",
-                f"€ {budget:,.0f}",
-                f"{(piva['inps']+piva['tasse'])/budget*100:.1f}%",
-            ],
-            "Co.co.co. Sportivo": [
-                f"€ {budget:,.0f}",
-                f"€ {dip['quota_lav']:,.0f} (quota 1/3)",
-                f"€ {dip['irpef_lorda']:,.0f}",
-                f"€ {dip['netto']:,.0f}",
-                f"€ {dip['costo_committente']:,.0f}",
-                f"{(dip['quota_lav']+dip['irpef_lorda'])/budget*100:.1f}%",
-            ],
-        })
-        st.table(df_comp)
-
-        st.info(
-            f"📌 **Convenienza lavoratore:** {vincitore_lav} (+€{diff_netto:,.0f} di netto)  \n"
-            f"📌 **Convenienza committente:** {vincitore_comm} (−€{diff_costo:,.0f} di costo)"
-        )
+with tab_confronto:
+    sezione_confronto(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TAB 4 – FATTURA PDF
 # ═══════════════════════════════════════════════════════════════════════════════
-with tab_fattura:
+@st.fragment
+@cronometra("tab.fattura")
+def sezione_fattura():
     st.markdown("<div class='sport-header'>Generatore Fattura / Nota di Competenza</div>", unsafe_allow_html=True)
     with st.form("form_pdf"):
         c1, c2 = st.columns(2)
@@ -820,28 +909,374 @@ with tab_fattura:
         riv  = st.checkbox("Rivalsa 4%", value=True)
         bol  = st.checkbox("Bollo €2", value=True)
         if st.form_submit_button("SCARICA PDF"):
-            val_riv  = imp * 0.04 if riv else 0.0
-            tot_lordo = imp + val_riv
-            val_bol  = 2.0 if bol and tot_lordo > 77.47 else 0.0
-            tot_pag  = tot_lordo + val_bol
-            dati = {
-                "mittente": mitt, "destinatario": dest,
-                "numero": num, "data": data.strftime("%d/%m/%Y"),
-                "descrizione": desc, "compenso": imp,
-                "rivalsa": val_riv, "totale_lordo": tot_lordo,
-                "bollo": val_bol, "totale_pagare": tot_pag
-            }
+            from fattura import create_pdf, nome_file_fattura, prepara_dati  # fpdf solo qui
+            dati = prepara_dati(mitt, dest, num, data.strftime("%d/%m/%Y"), desc, imp, riv, bol)
             try:
                 pdf_bytes = create_pdf(dati)
                 b64  = base64.b64encode(pdf_bytes).decode()
-                href = (
+                st.session_state["link_pdf"] = (
                     f'<a href="data:application/octet-stream;base64,{b64}" '
-                    f'download="Fattura_{num.replace("/","_")}.pdf" '
+                    f'download="{nome_file_fattura(num)}" '
                     f'style="background-color: #D4AF37; color: #001529; padding: 10px 20px; '
                     f'text-decoration: none; border-radius: 5px; font-weight: bold;">📥 SCARICA PDF</a>'
                 )
-                st.markdown(href, unsafe_allow_html=True)
             except Exception as e:
                 st.error(f"Errore generazione PDF: {e}")
+    if "link_pdf" in st.session_state:
+        st.markdown(st.session_state["link_pdf"], unsafe_allow_html=True)
+
+    # ── Generazione massiva ─────────────────────────────────────────────────
+    st.subheader("📦 Generazione massiva (ZIP)")
+    with st.expander("ℹ️ Formato del file"):
+        st.markdown("""
+        File **CSV** con una riga per fattura e colonne `destinatario`, `numero`, `data`,
+        `compenso` (obbligatorie), `descrizione`, `rivalsa`, `bollo` (sì / no, facoltative).  
+        Il mittente è quello indicato qui sotto.
+        """)
+    file_fatture = st.file_uploader("Carica elenco fatture", type=["csv"], key="upl_fatture")
+    mitt_bulk = st.text_area("Tuoi Dati (mittente)", "Nome Cognome\nIndirizzo\nP.IVA", key="mitt_bulk")
+    if file_fatture is not None and st.button("GENERA ZIP", key="btn_zip",
+                                              disabled=_lavoro_attivo("fatture")):
+        from fattura import prepara_dati
+        try:
+            elenco = pd.read_csv(file_fatture, sep=None, engine="python", dtype=str).fillna("")
+            elenco.columns = [c.strip().lower() for c in elenco.columns]
+            si = {"1", "true", "vero", "si", "sì", "x"}
+            record = [
+                prepara_dati(
+                    mitt_bulk, r["destinatario"].replace("\\n", "\n"), r["numero"], r["data"],
+                    r.get("descrizione") or desc,
+                    float(r["compenso"].replace(",", ".")),
+                    r.get("rivalsa", "sì").strip().lower() in si,
+                    r.get("bollo", "sì").strip().lower() in si,
+                )
+                for r in elenco.to_dict("records")
+            ]
+            _avvia_lavoro("fatture", "fatture", _lavoro_fatture, record,
+                          descrizione=f"{len(record):,} fatture")
+        except KeyError as e:
+            st.error(f"Colonna mancante nel file: {e}")
+        except Exception as e:
+            st.error(f"Errore generazione ZIP: {e}")
+
+    if _lavoro_attivo("fatture"):
+        _avanzamento_lavoro("fatture", "Generazione PDF")
+    lavoro = _lavoro_concluso("fatture")
+    if lavoro is not None:
+        zip_nuovo = lavoro.risultato if lavoro.stato == "completato" else lavoro.parziale
+        if lavoro.stato == "annullato":
+            st.info(f"Generazione annullata: lo ZIP contiene le prime "
+                    f"{zip_nuovo['n'] if zip_nuovo else 0:,} fatture.")
+        elif lavoro.stato == "errore":
+            st.error(f"Errore generazione ZIP: {lavoro.errore}")
+        if zip_nuovo and not zip_nuovo["n"]:
+            os.remove(zip_nuovo["percorso"])        # annullato prima della prima fattura
+        elif zip_nuovo:
+            precedente = st.session_state.get("zip_fatture")
+            if precedente and os.path.exists(precedente["percorso"]):
+                os.remove(precedente["percorso"])
+            st.session_state["zip_fatture"] = zip_nuovo
+
+    zip_fatture = st.session_state.get("zip_fatture")
+    if zip_fatture and os.path.exists(zip_fatture["percorso"]):
+        with open(zip_fatture["percorso"], "rb") as f:
+            st.download_button(f"📥 SCARICA ZIP ({zip_fatture['n']:,} fatture)", f,
+                               file_name="Fatture.zip", mime="application/zip")
+
+
+with tab_fattura:
+    sezione_fattura()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TAB 5 – IMPORT ROSTER (CSV / EXCEL)
+# ═══════════════════════════════════════════════════════════════════════════════
+@st.fragment
+@cronometra("tab.roster")
+def sezione_roster(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato):
+    st.markdown("<div class='sport-header'>Import Roster e Simulazione Paghe</div>", unsafe_allow_html=True)
+
+    with st.expander("ℹ️ Formato del file"):
+        st.markdown("""
+        File **CSV** (separatore `,` o `;`) o **Excel** (.xlsx), una riga per collaboratore.  
+        Colonne: `nome`, `importo` (obbligatoria), `regime` (piva / cococo), `rivalsa`, `bollo`,
+        `aliquota` (5 / 15), `assicurato` (sì / no).  
+        Le colonne assenti usano le impostazioni qui sotto e della barra laterale.
+        """)
 
-st.markdown("<br><center style='color: #D4AF37; font-size: 0.8em;'>Studio Gaetani © 2025 | Normativa aggiornata al 2025 | D.Lgs. 36/2021</center>", unsafe_allow_html=True)
+    file_roster = st.file_uploader("Carica roster", type=["csv", "xlsx"])
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        regime_default = st.selectbox("Regime predefinito", ["piva", "cococo"], key="roster_regime")
+    with c2:
+        riv_default = st.checkbox("Rivalsa INPS 4% (predefinita)", value=True, key="roster_riv")
+    with c3:
+        bol_default = st.checkbox("Bollo € 2,00 (predefinito)", value=True, key="roster_bol")
+
+    if file_roster is not None and st.button("ELABORA ROSTER", key="btn_roster",
+                                             disabled=_lavoro_attivo("roster")):
+        _avvia_lavoro("roster", "roster", _lavoro_roster, file_roster.getvalue(), file_roster.name,
+                      descrizione=file_roster.name, rivalsa=riv_default, bollo=bol_default,
+                      aliquota=aliquota_tassa, assicurato=gia_assicurato, regime=regime_default,
+                      anno=anno_fiscale)
+
+    if _lavoro_attivo("roster"):
+        _avanzamento_lavoro("roster", "Elaborazione")
+    lavoro = _lavoro_concluso("roster")
+    if lavoro is not None:
+        nuovo = lavoro.risultato if lavoro.stato == "completato" else lavoro.parziale
+        if lavoro.stato == "errore":
+            st.error(f"Errore elaborazione roster: {lavoro.errore}")
+        elif lavoro.stato == "annullato" and nuovo:
+            nuovo["totali"] = _totali_roster(nuovo["percorso"])
+            st.info(f"Elaborazione annullata: risultati per i primi "
+                    f"{nuovo['totali']['righe']:,} collaboratori.")
+        if lavoro.stato == "annullato" and nuovo and not nuovo["totali"]["righe"]:
+            os.remove(nuovo["percorso"])            # annullato prima del primo blocco
+        elif nuovo:
+            precedente = st.session_state.get("roster_risultato")
+            if precedente and os.path.exists(precedente["percorso"]):
+                os.remove(precedente["percorso"])
+            st.session_state["roster_risultato"] = nuovo
+
+    risultato = st.session_state.get("roster_risultato")
+    if risultato and os.path.exists(risultato["percorso"]):
+        tot = risultato["totali"]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Collaboratori", f"{tot['righe']:,}")
+        c2.metric("P.IVA / Co.co.co.", f"{tot['piva']:,} / {tot['cococo']:,}")
+        c3.metric("Netto totale", f"€ {tot['netto']:,.0f}")
+        c4.metric("Costo committente", f"€ {tot['costo_committente']:,.0f}")
+        if tot["fuori_forfettario"]:
+            st.warning(f"⚠️ {tot['fuori_forfettario']:,} collaboratori P.IVA superano la soglia "
+                       f"forfettario (€{P_anno['soglia_forfettario']:,.0f}).")
+        st.dataframe(pd.read_csv(risultato["percorso"], nrows=100), width="stretch")
+        with open(risultato["percorso"], "rb") as f:
+            st.download_button("📥 SCARICA RISULTATI CSV", f,
+                               file_name=f"simulazione_{os.path.splitext(risultato['nome'])[0]}.csv",
+                               mime="text/csv")
+
+    st.markdown("---")
+    st.subheader("📅 Paghe mensili Co.co.co. e F24")
+    st.caption("Una riga per pagamento: `lavoratore`, `committente`, `mese` (1–12 o data "
+               "dell'anno fiscale, ISO o gg/mm/aaaa), `importo`, `assicurato` facoltativa. Le soglie annue sono cumulate su tutti "
+               "i committenti, nell'ordine dei mesi.")
+    file_paghe = st.file_uploader("Carica pagamenti mensili", type=["csv", "xlsx"], key="upl_paghe")
+    if file_paghe is not None and st.button("ELABORA PAGHE", key="btn_paghe"):
+        try:
+            with st.spinner("Elaborazione paghe…"):
+                cedolini, f24 = elabora_paghe(leggi_pagamenti(file_paghe, file_paghe.name),
+                                              anno=anno_fiscale, gia_assicurato=gia_assicurato)
+            st.session_state["paghe"] = {"cedolini": cedolini, "f24": f24}
+        except Exception as e:
+            st.error(f"Errore elaborazione paghe: {e}")
+
+    paghe = st.session_state.get("paghe")
+    if paghe:
+        f24 = paghe["f24"]
+        c1, c2, c3 = st.columns(3)
+        c1.metric("INPS da versare", f"€ {f24['inps_totale'].sum():,.2f}")
+        c2.metric("Ritenute IRPEF", f"€ {f24['ritenute_irpef'].sum():,.2f}")
+        c3.metric("Totale F24", f"€ {f24['totale_f24'].sum():,.2f}")
+        st.dataframe(f24, width="stretch", hide_index=True)
+        c1, c2 = st.columns(2)
+        c1.download_button("📥 SCARICA RIEPILOGO F24", f24.to_csv(index=False),
+                           file_name=f"f24_{anno_fiscale}.csv", mime="text/csv")
+        c2.download_button("📥 SCARICA CEDOLINI", paghe["cedolini"].round(2).to_csv(index=False),
+                           file_name=f"cedolini_{anno_fiscale}.csv", mime="text/csv")
+
+    st.markdown("---")
+    st.subheader("🎯 Regime a costo minimo per la rosa")
+    st.caption("Una riga per collaboratore: `netto` minimo da garantire, `nome`, e facoltative "
+               "`forfettario` (ammesso al regime), `regime` (piva / cococo per imporlo), `rivalsa`, "
+               "`aliquota`, `assicurato`. Per ognuno si sceglie il regime che costa meno al club.")
+    file_ottim = st.file_uploader("Carica rosa con netti minimi", type=["csv", "xlsx"], key="upl_ottim")
+    c1, c2 = st.columns(2)
+    with c1:
+        budget_rosa = st.number_input("Budget del club (€, 0 = nessun vincolo)", value=0.0,
+                                      min_value=0.0, step=10000.0, key="budget_rosa")
+    with c2:
+        riv_ottim = st.checkbox("Rivalsa INPS 4% (predefinita)", value=False, key="ottim_riv",
+                                help="Per chi non ha la colonna `rivalsa`: compenso P.IVA con "
+                                     "rivalsa 4% a carico del club.")
+    if file_ottim is not None and st.button("OTTIMIZZA", key="btn_ottim"):
+        try:
+            piano, riepilogo = ottimizza_rosa(
+                leggi_rosa(file_ottim, file_ottim.name), budget=budget_rosa or None,
+                rivalsa=riv_ottim, aliquota=aliquota_tassa, assicurato=gia_assicurato,
+                anno=anno_fiscale)
+            st.session_state["ottimizzazione"] = {"piano": piano, "riepilogo": riepilogo}
+        except Exception as e:
+            st.error(f"Errore ottimizzazione: {e}")
+
+    ottim = st.session_state.get("ottimizzazione")
+    if ottim:
+        r = ottim["riepilogo"]
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Costo minimo rosa", f"€ {r['costo_totale']:,.2f}")
+        c2.metric("Risparmio vs tutti co.co.co.", f"€ {r['risparmio']:,.2f}")
+        c3.metric("P.IVA / Co.co.co.", f"{r['piva']:,} / {r['cococo']:,}")
+        if r["budget"] is not None:
+            if r["entro_budget"]:
+                st.success(f"✅ Entro budget: margine € {r['margine']:,.2f}.")
+            else:
+                st.error(f"⛔ Nessuna assegnazione rispetta il budget: mancano € {-r['margine']:,.2f} "
+                         "anche al costo minimo.")
+        st.dataframe(ottim["piano"].head(1000), width="stretch", hide_index=True)
+        st.download_button("📥 SCARICA PIANO CSV", ottim["piano"].round(2).to_csv(index=False),
+                           file_name=f"piano_rosa_{anno_fiscale}.csv", mime="text/csv")
+
+
+with tab_roster:
+    sezione_roster(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TAB 6 – SIMULAZIONE MONTE CARLO
+# ═══════════════════════════════════════════════════════════════════════════════
+COMMITTENTI_DEFAULT = pd.DataFrame({
+    "committente":       ["Club principale", "Secondo club"],
+    "distribuzione":     ["normale", "triangolare"],
+    "media":             [30000.0, 8000.0],
+    "deviazione":        [5000.0, 0.0],
+    "minimo":            [0.0, 2000.0],
+    "massimo":           [0.0, 15000.0],
+    "probabilita":       [1.0, 0.7],
+    "bonus":             [5000.0, 0.0],
+    "probabilita_bonus": [0.3, 0.0],
+})
+
+
+@st.fragment
+@cronometra("tab.simulazione")
+def sezione_simulazione(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato):
+    st.markdown("<div class='sport-header'>Simulazione Monte Carlo del reddito annuo</div>", unsafe_allow_html=True)
+    st.info("Ogni riga è un committente: il compenso annuo è estratto dalla distribuzione indicata "
+            "(normale/lognormale: media e deviazione; uniforme: minimo–massimo; triangolare: "
+            "minimo, moda = media, massimo). *probabilita* è la probabilità che il contratto si "
+            "concretizzi, *bonus* si aggiunge con *probabilita_bonus*. Come nel Confronto, il totale "
+            "è il compenso base P.IVA (senza rivalsa) e il lordo co.co.co.")
+    tabella = st.data_editor(
+        COMMITTENTI_DEFAULT, num_rows="dynamic", width="stretch", hide_index=True, key="sim_committenti",
+        column_config={
+            "distribuzione": st.column_config.SelectboxColumn(options=list(DISTRIBUZIONI), required=True),
+            "probabilita": st.column_config.NumberColumn(min_value=0.0, max_value=1.0, step=0.05),
+            "probabilita_bonus": st.column_config.NumberColumn(min_value=0.0, max_value=1.0, step=0.05),
+        },
+    )
+    c1, c2 = st.columns(2)
+    with c1:
+        scenari = st.select_slider("Scenari", [10_000, 100_000, 1_000_000, 5_000_000],
+                                   value=100_000, key="sim_scenari")
+    with c2:
+        seme = st.number_input("Seme", value=2025, min_value=0, step=1, key="sim_seme")
+
+    if st.button("SIMULA", key="btn_sim", disabled=_lavoro_attivo("simulazione")):
+        try:
+            committenti = [
+                Committente(nome=str(r.pop("committente") or f"Committente {i}"),
+                            **{k: v if k == "distribuzione" else float(v) if pd.notna(v) else 0.0
+                               for k, v in r.items()})
+                for i, r in enumerate(tabella.to_dict("records"), 1)
+            ]
+            if not committenti:
+                raise ValueError("Indicare almeno un committente")
+            for c in committenti:                   # errori di input subito, non dal lavoro
+                c.verifica()
+            _avvia_lavoro("simulazione", "simulazione", _lavoro_simulazione, committenti, scenari,
+                          aliquota_tassa, gia_assicurato, anno_fiscale, int(seme),
+                          descrizione=f"{scenari:,} scenari")
+        except ValueError as e:
+            st.error(f"Parametri non validi: {e}")
+
+    if _lavoro_attivo("simulazione"):
+        _avanzamento_lavoro("simulazione", "Simulazione")
+    lavoro = _lavoro_concluso("simulazione")
+    if lavoro is not None:
+        if lavoro.stato == "completato":
+            st.session_state["simulazione"] = lavoro.risultato
+        elif lavoro.stato == "annullato":
+            st.info("Simulazione annullata.")
+        elif lavoro.stato == "errore":
+            st.error(f"Errore nella simulazione: {lavoro.errore}")
+
+    sim = st.session_state.get("simulazione")
+    if sim:
+        riepilogo = sim["riepilogo"]
+        per_club = sim["committenti"]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Netto medio P.IVA", f"€ {riepilogo.loc['P.IVA forfettaria', 'media']:,.0f}")
+        c2.metric("Netto medio Co.co.co.", f"€ {riepilogo.loc['Co.co.co.', 'media']:,.0f}")
+        c3.metric(f"Prob. ricavi > €{P_anno['soglia_forfettario']:,.0f}", f"{sim['prob_sopra_soglia']:.2%}")
+        c4.metric("P.IVA più conveniente", f"{sim['prob_piva_migliore']:.1%} degli scenari")
+        c1, c2 = st.columns(2)
+        c1.metric("Costo atteso club – P.IVA", f"€ {per_club['costo_medio_piva'].sum():,.0f}")
+        c2.metric("Costo atteso club – Co.co.co.", f"€ {per_club['costo_medio_cococo'].sum():,.0f}")
+        if sim["prob_sopra_soglia"] > 0:
+            st.warning(f"⚠️ Nel {sim['prob_sopra_soglia']:.2%} degli scenari i ricavi superano la soglia "
+                       "del forfettario: l'anno successivo il regime non sarebbe più applicabile.")
+
+        st.markdown("#### Distribuzione del netto lavoratore (€)")
+        st.dataframe(riepilogo.style.format("€ {:,.0f}"), width="stretch")
+        import altair as alt
+        st.altair_chart(alt.Chart(sim["istogramma"]).mark_area(opacity=0.5, interpolate="step").encode(
+            x=alt.X("netto:Q", title="Netto annuo (€)"),
+            y=alt.Y("quota:Q", title="Quota di scenari", stack=None, axis=alt.Axis(format="%")),
+            color=alt.Color("regime:N", scale=alt.Scale(range=["#4FA3FF", "#D4AF37"])),
+        ), width="stretch")
+
+        st.markdown("#### Costo atteso per committente (€)")
+        st.dataframe(per_club.style.format({c: "€ {:,.0f}" for c in per_club.columns[1:]}),
+                     width="stretch", hide_index=True)
+        st.caption(f"{sim['scenari']:,} scenari, seme {sim['seme']}: stesso seme, stessi risultati.")
+
+
+with tab_simulazione:
+    sezione_simulazione(P_anno, anno_fiscale, aliquota_tassa, gia_assicurato)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TAB 7 – ARCHIVIO
+# ═══════════════════════════════════════════════════════════════════════════════
+@st.fragment
+@cronometra("tab.archivio")
+def sezione_archivio(anni):
+    st.markdown("<div class='sport-header'>Archivio dei calcoli</div>", unsafe_allow_html=True)
+    c1, c2, c3 = st.columns(3)
+    cliente = c1.text_input("Cliente", value=st.session_state.get("cliente", ""), key="arch_cliente")
+    anno = c2.selectbox("Anno fiscale", ["Tutti"] + anni, key="arch_anno")
+    regime = c3.selectbox("Regime", ["Tutti", "piva", "cococo", "confronto"], key="arch_regime")
+    filtri = {"cliente": cliente.strip() or None,
+              "anno": None if anno == "Tutti" else anno,
+              "regime": None if regime == "Tutti" else regime}
+
+    # Paginazione per chiave: pila degli id da cui parte ogni pagina già vista.
+    if st.session_state.get("arch_filtri") != filtri:
+        st.session_state["arch_filtri"] = filtri
+        st.session_state["arch_cursori"] = [None]
+    cursori = st.session_state["arch_cursori"]
+    archivio = _archivio()
+    try:
+        pagina = archivio.pagina(**filtri, prima_di=cursori[-1])
+        totale = archivio.conta(**filtri)
+    except sqlite3.Error as e:
+        st.error(f"Archivio non disponibile: {e}")
+        return
+
+    st.dataframe(pagina, width="stretch", hide_index=True, column_config={
+        c: st.column_config.NumberColumn(format="€ %.2f")
+        for c in ("importo", "netto", "costo_committente")
+    })
+    c1, c2, c3 = st.columns([1, 1, 3])
+    c1.button("◀ Più recenti", key="arch_prec", disabled=len(cursori) == 1,
+              on_click=cursori.pop)
+    c2.button("Più vecchi ▶", key="arch_succ", disabled=len(pagina) < DIMENSIONE_PAGINA,
+              on_click=cursori.append, args=(int(pagina["id"].iloc[-1]) if len(pagina) else None,))
+    c3.caption(f"Pagina {len(cursori)} · {totale:,} calcoli archiviati con questi filtri")
+
+    if len(pagina):
+        scelto = st.selectbox("Dettaglio del calcolo", pagina["id"], key="arch_dettaglio")
+        st.json(archivio.dettaglio(scelto), expanded=1)
+
+
+with tab_archivio:
+    sezione_archivio(anni)
+
+st.markdown(f"<br><center style='color: #D4AF37; font-size: 0.8em;'>Studio Gaetani © 2025 | Normativa aggiornata al {P_anno.anno} | D.Lgs. 36/2021</center>", unsafe_allow_html=True)
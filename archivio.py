@@ -0,0 +1,227 @@
+"""
+Archivio locale dei calcoli su SQLite (modalità WAL).
+
+Ogni calcolo archiviato conserva input e output (JSON) e l'impronta dei
+parametri dell'anno fiscale usati (ParametriAnno.impronta): un calcolo
+rifatto con parametri diversi si riconosce dalla cronologia. Cliente, anno,
+regime e i valori principali (importo inserito, netto, costo committente)
+sono colonne indicizzate.
+
+Le elaborazioni batch entrano con un solo executemany in una transazione,
+con input e output serializzati da pandas (to_json) e non riga per riga.
+
+La cronologia è paginata per chiave: ogni pagina riparte dall'id dell'ultima
+riga della precedente (WHERE id < ? ORDER BY id DESC LIMIT n). C'è un indice
+per ogni combinazione dei filtri cliente / anno / regime, sempre chiuso da
+id: qualunque filtro si scelga la pagina è una lettura in ordine da un
+indice, e il costo non cresce con le righe archiviate né con la profondità
+della pagina, anche con milioni di calcoli. Con chiavi costanti dentro un
+batch gli indici aggiuntivi costano poco in inserimento.
+
+Il database è in SIMULATORE_ARCHIVIO (default archivio.sqlite3 accanto
+all'applicazione). Una connessione per thread: Streamlit serve le sessioni
+da thread diversi e in WAL i lettori non bloccano chi scrive.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from itertools import repeat
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from parametri import parametri
+
+PERCORSO_DEFAULT = os.environ.get("SIMULATORE_ARCHIVIO") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "archivio.sqlite3")
+DIMENSIONE_PAGINA = 50
+COLONNE_CRONOLOGIA = [
+    "id", "creato", "utente", "cliente", "anno", "regime", "tipo",
+    "importo", "netto", "costo_committente", "versione_parametri",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calcoli (
+    id                  INTEGER PRIMARY KEY,
+    creato              TEXT NOT NULL,
+    utente              TEXT NOT NULL DEFAULT '',
+    cliente             TEXT NOT NULL DEFAULT '',
+    anno                INTEGER NOT NULL,
+    regime              TEXT NOT NULL,
+    tipo                TEXT NOT NULL,
+    importo             REAL,
+    netto               REAL,
+    costo_committente   REAL,
+    versione_parametri  TEXT NOT NULL,
+    input               TEXT NOT NULL,
+    output              TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calcoli_c   ON calcoli (cliente, id);
+CREATE INDEX IF NOT EXISTS calcoli_ca  ON calcoli (cliente, anno, id);
+CREATE INDEX IF NOT EXISTS calcoli_cr  ON calcoli (cliente, regime, id);
+CREATE INDEX IF NOT EXISTS calcoli_car ON calcoli (cliente, anno, regime, id);
+CREATE INDEX IF NOT EXISTS calcoli_a   ON calcoli (anno, id);
+CREATE INDEX IF NOT EXISTS calcoli_ar  ON calcoli (anno, regime, id);
+CREATE INDEX IF NOT EXISTS calcoli_r   ON calcoli (regime, id);
+"""
+
+_INSERISCI = (f"INSERT INTO calcoli ({', '.join(COLONNE_CRONOLOGIA[1:])}, input, output) "
+              f"VALUES ({', '.join('?' * (len(COLONNE_CRONOLOGIA) + 1))})")
+
+
+def _serializzabile(valore):
+    if isinstance(valore, np.generic):
+        return valore.item()
+    if isinstance(valore, (date, datetime)):
+        return valore.isoformat()
+    raise TypeError(f"Valore non archiviabile: {type(valore).__name__}")
+
+
+def _json(valore) -> str:
+    return json.dumps(valore, ensure_ascii=False, default=_serializzabile)
+
+
+def _adesso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _costo(risultato) -> Optional[float]:
+    """Costo per il committente: esplicito nel co.co.co., il fatturato per la P.IVA."""
+    for chiave in ("costo_committente", "fatturato"):
+        if chiave in risultato:
+            return risultato[chiave]
+    return None
+
+
+class Archivio:
+    """Calcoli archiviati in un file SQLite, con cronologia paginata e filtrabile."""
+
+    def __init__(self, percorso: str = PERCORSO_DEFAULT):
+        self.percorso = percorso
+        self._locale = threading.local()
+        self._lock = threading.Lock()
+        self._schema_pronto = False
+
+    def _connessione(self) -> sqlite3.Connection:
+        conn = getattr(self._locale, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.percorso, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._schema_pronto:
+                    conn.executescript(_SCHEMA)
+                    self._schema_pronto = True
+            self._locale.conn = conn
+        return conn
+
+    def chiudi(self) -> None:
+        """Chiude la connessione del thread corrente."""
+        conn = getattr(self._locale, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._locale.conn = None
+
+    @cronometra("archivio.registra")
+    def registra(self, regime: str, tipo: str, ingresso: dict, risultato,
+                 cliente: str = "", anno: Optional[int] = None, utente: str = "") -> int:
+        """
+        Archivia un calcolo singolo e ne restituisce l'id.
+
+        `ingresso` contiene gli input (con "importo", l'importo inserito);
+        `risultato` è il record o il dict restituito dal motore.
+        """
+        P = parametri(anno)
+        risultato = dict(risultato)
+        riga = (_adesso(), utente, cliente, P.anno, regime, tipo,
+                ingresso.get("importo"), risultato.get("netto"), _costo(risultato),
+                P.impronta, _json(ingresso), _json(risultato))
+        conn = self._connessione()
+        with conn:
+            return conn.execute(_INSERISCI, riga).lastrowid
+
+    @cronometra("archivio.registra_batch")
+    def registra_batch(self, regime: str, tipo: str, importi, risultati: pd.DataFrame,
+                       opzioni: Optional[dict] = None, cliente: str = "",
+                       anno: Optional[int] = None, utente: str = "") -> int:
+        """
+        Archivia un'elaborazione batch: una riga per importo, in una sola transazione.
+
+        `risultati` è il DataFrame del motore batch (una riga per importo);
+        `opzioni` gli input comuni a tutte le righe. Restituisce le righe inserite.
+        """
+        P = parametri(anno)
+        importi = np.asarray(importi, dtype=float).reshape(-1)
+        if len(importi) != len(risultati):
+            raise ValueError("Importi e risultati hanno lunghezze diverse")
+        if not len(importi):
+            return 0
+        ingressi = (pd.DataFrame({"importo": importi}).assign(**(opzioni or {}))
+                    .to_json(orient="records", lines=True).splitlines())
+        uscite = risultati.to_json(orient="records", lines=True).splitlines()
+        netto = risultati["netto"].tolist()
+        costo = _costo(risultati)
+        costo = costo.tolist() if costo is not None else repeat(None)
+        righe = zip(repeat(_adesso()), repeat(utente), repeat(cliente), repeat(P.anno),
+                    repeat(regime), repeat(tipo), importi.tolist(), netto, costo,
+                    repeat(P.impronta), ingressi, uscite)
+        conn = self._connessione()
+        with conn:
+            conn.executemany(_INSERISCI, righe)
+        conn.execute("PRAGMA optimize")
+        return len(importi)
+
+    @staticmethod
+    def _dove(**filtri) -> tuple:
+        """Clausola WHERE (con spazio finale, vuota senza filtri) e valori per i filtri non None."""
+        colonne = {"cliente": "cliente = ?", "anno": "anno = ?", "regime": "regime = ?",
+                   "prima_di": "id < ?"}
+        condizioni = [(colonne[nome], valore) for nome, valore in filtri.items()
+                      if valore is not None]
+        if not condizioni:
+            return "", []
+        return f"WHERE {' AND '.join(c for c, _ in condizioni)} ", [v for _, v in condizioni]
+
+    @cronometra("archivio.pagina")
+    def pagina(self, cliente: Optional[str] = None, anno: Optional[int] = None,
+               regime: Optional[str] = None, prima_di: Optional[int] = None,
+               limite: int = DIMENSIONE_PAGINA) -> pd.DataFrame:
+        """
+        Calcoli più recenti con i filtri indicati (colonne COLONNE_CRONOLOGIA).
+
+        Per la pagina successiva passare in `prima_di` l'ultimo id ricevuto.
+        """
+        dove, valori = self._dove(cliente=cliente, anno=anno, regime=regime, prima_di=prima_di)
+        righe = self._connessione().execute(
+            f"SELECT {', '.join(COLONNE_CRONOLOGIA)} FROM calcoli {dove}"
+            "ORDER BY id DESC LIMIT ?", (*valori, int(limite))).fetchall()
+        return pd.DataFrame(righe, columns=COLONNE_CRONOLOGIA)
+
+    @cronometra("archivio.conta")
+    def conta(self, cliente: Optional[str] = None, anno: Optional[int] = None,
+              regime: Optional[str] = None) -> int:
+        """
+        Calcoli archiviati con i filtri indicati.
+
+        Conta sull'indice del filtro (o su quello più piccolo, senza filtri):
+        il costo cresce con le righe che corrispondono, a differenza di pagina().
+        """
+        dove, valori = self._dove(cliente=cliente, anno=anno, regime=regime)
+        return self._connessione().execute(f"SELECT COUNT(*) FROM calcoli {dove}",
+                                           valori).fetchone()[0]
+
+    def dettaglio(self, id_calcolo: int) -> Optional[dict]:
+        """Riga completa di un calcolo, con input e output decodificati (None se assente)."""
+        conn = self._connessione()
+        riga = conn.execute(
+            f"SELECT {', '.join(COLONNE_CRONOLOGIA)}, input, output FROM calcoli WHERE id = ?",
+            (int(id_calcolo),)).fetchone()
+        if riga is None:
+            return None
+        dati = dict(zip(COLONNE_CRONOLOGIA + ["input", "output"], riga))
+        dati["input"], dati["output"] = json.loads(dati["input"]), json.loads(dati["output"])
+        return dati
@@ -0,0 +1,101 @@
+"""
+Costo lato server di un'interazione nella pagina Streamlit.
+
+Per ogni script indicato misura, con AppTest (nessun browser), il tempo di
+esecuzione e i byte dei messaggi inviati al browser per:
+  - un rerun completo (ciò che costava ogni click prima dei fragment, e che
+    costano ancora login, barra laterale e cambio anno);
+  - il rerun della sola tab (st.fragment), se lo script ne definisce.
+Le misure partono con i risultati di P.IVA, co.co.co. e confronto già a video.
+
+Per confrontare con una versione precedente della pagina:
+    git show <commit>:app.py > app_prima.py
+    python benchmarks/bench_app.py app_prima.py app.py
+"""
+import functools
+import os
+import statistics
+import sys
+import time
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData  # noqa: E402
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner  # noqa: E402
+
+TAB = ["P.IVA", "Co.co.co.", "Confronto", "Fattura", "Roster", "Simulazione"]
+_ultimo_run = {"secondi": 0.0, "byte": 0}
+_parse_originale = local_script_runner.parse_tree_from_messages
+_run_script_originale = local_script_runner.LocalScriptRunner._run_script
+
+
+def _parse_e_misura(messaggi):
+    _ultimo_run["byte"] = sum(m.ByteSize() for m in messaggi)
+    return _parse_originale(messaggi)
+
+
+def _run_script_cronometrato(self, rerun_data):
+    # Solo l'esecuzione dello script, senza l'avvio del runner di AppTest.
+    t0 = time.perf_counter()
+    try:
+        return _run_script_originale(self, rerun_data)
+    finally:
+        _ultimo_run["secondi"] = time.perf_counter() - t0
+
+
+local_script_runner.parse_tree_from_messages = _parse_e_misura
+# AppTest ricompila lo script a ogni run; il server lo tiene in cache.
+_script_cache = ScriptCache()
+app_test.ScriptCache = local_script_runner.ScriptCache = lambda: _script_cache
+local_script_runner.LocalScriptRunner._run_script = _run_script_cronometrato
+
+
+def _misura(esegui, ripetizioni: int):
+    tempi = []
+    for _ in range(ripetizioni):
+        esegui()
+        tempi.append(_ultimo_run["secondi"])
+    return statistics.median(tempi) * 1000, _ultimo_run["byte"] / 1024
+
+
+def _rerun_fragment(at: AppTest, fragment_id: str) -> None:
+    """Rerun della sola tab, come dopo un click su un widget al suo interno."""
+    local_script_runner.RerunData = functools.partial(RerunData, fragment_id_queue=[fragment_id])
+    try:
+        at.run()
+    finally:
+        local_script_runner.RerunData = RerunData
+
+
+def run(script: str, ripetizioni: int) -> None:
+    at = AppTest.from_file(os.path.abspath(script), default_timeout=60)
+    at.session_state["password_correct"] = True
+    at.run()
+    for chiave in ("btn_piva", "btn_dip", "btn_conf"):
+        at.button(key=chiave).click().run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    print(f"{script}")
+    ms, kib = _misura(at.run, ripetizioni)
+    print(f"  rerun completo        {ms:8.1f} ms   {kib:8.1f} KiB")
+    # Accesso interno: AppTest non espone i fragment registrati.
+    registro = at._fragment_storage._registration_sequence_by_id
+    fragment = sorted(registro, key=registro.get)
+
+    def click_calcola():
+        at.button(key="btn_piva").click()
+        _rerun_fragment(at, fragment[0]) if fragment else at.run()
+
+    ms, kib = _misura(click_calcola, ripetizioni)
+    print(f"  click CALCOLA P.IVA   {ms:8.1f} ms   {kib:8.1f} KiB")
+    for nome, fragment_id in zip(TAB, fragment):
+        ms, kib = _misura(lambda: _rerun_fragment(at, fragment_id), ripetizioni)
+        print(f"  rerun tab {nome:<11} {ms:8.1f} ms   {kib:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    for percorso in sys.argv[1:] or [os.path.join(RADICE, "app.py")]:
+        run(percorso, ripetizioni=20)
@@ -0,0 +1,104 @@
+"""
+Avvio a freddo della pagina Streamlit: tempo al primo render del login e picco di RSS.
+
+Ogni misura è un interprete Python nuovo, come il primo utente dopo che il
+container è ripartito da zero:
+  - avvio_streamlit_s: import di streamlit (ciò che fa il server all'avvio);
+  - primo_render_s: prima esecuzione dello script fino alla pagina di login
+    (AppTest, nessun browser), con gli import dello script;
+  - picco_rss_kib: picco di memoria residente del processo a login mostrato.
+Sono riportati anche i moduli caricati e se pandas / numpy / fpdf lo sono già.
+
+Uso:
+    python benchmarks/bench_avvio.py [SCRIPT ...] [--ripetizioni 5]
+    git show <commit>:app.py > app_prima.py
+    python benchmarks/bench_avvio.py app_prima.py app.py
+
+Con --singola stampa in JSON una sola misura nel processo corrente: la usa
+suite.py (caso avvio.login), che tiene lo storico in baseline.json.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+APP = os.path.join(RADICE, "app.py")
+MODULI_PESANTI = ("pandas", "numpy", "fpdf")
+
+
+def _picco_rss_kib() -> int:
+    # Su Linux ru_maxrss sopravvive a exec (il picco del processo che ha lanciato
+    # la misura): VmHWM riparte dal nuovo programma.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for riga in f:
+                if riga.startswith("VmHWM:"):
+                    return int(riga.split()[1])
+    except OSError:
+        pass
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return picco // 1024 if sys.platform == "darwin" else picco     # macOS: byte
+
+
+def misura_singola(script: str = APP) -> dict:
+    """Una misura nel processo corrente, che deve essere appena partito."""
+    inizio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    avviato = time.perf_counter()
+    at = AppTest.from_file(os.path.abspath(script), default_timeout=60).run()
+    fine = time.perf_counter()
+    if at.exception:
+        raise RuntimeError(f"Errore nello script: {at.exception[0].message}")
+    if "username" not in {e.key for e in at.text_input}:
+        raise RuntimeError("Pagina di login non mostrata")
+    return {
+        "avvio_streamlit_s": avviato - inizio,
+        "primo_render_s": fine - avviato,
+        "picco_rss_kib": _picco_rss_kib(),
+        "moduli": len(sys.modules),
+        **{f"{m}_caricato": m in sys.modules for m in MODULI_PESANTI},
+    }
+
+
+def misura_a_freddo(script: str = APP) -> dict:
+    """Una misura in un interprete nuovo, con il tempo totale del processo."""
+    inizio = time.perf_counter()
+    uscita = subprocess.run([sys.executable, os.path.abspath(__file__), "--singola",
+                             os.path.abspath(script)],
+                            capture_output=True, text=True, check=True, cwd=RADICE)
+    risultato = json.loads(uscita.stdout.strip().splitlines()[-1])
+    risultato["totale_s"] = time.perf_counter() - inizio
+    return risultato
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("script", nargs="*", default=[APP])
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--singola", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.singola:
+        print(json.dumps(misura_singola(args.script[0])))
+        return 0
+    print(f"{'script':<24} {'streamlit':>10} {'1° render':>10} {'totale':>10} "
+          f"{'picco RSS':>11}  già caricati")
+    for script in args.script:
+        misure = [misura_a_freddo(script) for _ in range(args.ripetizioni)]
+        mediana = {k: statistics.median(m[k] for m in misure)
+                   for k in ("avvio_streamlit_s", "primo_render_s", "totale_s", "picco_rss_kib")}
+        caricati = [m for m in MODULI_PESANTI if misure[-1][f"{m}_caricato"]]
+        print(f"{os.path.basename(script):<24} {mediana['avvio_streamlit_s'] * 1e3:8.0f}ms "
+              f"{mediana['primo_render_s'] * 1e3:8.0f}ms {mediana['totale_s'] * 1e3:8.0f}ms "
+              f"{mediana['picco_rss_kib'] / 1024:8.1f}MiB  {', '.join(caricati) or '—'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
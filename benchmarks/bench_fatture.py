@@ -0,0 +1,51 @@
+"""
+Benchmark generazione massiva fatture: fatture al secondo, seriale vs pool.
+
+Uso:  python benchmarks/bench_fatture.py [N ...]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fattura import create_pdf, genera_fatture_zip, prepara_dati  # noqa: E402
+
+
+def _elenco(n: int):
+    return [
+        prepara_dati(
+            "Mario Rossi\nVia Roma 1, Gaeta\nP.IVA 01234567890",
+            f"ASD Esempio {i % 40}\nVia dello Sport {i % 40}\n04024 Gaeta (LT)",
+            f"2026/{i + 1:05d}", "31/01/2026",
+            "Prestazione sportiva ai sensi del D.Lgs. 36/2021",
+            500.0 + (i % 300) * 10, i % 2 == 0, True,
+        )
+        for i in range(n)
+    ]
+
+
+def run(n: int) -> None:
+    elenco = _elenco(n)
+    create_pdf(elenco[0])                       # riscaldamento (note legali in cache)
+
+    t0 = time.perf_counter()
+    buf = io.BytesIO()
+    genera_fatture_zip(elenco, buf, processi=1)
+    t_seriale = time.perf_counter() - t0
+
+    processi = os.cpu_count() or 1
+    t0 = time.perf_counter()
+    buf_p = io.BytesIO()
+    genera_fatture_zip(elenco, buf_p, processi=processi)
+    t_pool = time.perf_counter() - t0
+
+    print(f"N = {n:>6,}  ZIP {buf.tell() / 1024:,.0f} KiB")
+    print(f"  seriale          {n / t_seriale:8,.0f} fatture/s  ({t_seriale:.2f}s)")
+    print(f"  pool x{processi:<2}         {n / t_pool:8,.0f} fatture/s  ({t_pool:.2f}s)")
+
+
+if __name__ == "__main__":
+    for size in [int(a) for a in sys.argv[1:]] or [500, 5_000]:
+        run(size)
@@ -0,0 +1,131 @@
+"""
+Load test locale del servizio HTTP (servizio.py): richieste/s e latenze.
+
+Avvia il servizio in un processo separato (un solo worker, quindi un core) e
+lo interroga con N connessioni keep-alive concorrenti, con un client HTTP/1.1
+minimale su asyncio (nessuna dipendenza aggiuntiva).
+
+Uso:  python benchmarks/bench_servizio.py [--connessioni 32] [--secondi 5] [--porta 8599]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _leggi_risposta(reader) -> bytes:
+    intestazione = await reader.readuntil(b"\r\n\r\n")
+    righe = intestazione.decode("latin-1").split("\r\n")
+    stato = int(righe[0].split()[1])
+    campi = {k.lower(): v.strip() for k, _, v in (r.partition(":") for r in righe[1:] if r)}
+    if campi.get("transfer-encoding") == "chunked":
+        parti = []
+        while True:
+            dimensione = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            parti.append(await reader.readexactly(dimensione + 2))
+            if dimensione == 0:
+                break
+        corpo = b"".join(p[:-2] for p in parti)
+    else:
+        corpo = await reader.readexactly(int(campi.get("content-length", 0)))
+    if stato != 200:
+        raise RuntimeError(f"HTTP {stato}: {corpo[:200]!r}")
+    return corpo
+
+
+async def _richiesta(reader, writer, porta: int, percorso: str, corpo: bytes) -> bytes:
+    writer.write(
+        f"POST {percorso} HTTP/1.1\r\nHost: 127.0.0.1:{porta}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode()
+        + corpo)
+    await writer.drain()
+    return await _leggi_risposta(reader)
+
+
+async def carico(porta: int, percorso: str, genera_corpo, connessioni: int, secondi: float):
+    latenze = []
+    fine = time.perf_counter() + secondi
+
+    async def cliente():
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        try:
+            while time.perf_counter() < fine:
+                t0 = time.perf_counter()
+                await _richiesta(reader, writer, porta, percorso, genera_corpo())
+                latenze.append(time.perf_counter() - t0)
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(connessioni)))
+    durata = time.perf_counter() - t0
+    latenze.sort()
+    p = lambda q: latenze[min(int(q * len(latenze)), len(latenze) - 1)] * 1000  # noqa: E731
+    print(f"  {percorso:<18} {len(latenze) / durata:8,.0f} req/s   "
+          f"p50 {p(0.5):6.1f} ms   p99 {p(0.99):6.1f} ms")
+
+
+async def stream(porta: int, n: int) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    corpo = json.dumps({"importi": [1000.0 + i % 80_000 for i in range(n)],
+                        "rivalsa": True, "stream": True}).encode()
+    t0 = time.perf_counter()
+    risposta = await _richiesta(reader, writer, porta, "/piva/batch", corpo)
+    durata = time.perf_counter() - t0
+    writer.close()
+    righe = risposta.count(b"\n")
+    print(f"  stream /piva/batch {righe:,} righe in {durata:.2f}s ({righe / durata:,.0f} righe/s)")
+
+
+async def _attendi(porta: int, processo) -> None:
+    for _ in range(200):
+        if processo.poll() is not None:
+            raise RuntimeError("Il servizio non si è avviato")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("Timeout avvio servizio")
+
+
+async def run(args) -> None:
+    processo = subprocess.Popen([sys.executable, os.path.join(RADICE, "servizio.py"),
+                                 "--porta", str(args.porta)], cwd=RADICE,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await _attendi(args.porta, processo)
+        print(f"Servizio su :{args.porta}, {args.connessioni} connessioni, {args.secondi}s per prova")
+        importo = lambda: round(random.uniform(1_000, 80_000), 2)  # noqa: E731
+        await carico(args.porta, "/piva",
+                     lambda: json.dumps({"compenso": importo(), "rivalsa": True}).encode(),
+                     args.connessioni, args.secondi)
+        await carico(args.porta, "/cococo",
+                     lambda: json.dumps({"lordo": importo()}).encode(),
+                     args.connessioni, args.secondi)
+        await carico(args.porta, "/inverso",
+                     lambda: json.dumps({"regime": "cococo", "target": importo()}).encode(),
+                     args.connessioni, args.secondi)
+        corpo_batch = json.dumps({"importi": [importo() for _ in range(1_000)]}).encode()
+        await carico(args.porta, "/piva/batch", lambda: corpo_batch,
+                     args.connessioni, args.secondi)
+        await stream(args.porta, args.stream)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connessioni", type=int, default=32)
+    parser.add_argument("--secondi", type=float, default=5.0)
+    parser.add_argument("--porta", type=int, default=8599)
+    parser.add_argument("--stream", type=int, default=1_000_000)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,389 @@
+"""
+Fuzzing differenziale: motori scalari di riferimento contro i percorsi ottimizzati.
+
+I riferimenti sono calcoli_avanzati_piva, calcola_cococo, calcola_irpef e
+calcolo_inverso_piva, chiamati riga per riga. I candidati sono
+tutte le altre strade per lo stesso risultato:
+  - motori batch NumPy;
+  - cache dei risultati (cache.py);
+  - modello tariffario compilato (tariffa.py);
+  - motori in centesimi interi (centesimi.py);
+  - pool di processi (parallelo.py);
+  - goal-seek vettoriale;
+  - andata e ritorno dell'inverso (netto ricalcolato contro il netto chiesto).
+
+Gli input sono importi al centesimo con flag, aliquota e anno fiscale
+casuali. Circa metà degli importi è concentrata attorno ai punti critici:
+  - 5.000, 15.000, 28.000, 50.000, 77,47 e 85.000 €;
+  - gli stessi punti riportati sul compenso base (÷ 1,04 con rivalsa);
+  - i punti di rottura del motore per l'anno;
+  - con scarti di 0, ±1 centesimo, ±1 €, ±100 € e ±2.000 €.
+Gli altri importi sono log-uniformi fino a 300.000 €.
+
+Per ogni candidato sono riportati lo scarto massimo in centesimi (e la colonna
+in cui cade), i casi oltre la sua tolleranza e il throughput di candidato e
+riferimento. Gli input casuali non si ripetono, quindi per la cache il
+throughput è quello dei soli miss (motore più gestione della chiave): misura
+il costo della cache, non il suo guadagno. Il primo caso che supera la tolleranza viene ridotto a un
+riproduttore minimo: flag ai default, anno predefinito, importo il più tondo e
+piccolo possibile che fallisce ancora.
+
+Uso:
+    python benchmarks/differenziale.py [--casi 1000000] [--blocco 250000] [--seme 0]
+        [--riferimento piva,cococo,irpef,inverso_piva] [--candidato TESTO] [--output FILE]
+
+Esce con codice 1 se almeno un candidato supera la tolleranza.
+"""
+import argparse
+from dataclasses import dataclass
+import json
+import os
+import sys
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+import cache  # noqa: E402
+import centesimi  # noqa: E402
+import motore  # noqa: E402
+import parallelo  # noqa: E402
+import tariffa  # noqa: E402
+from parametri import anni_disponibili, parametri  # noqa: E402
+
+PUNTI_CRITICI = (5_000.0, 15_000.0, 28_000.0, 50_000.0, 77.47, 85_000.0)
+SCARTI = (0.0, 0.01, 1.0, 100.0, 2_000.0)
+IMPORTO_MASSIMO = 300_000.0
+EPSILON_CENT = 1e-6      # rumore della differenza tra float, non uno scarto
+DEFAULT = {"apply_rivalsa": False, "apply_bollo": False, "aliquota_imp": 0.05,
+           "gia_assicurato": False}
+
+
+@dataclass(frozen=True)
+class Riferimento:
+    """Motore scalare: funzione(importo, **opzioni, anno=anno) per ogni riga."""
+    nome: str
+    funzione: Callable
+    opzioni: tuple
+    regime: Optional[str] = None        # per i punti di rottura (None: nessuno)
+
+
+@dataclass(frozen=True)
+class Candidato:
+    """
+    Percorso ottimizzato: esegui(importi, opzioni, anno) → DataFrame con le
+    colonne del riferimento (o solo `colonne`), opzioni = array per riga.
+    """
+    nome: str
+    riferimento: str
+    esegui: Callable
+    tolleranza_cent: float = 0.0
+    colonne: Optional[tuple] = None
+
+
+def _colonne(valori) -> pd.DataFrame:
+    """Risultati del riferimento (record o float) come DataFrame numerico."""
+    if isinstance(valori[0], tuple):
+        df = pd.DataFrame.from_records(valori, columns=valori[0]._fields)
+        return df.drop(columns="riduzione_attiva")
+    return pd.DataFrame({"valore": np.asarray(valori, dtype=float)})
+
+
+def _per_gruppi(importi: np.ndarray, opzioni: dict, funzione) -> pd.DataFrame:
+    """funzione(importi, **opzioni scalari) per ogni combinazione distinta di opzioni."""
+    if not opzioni:
+        return funzione(importi)
+    chiavi = pd.DataFrame(opzioni)
+    parti = []
+    for valori, righe in chiavi.groupby(list(opzioni)).indices.items():
+        valori = valori if isinstance(valori, tuple) else (valori,)
+        parti.append(funzione(importi[righe], **dict(zip(opzioni, valori))).set_axis(righe))
+    return pd.concat(parti).sort_index()
+
+
+def _euro(df: pd.DataFrame) -> pd.DataFrame:
+    # Colonna per colonna: la divisione del DataFrame intero costa più del motore.
+    return pd.DataFrame({c: v.to_numpy() / 100 for c, v in df.items() if c != "riduzione_attiva"},
+                        index=df.index, copy=False)
+
+
+def _scalari(funzione, importi, opzioni, anno) -> pd.DataFrame:
+    nomi = list(opzioni)
+    return _colonne([funzione(x, *valori, anno=anno)
+                     for x, *valori in zip(importi.tolist(), *(opzioni[n].tolist() for n in nomi))])
+
+
+RIFERIMENTI = {
+    r.nome: r for r in (
+        Riferimento("piva", motore.calcoli_avanzati_piva,
+                    ("apply_rivalsa", "apply_bollo", "aliquota_imp"), "piva"),
+        Riferimento("cococo", motore.calcola_cococo, ("gia_assicurato",), "cococo"),
+        Riferimento("irpef", motore.calcola_irpef, ()),
+        Riferimento("inverso_piva", motore.calcolo_inverso_piva,
+                    ("apply_rivalsa", "apply_bollo", "aliquota_imp"), "piva"),
+    )
+}
+
+CANDIDATI = (
+    Candidato("batch", "piva", lambda x, o, anno: motore.calcoli_avanzati_piva_batch(
+        x, o["apply_rivalsa"], o["apply_bollo"], o["aliquota_imp"], anno=anno)),
+    Candidato("cache", "piva", lambda x, o, anno: _scalari(
+        cache.calcoli_avanzati_piva, x, o, anno)),
+    Candidato("tariffa", "piva", lambda x, o, anno: _per_gruppi(
+        x, o, lambda v, **f: tariffa.compila_modello("piva", anno=anno, **f).valuta(v)),
+        tolleranza_cent=1e-4),
+    Candidato("centesimi", "piva", lambda x, o, anno: _euro(
+        centesimi.calcoli_avanzati_piva_centesimi(
+            centesimi.a_centesimi(x), o["apply_rivalsa"], o["apply_bollo"], o["aliquota_imp"],
+            anno=anno)), tolleranza_cent=3),
+    Candidato("parallelo", "piva", lambda x, o, anno: parallelo.calcola_parallelo(
+        "piva", x, anno=anno, processi=max(2, os.cpu_count() or 1), **o)),
+
+    Candidato("batch", "cococo", lambda x, o, anno: motore.calcola_cococo_batch(
+        x, o["gia_assicurato"], anno=anno)),
+    Candidato("cache", "cococo", lambda x, o, anno: _scalari(cache.calcola_cococo, x, o, anno)),
+    Candidato("tariffa", "cococo", lambda x, o, anno: _per_gruppi(
+        x, o, lambda v, **f: tariffa.compila_modello("cococo", anno=anno, **f).valuta(v)),
+        tolleranza_cent=1),
+    Candidato("centesimi", "cococo", lambda x, o, anno: _euro(
+        centesimi.calcola_cococo_centesimi(centesimi.a_centesimi(x), o["gia_assicurato"],
+                                           anno=anno)), tolleranza_cent=3),
+    Candidato("parallelo", "cococo", lambda x, o, anno: parallelo.calcola_parallelo(
+        "cococo", x, anno=anno, processi=max(2, os.cpu_count() or 1), **o)),
+
+    Candidato("batch", "irpef", lambda x, o, anno: pd.DataFrame(
+        {"valore": motore.calcola_irpef_batch(x, anno=anno)})),
+    Candidato("centesimi", "irpef", lambda x, o, anno: pd.DataFrame(
+        {"valore": centesimi.calcola_irpef_centesimi(centesimi.a_centesimi(x), anno=anno) / 100}),
+        tolleranza_cent=1),
+
+    Candidato("batch", "inverso_piva", lambda x, o, anno: motore.calcoli_avanzati_piva_batch(
+        motore.calcolo_inverso("piva", "netto", x, apply_rivalsa=o["apply_rivalsa"],
+                               aliquota_imp=o["aliquota_imp"], anno=anno),
+        o["apply_rivalsa"], o["apply_bollo"], o["aliquota_imp"], anno=anno)),
+    Candidato("cache", "inverso_piva", lambda x, o, anno: _scalari(
+        cache.calcolo_inverso_piva, x, o, anno)),
+    Candidato("andata_ritorno", "inverso_piva", lambda x, o, anno: pd.DataFrame({"netto": x}),
+              tolleranza_cent=1e-4, colonne=("netto",)),
+)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GENERAZIONE DEI CASI
+# ─────────────────────────────────────────────────────────────────────────────
+def _punti(riferimento: Riferimento, anno: int) -> np.ndarray:
+    """Punti critici nello spazio dell'input del riferimento."""
+    punti = [np.array(PUNTI_CRITICI), np.array(PUNTI_CRITICI) / 1.04]
+    if riferimento.regime is not None:
+        for flag in (False, True):
+            nodi = motore.punti_rottura(riferimento.regime, apply_rivalsa=flag,
+                                        gia_assicurato=flag, anno=anno)
+            if riferimento.nome == "inverso_piva":
+                # Input = netto: i nodi riportati sulla curva del netto.
+                nodi = motore.calcoli_avanzati_piva_batch(nodi, flag, False, 0.05,
+                                                          anno=anno)["netto"].to_numpy()
+            punti.append(np.asarray(nodi, dtype=float))
+    punti = np.unique(np.concatenate(punti))
+    return punti[(punti > 0) & (punti < IMPORTO_MASSIMO)]
+
+
+def genera_casi(rng: np.random.Generator, n: int, riferimento: Riferimento,
+                anni: tuple) -> pd.DataFrame:
+    """n casi: importo al centesimo, anno e opzioni del riferimento, per riga."""
+    anno = rng.choice(np.asarray(anni), n)
+    importo = np.empty(n)
+    vicini = rng.random(n) < 0.5
+    for a in np.unique(anno):
+        righe = np.flatnonzero((anno == a) & vicini)
+        punti = _punti(riferimento, int(a))
+        scarti = rng.choice(np.asarray(SCARTI), len(righe)) * rng.choice((-1.0, 1.0), len(righe))
+        casuali = rng.random(len(righe)) < 0.5        # metà scarto fisso, metà normale
+        scarti[casuali] = rng.normal(0.0, np.abs(scarti[casuali]))
+        importo[righe] = rng.choice(punti, len(righe)) + scarti
+    lontani = ~vicini
+    importo[lontani] = np.exp(rng.uniform(0.0, np.log(IMPORTO_MASSIMO), lontani.sum()))
+    importo[rng.random(n) < 0.01] = 0.0
+    casi = {"importo": np.maximum(np.round(importo, 2), 0.0), "anno": anno}
+    for nome in riferimento.opzioni:
+        if nome == "aliquota_imp":
+            casi[nome] = rng.choice((0.05, 0.15), n)
+        else:
+            casi[nome] = rng.random(n) < 0.5
+    return pd.DataFrame(casi)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ESECUZIONE E CONFRONTO
+# ─────────────────────────────────────────────────────────────────────────────
+def _esegui(riferimento: Riferimento, casi: pd.DataFrame, funzione) -> pd.DataFrame:
+    """funzione(importi, opzioni, anno) su ogni anno dei casi, righe nell'ordine dei casi."""
+    parti = []
+    for anno, righe in casi.groupby("anno").indices.items():
+        blocco = casi.iloc[righe]
+        opzioni = {nome: blocco[nome].to_numpy() for nome in riferimento.opzioni}
+        risultato = funzione(blocco["importo"].to_numpy(), opzioni, int(anno))
+        parti.append(risultato.reset_index(drop=True).set_axis(righe))
+    return pd.concat(parti).sort_index()
+
+
+def scarti_cent(atteso: pd.DataFrame, ottenuto: pd.DataFrame, colonne) -> pd.DataFrame:
+    """|ottenuto − atteso| in centesimi per riga e colonna (NaN da una parte sola = infinito)."""
+    a = atteso[list(colonne)].to_numpy(float)
+    o = ottenuto[list(colonne)].to_numpy(float)
+    scarti = np.abs(o - a) * 100
+    scarti[np.isnan(a) != np.isnan(o)] = np.inf
+    return pd.DataFrame(np.nan_to_num(scarti, nan=0.0), columns=list(colonne))
+
+
+def _caso_singolo(caso: dict) -> pd.DataFrame:
+    return pd.DataFrame({k: [v] for k, v in caso.items()})
+
+
+def _scarto_caso(riferimento: Riferimento, candidato: Candidato, caso: dict):
+    """(scarto massimo in centesimi, atteso, ottenuto) per un caso singolo."""
+    casi = _caso_singolo(caso)
+    atteso = _esegui(riferimento, casi,
+                     lambda x, o, anno: _scalari(riferimento.funzione, x, o, anno))
+    ottenuto = _esegui(riferimento, casi, candidato.esegui)
+    colonne = candidato.colonne or tuple(atteso.columns)
+    return float(scarti_cent(atteso, ottenuto, colonne).to_numpy().max()), atteso, ottenuto
+
+
+def _semplificazioni(caso: dict, anno_default: int):
+    """Varianti più semplici del caso, dalla più drastica."""
+    for nome, valore in caso.items():
+        if nome in DEFAULT and valore != DEFAULT[nome]:
+            yield {**caso, nome: DEFAULT[nome]}
+    if caso["anno"] != anno_default:
+        yield {**caso, "anno": anno_default}
+    x = caso["importo"]
+    candidati = [0.0] + [round(x, cifre) for cifre in (-4, -3, -2, -1, 0, 1)] + [round(x / 2, 2)]
+    for y in candidati:
+        if y != x and (y < x or len(f"{y:.2f}".rstrip("0")) < len(f"{x:.2f}".rstrip("0"))):
+            yield {**caso, "importo": y}
+
+
+def riduci(riferimento: Riferimento, candidato: Candidato, caso: dict,
+           massimo_passi: int = 200) -> dict:
+    """Caso minimo che supera ancora la tolleranza (semplificazione greedy)."""
+    anno_default = parametri().anno
+    for _ in range(massimo_passi):
+        for variante in _semplificazioni(caso, anno_default):
+            scarto = _scarto_caso(riferimento, candidato, variante)[0]
+            if scarto > candidato.tolleranza_cent + EPSILON_CENT:
+                caso = variante
+                break
+        else:
+            return caso
+    return caso
+
+
+def riproduttore(riferimento: Riferimento, candidato: Candidato, caso: dict) -> str:
+    """Chiamata al riferimento e colonne che divergono, pronte da incollare."""
+    scarto, atteso, ottenuto = _scarto_caso(riferimento, candidato, caso)
+    argomenti = ", ".join([repr(caso["importo"])]
+                          + [f"{n}={caso[n]!r}" for n in riferimento.opzioni]
+                          + [f"anno={caso['anno']}"])
+    righe = [f"    {riferimento.funzione.__module__}.{riferimento.funzione.__name__}({argomenti})"]
+    colonne = candidato.colonne or tuple(atteso.columns)
+    divergenti = scarti_cent(atteso, ottenuto, colonne).iloc[0]
+    for colonna in divergenti[divergenti > candidato.tolleranza_cent + EPSILON_CENT].index:
+        righe.append(f"      {colonna}: riferimento {float(atteso[colonna].iloc[0])!r}, "
+                     f"{candidato.nome} {float(ottenuto[colonna].iloc[0])!r} "
+                     f"({divergenti[colonna]:.4g} cent)")
+    return "\n".join(righe)
+
+
+def fuzz(riferimento: Riferimento, candidati: list, casi_totali: int, blocco: int,
+         seme: int, anni: tuple) -> list:
+    """Confronta i candidati col riferimento su `casi_totali` casi, a blocchi."""
+    rng = np.random.default_rng(seme)
+    stato = {c.nome: {"casi": 0, "oltre": 0, "scarto_cent": 0.0, "colonna": "", "secondi": 0.0,
+                      "primo": None} for c in candidati}
+    secondi_riferimento = 0.0
+    fatti = 0
+    while fatti < casi_totali:
+        casi = genera_casi(rng, min(blocco, casi_totali - fatti), riferimento, anni)
+        t0 = time.perf_counter()
+        atteso = _esegui(riferimento, casi,
+                         lambda x, o, anno: _scalari(riferimento.funzione, x, o, anno))
+        secondi_riferimento += time.perf_counter() - t0
+        for c in candidati:
+            t0 = time.perf_counter()
+            ottenuto = _esegui(riferimento, casi, c.esegui)
+            s = stato[c.nome]
+            s["secondi"] += time.perf_counter() - t0
+            scarti = scarti_cent(atteso, ottenuto, c.colonne or tuple(atteso.columns))
+            per_riga = scarti.to_numpy().max(axis=1)
+            s["casi"] += len(casi)
+            if per_riga.max() > s["scarto_cent"]:
+                s["scarto_cent"] = float(per_riga.max())
+                s["colonna"] = str(scarti.max().idxmax())
+            oltre = np.flatnonzero(per_riga > c.tolleranza_cent + EPSILON_CENT)
+            s["oltre"] += len(oltre)
+            if len(oltre) and s["primo"] is None:
+                s["primo"] = casi.iloc[oltre[:1]].to_dict("records")[0]
+        fatti += len(casi)
+
+    risultati = []
+    for c in candidati:
+        s = stato[c.nome]
+        risultato = {
+            "riferimento": riferimento.nome, "candidato": c.nome, "casi": s["casi"],
+            "scarto_max_cent": s["scarto_cent"], "colonna": s["colonna"],
+            "tolleranza_cent": c.tolleranza_cent, "oltre_tolleranza": s["oltre"],
+            "candidato_righe_s": s["casi"] / s["secondi"] if s["secondi"] else None,
+            "riferimento_righe_s": fatti / secondi_riferimento if secondi_riferimento else None,
+        }
+        if s["primo"] is not None:
+            minimo = riduci(riferimento, c, s["primo"])
+            risultato["caso_minimo"] = minimo
+            risultato["riproduttore"] = riproduttore(riferimento, c, minimo)
+        risultati.append(risultato)
+    return risultati
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--casi", type=int, default=1_000_000, help="casi per riferimento")
+    parser.add_argument("--blocco", type=int, default=250_000)
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--riferimento", default=",".join(RIFERIMENTI),
+                        help="riferimenti separati da virgola")
+    parser.add_argument("--candidato", default="",
+                        help="solo i candidati il cui nome contiene il testo")
+    parser.add_argument("--output", help="risultati anche in JSON")
+    args = parser.parse_args(argv)
+
+    anni = tuple(anni_disponibili())
+    risultati = []
+    print(f"{'riferimento':<13} {'candidato':<15} {'casi':>10} {'scarto max':>12} {'colonna':<18} "
+          f"{'oltre':>7} {'candidato':>13} {'riferimento':>13}")
+    for nome in args.riferimento.split(","):
+        riferimento = RIFERIMENTI[nome.strip()]
+        candidati = [c for c in CANDIDATI
+                     if c.riferimento == riferimento.nome and args.candidato in c.nome]
+        if not candidati:
+            continue
+        for r in fuzz(riferimento, candidati, args.casi, args.blocco, args.seme, anni):
+            risultati.append(r)
+            print(f"{r['riferimento']:<13} {r['candidato']:<15} {r['casi']:>10,} "
+                  f"{r['scarto_max_cent']:>9.4g} ct {r['colonna']:<18} {r['oltre_tolleranza']:>7,} "
+                  f"{r['candidato_righe_s']:>11,.0f}/s {r['riferimento_righe_s']:>11,.0f}/s")
+            if "riproduttore" in r:
+                print(f"  caso minimo oltre {r['tolleranza_cent']:g} ct:\n{r['riproduttore']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(risultati, indent=2, ensure_ascii=False) + "\n")
+    falliti = [r for r in risultati if r["oltre_tolleranza"]]
+    print(f"\n{len(falliti)} candidati oltre tolleranza." if falliti
+          else "\nTutti i candidati entro tolleranza.")
+    return 1 if falliti else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
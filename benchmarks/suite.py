@@ -0,0 +1,525 @@
+"""
+Suite di benchmark dei motori con baseline JSON e controllo delle regressioni.
+
+Casi misurati:
+  - latenza della singola chiamata: calcola_irpef, calcoli_avanzati_piva,
+    calcola_cococo, calcolo_inverso_piva, calcolo_inverso_cococo, con i byte
+    occupati da ogni risultato (memoria_risultato_b);
+  - throughput dei motori batch su rose di varie dimensioni, anche in
+    centesimi interi (centesimi.py) e col modello tariffario compilato
+    (tariffa.py, tutte le colonne o il solo netto), con la memoria del
+    DataFrame risultato (memoria_risultato_kib);
+  - solutore inverso: tempo a freddo (tabelle dei nodi da costruire) e a
+    caldo, con il numero di nodi della curva lineare a tratti (il goal-seek è
+    in forma chiusa: una ricerca binaria sui nodi, nessuna iterazione);
+  - compilazione del modello tariffario (con la verifica sui motori), con il
+    numero di tratti;
+  - avvio a freddo della pagina Streamlit (bench_avvio.py): processo nuovo
+    fino al render del login, con primo render e picco di RSS
+    (memoria_picco_rss_kib);
+  - create_pdf: tempo e picco di memoria (tracemalloc);
+  - simulazione Monte Carlo (un processo) per numero di scenari;
+  - esecuzione parallela dei motori (parallelo.py) da 1 a N processi, con
+    accelerazione ed efficienza rispetto al processo singolo;
+  - ottimizzatore del regime su rose di varie dimensioni;
+  - griglia what-if: costruzione a freddo e pivot di una fetta dalla cache;
+  - archivio SQLite: inserimento di un batch e pagina di cronologia filtrata
+    su un archivio di 1.000.000 di righe (100.000 con --rapido).
+
+Uso:
+    python benchmarks/suite.py esegui [--output FILE] [--filtro TESTO] [--rapido]
+    python benchmarks/suite.py confronta BASELINE.json NUOVO.json [--soglia 0.15]
+    python benchmarks/suite.py esegui --confronta benchmarks/baseline.json
+
+`confronta` esce con codice 1 se almeno un caso peggiora oltre la soglia
+(default +15% sul tempo minimo dei campioni): può girare in CI o prima di
+un commit. Senza argomento, --confronta usa benchmarks/baseline.json.
+"""
+import argparse
+import atexit
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+from archivio import Archivio  # noqa: E402
+import centesimi  # noqa: E402
+import motore  # noqa: E402
+import parallelo  # noqa: E402
+import tariffa  # noqa: E402
+from bench_avvio import misura_a_freddo  # noqa: E402
+from fattura import create_pdf, prepara_dati  # noqa: E402
+import griglia  # noqa: E402
+from ottimizzatore import ottimizza_rosa  # noqa: E402
+from simulazione import Committente, simula  # noqa: E402
+
+BASELINE_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SOGLIA_DEFAULT = 0.15
+RICONFERME = 2
+DIMENSIONI_BATCH = (1_000, 10_000, 100_000, 1_000_000)
+DIMENSIONI_BATCH_RAPIDO = (1_000, 10_000)
+PROCESSI_PARALLELO = sorted({1, os.cpu_count() or 1,
+                             *(2 ** i for i in range(1, 8) if 2 ** i <= (os.cpu_count() or 1))})
+
+CASI = {}
+
+
+def caso(nome: str, batch: bool = False):
+    """Registra un caso: la funzione riceve `rapido` e restituisce (esegui, n_operazioni, extra)."""
+    def registra(funzione):
+        CASI[nome] = (funzione, batch)
+        return funzione
+    return registra
+
+
+def _importi(n: int, seed: int = 0) -> np.ndarray:
+    return np.round(np.random.default_rng(seed).uniform(0, 85_000, n), 2)
+
+
+def _byte_per_risultato(esegui, n: int) -> int:
+    """Memoria trattenuta dalla lista di `n` risultati prodotta da `esegui`, per risultato."""
+    gc.collect()
+    tracemalloc.start()
+    risultati = esegui()
+    occupata, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del risultati
+    return round(occupata / n)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: latenza singola chiamata
+# ─────────────────────────────────────────────────────────────────────────────
+@caso("singolo.calcola_irpef")
+def _irpef(rapido):
+    importi = _importi(1_000).tolist()
+    return lambda: [motore.calcola_irpef(x) for x in importi], len(importi), {}
+
+
+@caso("singolo.calcoli_avanzati_piva")
+def _piva(rapido):
+    importi = _importi(1_000).tolist()
+    esegui = lambda: [motore.calcoli_avanzati_piva(x, True, True, 0.05) for x in importi]  # noqa: E731
+    return esegui, len(importi), {"memoria_risultato_b": _byte_per_risultato(esegui, len(importi))}
+
+
+@caso("singolo.calcola_cococo")
+def _cococo(rapido):
+    importi = _importi(1_000).tolist()
+    esegui = lambda: [motore.calcola_cococo(x) for x in importi]  # noqa: E731
+    return esegui, len(importi), {"memoria_risultato_b": _byte_per_risultato(esegui, len(importi))}
+
+
+@caso("singolo.calcolo_inverso_piva")
+def _inverso_piva(rapido):
+    target = _importi(500).tolist()
+    return (lambda: [motore.calcolo_inverso_piva(x, True, True, 0.05) for x in target],
+            len(target), {})
+
+
+@caso("singolo.calcolo_inverso_cococo")
+def _inverso_cococo(rapido):
+    target = _importi(500).tolist()
+    return lambda: [motore.calcolo_inverso_cococo(x) for x in target], len(target), {}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: solutore inverso a freddo / a caldo
+# ─────────────────────────────────────────────────────────────────────────────
+def _caso_inverso(regime: str, freddo: bool):
+    def crea(rapido):
+        nodi = len(motore.punti_rottura(regime)) + 1
+
+        def esegui():
+            if freddo:
+                motore._tabella_inversa.cache_clear()
+            motore.calcolo_inverso(regime, "netto", 20_000.0)
+        return esegui, 1, {"nodi": nodi}
+    return crea
+
+
+for _regime in ("piva", "cococo"):
+    caso(f"inverso.{_regime}.freddo")(_caso_inverso(_regime, True))
+    caso(f"inverso.{_regime}.caldo")(_caso_inverso(_regime, False))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: throughput batch
+# ─────────────────────────────────────────────────────────────────────────────
+def _caso_batch(motore_batch, n: int, in_centesimi: bool = False):
+    def crea(rapido):
+        importi = centesimi.a_centesimi(_importi(n)) if in_centesimi else _importi(n)
+        risultato = motore_batch(importi)
+        memoria = (risultato.memory_usage(deep=True).sum() if isinstance(risultato, pd.DataFrame)
+                   else risultato.nbytes)
+        return lambda: motore_batch(importi), n, {"memoria_risultato_kib": round(memoria / 1024, 1)}
+    return crea
+
+
+for _n in DIMENSIONI_BATCH:
+    caso(f"batch.piva.{_n}", batch=True)(
+        _caso_batch(lambda x: motore.calcoli_avanzati_piva_batch(x, True, True, 0.05), _n))
+    caso(f"batch.cococo.{_n}", batch=True)(_caso_batch(motore.calcola_cococo_batch, _n))
+    caso(f"batch.inverso_cococo.{_n}", batch=True)(
+        _caso_batch(lambda x: motore.calcolo_inverso("cococo", "netto", x), _n))
+    caso(f"centesimi.piva.{_n}", batch=True)(_caso_batch(
+        lambda x: centesimi.calcoli_avanzati_piva_centesimi(x, True, True, 0.05), _n, True))
+    caso(f"centesimi.cococo.{_n}", batch=True)(
+        _caso_batch(centesimi.calcola_cococo_centesimi, _n, True))
+    caso(f"tariffa.piva.{_n}", batch=True)(_caso_batch(
+        lambda x: tariffa.compila_modello("piva", True, True, 0.05).valuta(x), _n))
+    caso(f"tariffa.cococo.{_n}", batch=True)(
+        _caso_batch(lambda x: tariffa.compila_modello("cococo").valuta(x), _n))
+    caso(f"tariffa.netto_cococo.{_n}", batch=True)(
+        _caso_batch(lambda x: tariffa.compila_modello("cococo").valuta(x, ["netto"]), _n))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: compilazione del modello tariffario
+# ─────────────────────────────────────────────────────────────────────────────
+def _caso_compila(regime: str):
+    def crea(rapido):
+        tratti = len(tariffa.compila_modello(regime).nodi)
+
+        def esegui():
+            tariffa._compila.cache_clear()
+            tariffa.compila_modello(regime)
+        return esegui, 1, {"tratti": tratti}
+    return crea
+
+
+for _regime in ("piva", "cococo"):
+    caso(f"tariffa.compila.{_regime}")(_caso_compila(_regime))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: avvio a freddo della pagina
+# ─────────────────────────────────────────────────────────────────────────────
+@caso("avvio.login")
+def _avvio_login(rapido):
+    prima = misura_a_freddo()
+    return misura_a_freddo, 1, {"primo_render_s": round(prima["primo_render_s"], 3),
+                                "memoria_picco_rss_kib": prima["picco_rss_kib"],
+                                "moduli": prima["moduli"]}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: PDF
+# ─────────────────────────────────────────────────────────────────────────────
+@caso("pdf.create_pdf")
+def _pdf(rapido):
+    dati = prepara_dati("Mario Rossi\nVia Roma 1, Gaeta\nP.IVA 01234567890",
+                        "ASD Esempio\nVia dello Sport 1\n04024 Gaeta (LT)",
+                        "2026/00001", "31/01/2026",
+                        "Prestazione sportiva ai sensi del D.Lgs. 36/2021", 1500.0, True, True)
+    create_pdf(dati)
+    tracemalloc.start()
+    create_pdf(dati)
+    _, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lambda: create_pdf(dati), 1, {"memoria_picco_kib": round(picco / 1024, 1)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: simulazione Monte Carlo
+# ─────────────────────────────────────────────────────────────────────────────
+COMMITTENTI_SIMULAZIONE = (
+    Committente("A", "lognormale", 30_000, 8_000, bonus=5_000, probabilita_bonus=0.3),
+    Committente("B", "triangolare", 8_000, minimo=2_000, massimo=15_000, probabilita=0.7),
+)
+
+
+def _caso_simulazione(n: int):
+    def crea(rapido):
+        return lambda: simula(COMMITTENTI_SIMULAZIONE, n, processi=1), n, {}
+    return crea
+
+
+for _n in (10_000, 1_000_000):
+    caso(f"simulazione.{_n}", batch=True)(_caso_simulazione(_n))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: motori su più processi (scalabilità)
+# ─────────────────────────────────────────────────────────────────────────────
+def _caso_parallelo(regime: str, processi: int):
+    def crea(rapido):
+        importi = _importi(400_000 if rapido else 2_000_000)
+        return (lambda: parallelo.calcola_parallelo(regime, importi, processi=processi),
+                len(importi), {"processi": processi})
+    return crea
+
+
+for _regime in ("piva", "cococo"):
+    for _p in PROCESSI_PARALLELO:
+        caso(f"parallelo.{_regime}.p{_p}")(_caso_parallelo(_regime, _p))
+
+
+def _efficienza(risultati: dict) -> None:
+    """Accelerazione ed efficienza dei casi parallelo.* rispetto al caso a un processo."""
+    for nome, r in risultati.items():
+        if not nome.startswith("parallelo."):
+            continue
+        base = risultati.get(nome.rsplit(".", 1)[0] + ".p1")
+        if base is None:
+            continue
+        r["accelerazione"] = round(base["min_s"] / r["min_s"], 2)
+        r["efficienza"] = round(r["accelerazione"] / r["processi"], 2)
+        print(f"  {nome:<34} ×{r['accelerazione']:.2f} su {r['processi']} processi "
+              f"(efficienza {r['efficienza']:.0%})", file=sys.stderr)
+
+
+def _caso_ottimizzatore(n: int):
+    def crea(rapido):
+        rng = np.random.default_rng(0)
+        rosa = pd.DataFrame({"netto": _importi(n) * 0.8, "forfettario": rng.random(n) < 0.8,
+                             "assicurato": rng.random(n) < 0.3})
+        return lambda: ottimizza_rosa(rosa), n, {}
+    return crea
+
+
+for _n in (1_000, 10_000, 100_000):
+    caso(f"ottimizzatore.{_n}", batch=True)(_caso_ottimizzatore(_n))
+
+
+@caso("griglia.freddo")
+def _griglia_freddo(rapido):
+    importi = griglia.importi_griglia(0, 85_000, 500)
+
+    def esegui():
+        griglia._griglia.cache_clear()
+        griglia.griglia_whatif(importi)
+    return esegui, 1, {"righe": len(griglia.griglia_whatif(importi))}
+
+
+@caso("griglia.pivot")
+def _griglia_pivot(rapido):
+    g = griglia.griglia_whatif(griglia.importi_griglia(0, 85_000, 500))
+    fissi = {"anno": 2026, "riduzione_ivs": True, "assicurato": False, "rivalsa": True, "bollo": True}
+    return lambda: griglia.pivot(g, "netto", "regime", **fissi), 1, {}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CASI: archivio SQLite
+# ─────────────────────────────────────────────────────────────────────────────
+def _archivio_temporaneo() -> Archivio:
+    cartella = tempfile.mkdtemp(prefix="bench_archivio_")
+    atexit.register(shutil.rmtree, cartella, ignore_errors=True)
+    return Archivio(os.path.join(cartella, "archivio.sqlite3"))
+
+
+@caso("archivio.inserimento.10000", batch=True)
+def _archivio_inserimento(rapido):
+    archivio = _archivio_temporaneo()
+    importi = _importi(10_000)
+    risultati = motore.calcola_cococo_batch(importi)
+    return (lambda: archivio.registra_batch("cococo", "batch", importi, risultati,
+                                            {"assicurato": False}, cliente="bench", anno=2026),
+            len(importi), {})
+
+
+@caso("archivio.pagina")
+def _archivio_pagina(rapido):
+    archivio = _archivio_temporaneo()
+    righe = 100_000 if rapido else 1_000_000
+    conn = archivio._connessione()
+    with conn:                                   # righe sintetiche: contano solo gli indici
+        conn.executemany(
+            "INSERT INTO calcoli (creato, cliente, anno, regime, tipo, importo, "
+            "versione_parametri, input, output) VALUES ('', ?, ?, ?, 'batch', ?, '', '{}', '{}')",
+            ((f"cliente {i % 1000}", 2025 + i % 4, ("piva", "cococo")[i % 2], float(i))
+             for i in range(righe)))
+    filtri = ({}, {"cliente": "cliente 7"}, {"anno": 2026, "regime": "cococo"},
+              {"cliente": "cliente 8", "anno": 2025, "regime": "piva"})
+
+    def esegui():
+        for f in filtri:
+            prima = archivio.pagina(**f)
+            archivio.pagina(**f, prima_di=int(prima["id"].iloc[-1]))
+    return esegui, 2 * len(filtri), {"righe": righe}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ESECUZIONE
+# ─────────────────────────────────────────────────────────────────────────────
+def misura(esegui, n_operazioni: int, durata_minima: float = 0.2, ripetizioni: int = 7) -> dict:
+    """Mediana e minimo su `ripetizioni` campioni, ognuno lungo almeno `durata_minima`."""
+    esegui()                                     # riscaldamento
+    giri, t = 1, 0.0
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(giri):
+            esegui()
+        t = time.perf_counter() - t0
+        if t >= durata_minima or giri >= 1 << 20:
+            break
+        giri *= max(2, int(durata_minima / max(t, 1e-9)))
+    campioni = [t / giri]
+    gc_attivo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(ripetizioni - 1):
+            t0 = time.perf_counter()
+            for _ in range(giri):
+                esegui()
+            campioni.append((time.perf_counter() - t0) / giri)
+    finally:
+        if gc_attivo:
+            gc.enable()
+    mediana = statistics.median(campioni)
+    return {
+        "operazioni": n_operazioni,
+        "mediana_s": mediana,
+        "min_s": min(campioni),
+        "per_operazione_s": mediana / n_operazioni,
+        "operazioni_s": n_operazioni / mediana,
+        "campioni": len(campioni),
+    }
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RADICE,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    import pandas
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "piattaforma": platform.platform(),
+        "processore": platform.processor() or platform.machine(),
+    }
+
+
+def esegui_suite(filtro: str = "", rapido: bool = False, nomi=None) -> dict:
+    risultati = {}
+    for nome, (crea, batch) in CASI.items():
+        if (filtro and filtro not in nome) or (nomi is not None and nome not in nomi):
+            continue
+        if rapido and batch and int(nome.rsplit(".", 1)[1]) not in DIMENSIONI_BATCH_RAPIDO:
+            continue
+        esegui, n, extra = crea(rapido)
+        risultati[nome] = {**misura(esegui, n, 0.05 if rapido else 0.2), **extra}
+        r = risultati[nome]
+        print(f"  {nome:<34} {r['per_operazione_s'] * 1e6:12.2f} µs/op  "
+              f"{r['operazioni_s']:14,.0f} op/s", file=sys.stderr)
+    _efficienza(risultati)
+    return {"meta": _meta(), "risultati": risultati}
+
+
+def riconferma(baseline: dict, risultati: dict, soglia: float, rapido: bool,
+               tentativi: int = RICONFERME) -> None:
+    """
+    Rimisura i casi oltre soglia e tiene il campione migliore.
+
+    Un picco di carico sulla macchina basta a far scattare un falso allarme:
+    una regressione vera resta tale anche alla seconda misura.
+    """
+    for _ in range(tentativi):
+        sospetti = [nome for nome, r in risultati["risultati"].items()
+                    if nome in baseline["risultati"]
+                    and r["min_s"] > baseline["risultati"][nome]["min_s"] * (1 + soglia)]
+        if not sospetti:
+            return
+        print(f"  rimisuro {len(sospetti)} casi oltre soglia…", file=sys.stderr)
+        for nome, r in esegui_suite(rapido=rapido, nomi=sospetti)["risultati"].items():
+            if r["min_s"] < risultati["risultati"][nome]["min_s"]:
+                risultati["risultati"][nome] = r
+
+
+def confronta(baseline: dict, nuovo: dict, soglia: float = SOGLIA_DEFAULT) -> list:
+    """
+    Casi in comune peggiorati oltre `soglia`.
+
+    Si confrontano i tempi minimi: su macchine condivise il rumore si somma
+    sempre al tempo reale, quindi il minimo è la stima più stabile.
+    """
+    regressioni = []
+    print(f"{'caso':<34} {'baseline':>12} {'nuovo':>12} {'variazione':>11}")
+    for nome, r in nuovo["risultati"].items():
+        base = baseline["risultati"].get(nome)
+        per_op = r["min_s"] / r["operazioni"]
+        if base is None:
+            print(f"{nome:<34} {'—':>12} {per_op * 1e6:10.2f}µs {'nuovo':>11}")
+            continue
+        per_op_base = base["min_s"] / base["operazioni"]
+        variazione = r["min_s"] / base["min_s"] - 1
+        segno = "  ⚠ REGRESSIONE" if variazione > soglia else ""
+        print(f"{nome:<34} {per_op_base * 1e6:10.2f}µs "
+              f"{per_op * 1e6:10.2f}µs {variazione:+10.1%}{segno}")
+        if variazione > soglia:
+            regressioni.append((nome, variazione))
+        for chiave in sorted(k for k in r if k.startswith("memoria_") and base.get(k)):
+            var_mem = r[chiave] / base[chiave] - 1
+            if var_mem > soglia:
+                print(f"{nome + ' (' + chiave + ')':<34} {base[chiave]:12,} "
+                      f"{r[chiave]:12,} {var_mem:+10.1%}  ⚠ REGRESSIONE")
+                regressioni.append((f"{nome}.{chiave}", var_mem))
+    return regressioni
+
+
+def _leggi(percorso: str) -> dict:
+    with open(percorso, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_esegui = sub.add_parser("esegui", help="esegue la suite e scrive i risultati JSON")
+    p_esegui.add_argument("--output", help="file JSON di destinazione (default: stdout)")
+    p_esegui.add_argument("--filtro", default="", help="solo i casi il cui nome contiene il testo")
+    p_esegui.add_argument("--rapido", action="store_true", help="rose piccole e campioni brevi")
+    p_esegui.add_argument("--confronta", metavar="BASELINE", nargs="?", const=BASELINE_DEFAULT,
+                          help="confronta subito con una baseline (default: baseline.json)")
+    p_esegui.add_argument("--soglia", type=float, default=SOGLIA_DEFAULT)
+    p_conf = sub.add_parser("confronta", help="confronta due file di risultati")
+    p_conf.add_argument("baseline")
+    p_conf.add_argument("nuovo")
+    p_conf.add_argument("--soglia", type=float, default=SOGLIA_DEFAULT)
+    args = parser.parse_args(argv)
+
+    if args.comando == "esegui":
+        risultati = esegui_suite(args.filtro, args.rapido)
+        if args.confronta:
+            baseline = _leggi(args.confronta)
+            riconferma(baseline, risultati, args.soglia, args.rapido)
+        testo = json.dumps(risultati, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(testo + "\n")
+        elif not args.confronta:
+            print(testo)
+        if not args.confronta:
+            return 0
+    else:
+        baseline, risultati = _leggi(args.baseline), _leggi(args.nuovo)
+
+    regressioni = confronta(baseline, risultati, args.soglia)
+    if regressioni:
+        print(f"\n{len(regressioni)} regressioni oltre +{args.soglia:.0%}.")
+        return 1
+    print(f"\nNessuna regressione oltre +{args.soglia:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
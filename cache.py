@@ -0,0 +1,144 @@
+"""
+Cache LRU dei risultati dei motori di calcolo, condivisa tra le sessioni.
+
+La chiave è composta dagli input normalizzati (argomenti legati alla firma del
+motore, con i default applicati e l'anno fiscale risolto) più una "versione"
+del registro parametri: se i parametri cambiano la cache si svuota da sola al
+primo accesso.
+Il modulo è importato una volta per processo Streamlit, quindi tutti gli
+utenti collegati condividono la stessa istanza.
+"""
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import motore
+import parametri
+
+DIMENSIONE_MASSIMA = 4096
+_ASSENTE = object()
+
+
+def versione_parametri() -> int:
+    """
+    Versione del registro parametri.
+
+    I set per anno sono immutabili e l'anno di default è fisso
+    (parametri.ANNO_PREDEFINITO): cambiano solo con registra_anno().
+    """
+    return parametri.versione_registro()
+
+
+class CacheRisultati:
+    """Mappa LRU thread-safe con contatori hit/miss e invalidazione per versione."""
+
+    def __init__(self, dimensione_massima: int = DIMENSIONE_MASSIMA):
+        self.dimensione_massima = dimensione_massima
+        self._dati = OrderedDict()
+        self._lock = threading.Lock()
+        self._versione = None
+        self.hit = 0
+        self.miss = 0
+        self.invalidazioni = 0
+
+    def _allinea_versione(self, versione) -> None:
+        if versione != self._versione:
+            if self._versione is not None:
+                self.invalidazioni += 1
+            self._dati.clear()
+            self._versione = versione
+
+    def ottieni_o_calcola(self, chiave, calcola):
+        versione = versione_parametri()
+        with self._lock:
+            if versione != self._versione:
+                self._allinea_versione(versione)
+            risultato = self._dati.get(chiave, _ASSENTE)
+            if risultato is not _ASSENTE:
+                self._dati.move_to_end(chiave)
+                self.hit += 1
+                return risultato
+            self.miss += 1
+        # Calcolo fuori dal lock: due richieste uguali in parallelo calcolano
+        # entrambe, ma nessun utente resta in attesa del motore di un altro.
+        risultato = calcola()
+        with self._lock:
+            # Una voce nuova va già in fondo all'ordine LRU; ne esce al più una.
+            if versione == self._versione and chiave not in self._dati:
+                self._dati[chiave] = risultato
+                if len(self._dati) > self.dimensione_massima:
+                    self._dati.popitem(last=False)
+        return risultato
+
+    def svuota(self) -> None:
+        """Toglie le voci e azzera tutte le statistiche, come una cache appena creata."""
+        with self._lock:
+            self._dati.clear()
+            self._versione = None
+            self.hit = self.miss = self.invalidazioni = 0
+
+    def statistiche(self) -> dict:
+        with self._lock:
+            richieste = self.hit + self.miss
+            return {
+                "voci": len(self._dati),
+                "dimensione_massima": self.dimensione_massima,
+                "hit": self.hit,
+                "miss": self.miss,
+                "hit_rate": self.hit / richieste if richieste else 0.0,
+                "invalidazioni": self.invalidazioni,
+            }
+
+
+CACHE = CacheRisultati()
+
+
+def memoizza(funzione, cache: CacheRisultati = CACHE):
+    """
+    Decoratore: memorizza in `cache` i risultati (record immutabili) di un motore scalare.
+
+    La chiave è la lista completa degli argomenti legati alla firma, con i
+    default applicati e l'anno risolto: f(x, False), f(x, gia_assicurato=False)
+    e f(x) sono la stessa voce, come anno=None e anno=ANNO_PREDEFINITO. I
+    valori restano quelli passati: 20000, 20000.0 e np.float64(20000) sono già
+    la stessa chiave (uguali e con lo stesso hash).
+    """
+    nome = funzione.__name__
+    firma = inspect.signature(funzione)
+    nomi = tuple(firma.parameters)
+    predefiniti = tuple(p.default for p in firma.parameters.values())
+    indice_anno = nomi.index("anno") if "anno" in nomi else None
+    restanti = [tuple(zip(nomi[n:], predefiniti[n:])) for n in range(len(nomi) + 1)]
+    ammessi = [frozenset(nomi[n:]) for n in range(len(nomi) + 1)]
+
+    def lega(args, kwargs) -> list:
+        # Equivale a firma.bind() + apply_defaults() (tutti i parametri sono
+        # posizionali o per nome), che però costa più del motore: lo si usa
+        # solo per i casi insoliti, così gli errori restano quelli di Python.
+        n = len(args)
+        if n > len(nomi) or not ammessi[n].issuperset(kwargs):
+            legati = firma.bind(*args, **kwargs)
+            legati.apply_defaults()
+            return list(legati.arguments.values())
+        valori = list(args)
+        for p, d in restanti[n]:
+            valori.append(kwargs.get(p, d))
+        if inspect.Parameter.empty in valori:
+            firma.bind(*args, **kwargs)             # solleva il TypeError dell'argomento mancante
+        return valori
+
+    @wraps(funzione)
+    def wrapper(*args, **kwargs):
+        valori = lega(args, kwargs)
+        if indice_anno is not None:
+            valori[indice_anno] = parametri.parametri(valori[indice_anno]).anno
+        # Nessuna copia: i record sono immutabili, quindi condivisibili tra le sessioni.
+        return cache.ottieni_o_calcola((nome, *valori), lambda: funzione(*valori))
+    return wrapper
+
+
+calcoli_avanzati_piva = memoizza(motore.calcoli_avanzati_piva)
+calcolo_inverso_piva = memoizza(motore.calcolo_inverso_piva)
+calcola_cococo = memoizza(motore.calcola_cococo)
+calcolo_inverso_cococo = memoizza(motore.calcolo_inverso_cococo)
@@ -0,0 +1,190 @@
+"""
+Interfaccia a riga di comando del motore di calcolo (senza Streamlit né login).
+
+Legge un importo per riga da stdin o da file e scrive i risultati su stdout in
+JSON Lines o CSV, a blocchi, così da poter elaborare file di qualsiasi
+dimensione in cron o nei worker.
+
+Esempi:
+    python cli.py piva --rivalsa --bollo --aliquota 0.15 < importi.txt
+    python cli.py cococo --assicurato --formato csv importi.txt > out.csv
+    echo 20000 | python cli.py piva --inverso netto
+    python cli.py cococo --centesimi importi.txt   # calcolo esatto in centesimi interi
+    python cli.py piva --archivia "ASD Gaeta" importi.txt   # salva anche nell'archivio SQLite
+"""
+import argparse
+import sqlite3
+import sys
+from itertools import islice
+
+import numpy as np
+
+from archivio import Archivio
+import metriche
+from centesimi import a_centesimi, calcola_cococo_centesimi, calcoli_avanzati_piva_centesimi
+from motore import (
+    PARAMS, CAMPI_INVERSO, calcolo_inverso,
+    calcoli_avanzati_piva_batch, calcola_cococo_batch,
+)
+from parametri import ANNO_PREDEFINITO, anni_disponibili
+
+DIMENSIONE_BLOCCO = 50_000
+
+
+def leggi_importi(righe):
+    """Converte le righe di testo in importi, ignorando righe vuote e commenti '#'."""
+    for n, riga in enumerate(righe, 1):
+        riga = riga.strip()
+        if not riga or riga.startswith("#"):
+            continue
+        try:
+            yield float(riga.replace(",", "."))
+        except ValueError:
+            raise ValueError(f"Riga {n}: importo non valido {riga!r}") from None
+
+
+def calcola_blocco(importi: np.ndarray, args):
+    """Applica il motore richiesto (diretto o inverso) a un blocco di importi."""
+    if args.regime == "piva":
+        if args.inverso:
+            importi = calcolo_inverso("piva", args.inverso, importi, apply_rivalsa=args.rivalsa,
+                                      aliquota_imp=args.aliquota, anno=args.anno)
+        if args.centesimi:
+            return _in_euro(calcoli_avanzati_piva_centesimi(
+                a_centesimi(importi), args.rivalsa, args.bollo, args.aliquota, anno=args.anno))
+        return calcoli_avanzati_piva_batch(importi, args.rivalsa, args.bollo, args.aliquota,
+                                           anno=args.anno)
+    if args.inverso:
+        importi = calcolo_inverso("cococo", args.inverso, importi,
+                                  gia_assicurato=args.assicurato, anno=args.anno)
+    if args.centesimi:
+        return _in_euro(calcola_cococo_centesimi(a_centesimi(importi), args.assicurato,
+                                                 anno=args.anno))
+    return calcola_cococo_batch(importi, args.assicurato, anno=args.anno)
+
+
+def _in_euro(df):
+    """Colonne in centesimi → euro: con 2 decimali in output il centesimo è esatto."""
+    for colonna in df.columns:
+        if df[colonna].dtype.kind == "i":
+            df[colonna] = df[colonna] / 100
+    return df
+
+
+def scrivi_csv(df, destinazione, intestazione: bool) -> None:
+    """
+    Scrive un blocco in CSV con importi a 2 decimali.
+
+    Una stringa di formato per riga è molto più veloce di DataFrame.to_csv
+    con float_format sui blocchi grandi.
+    """
+    if intestazione:
+        destinazione.write(",".join(df.columns) + "\n")
+    formato = ",".join("%.2f" if df[c].dtype.kind == "f" else "%s" for c in df.columns) + "\n"
+    colonne = [df[c].tolist() for c in df.columns]
+    destinazione.writelines(formato % riga for riga in zip(*colonne))
+
+
+def _opzioni(args) -> dict:
+    """Input comuni a tutte le righe, come li registra l'archivio."""
+    opzioni = ({"rivalsa": args.rivalsa, "bollo": args.bollo, "aliquota": args.aliquota}
+               if args.regime == "piva" else {"assicurato": args.assicurato})
+    if args.inverso:
+        opzioni["inverso"] = args.inverso
+    if args.centesimi:
+        opzioni["centesimi"] = True
+    return opzioni
+
+
+def esegui(args, sorgente, destinazione, archivio=None) -> int:
+    """
+    Elabora la sorgente a blocchi e scrive i risultati man mano. Restituisce le righe scritte.
+
+    Con `archivio` ogni blocco è salvato anche lì, con un inserimento unico per blocco.
+    """
+    importi = leggi_importi(sorgente)
+    totale = 0
+    while True:
+        blocco = np.fromiter(islice(importi, DIMENSIONE_BLOCCO), dtype=float)
+        if blocco.size == 0 and totale > 0:
+            break
+        df = calcola_blocco(blocco, args)
+        if archivio is not None:
+            archivio.registra_batch(args.regime, "inverso" if args.inverso else "batch", blocco, df,
+                                    _opzioni(args), cliente=args.archivia, anno=args.anno)
+        if args.formato == "csv":
+            scrivi_csv(df, destinazione, intestazione=(totale == 0))
+        elif len(df):
+            destinazione.write(df.to_json(orient="records", lines=True, double_precision=2))
+        destinazione.flush()
+        totale += len(df)
+        if blocco.size < DIMENSIONE_BLOCCO:
+            break
+    return totale
+
+
+def _aliquota(testo: str) -> float:
+    """Tipo argparse di --aliquota: frazione tra 0 e 1 (0.15, non 15)."""
+    try:
+        valore = float(testo.replace(",", "."))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"aliquota non valida: {testo!r}") from None
+    if not 0 <= valore <= 1:
+        raise argparse.ArgumentTypeError(f"aliquota fuori da [0, 1]: {testo} "
+                                         "(in frazione, es. 0.15 per il 15%)")
+    return valore
+
+
+def crea_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Studio Gaetani – simulatore P.IVA forfettaria / co.co.co. sportivo")
+    parser.add_argument("regime", choices=["piva", "cococo"])
+    parser.add_argument("file", nargs="?", help="file di importi (default: stdin)")
+    parser.add_argument("--formato", choices=["json", "csv"], default="json",
+                        help="json = JSON Lines (default), csv con intestazione")
+    parser.add_argument("--anno", type=int, choices=anni_disponibili(), default=ANNO_PREDEFINITO,
+                        help="anno fiscale (default: %(default)s)")
+    parser.add_argument("--centesimi", action="store_true",
+                        help="calcolo in centesimi interi con arrotondamenti espliciti "
+                             "(totali esatti, vedi centesimi.py)")
+    parser.add_argument("--archivia", metavar="CLIENTE",
+                        help="salva i calcoli nell'archivio SQLite (SIMULATORE_ARCHIVIO) "
+                             "a nome del cliente indicato")
+    parser.add_argument("--inverso", metavar="CAMPO",
+                        help="tratta gli importi come target del campo indicato "
+                             "(es. netto, costo_committente, fatturato)")
+    piva = parser.add_argument_group("P.IVA forfettaria")
+    piva.add_argument("--rivalsa", action="store_true", help="rivalsa INPS 4%%")
+    piva.add_argument("--bollo", action="store_true", help="bollo € 2,00")
+    piva.add_argument("--aliquota", type=_aliquota, default=PARAMS["aliq_forfettario_new"],
+                      help="imposta sostitutiva in frazione, tra 0 e 1 (default %(default)s)")
+    cococo = parser.add_argument_group("Co.co.co.")
+    cococo.add_argument("--assicurato", action="store_true",
+                        help="già assicurato / pensionato (IVS 24%%)")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = crea_parser()
+    args = parser.parse_args(argv)
+    if args.inverso and args.inverso not in CAMPI_INVERSO[args.regime]:
+        parser.error(f"--inverso per {args.regime}: scegliere tra "
+                     f"{', '.join(CAMPI_INVERSO[args.regime])}")
+    metriche.avvia_scrittura_periodica()    # solo con SIMULATORE_PROMETHEUS_FILE
+    archivio = Archivio() if args.archivia is not None else None
+    try:
+        if args.file:
+            with open(args.file, encoding="utf-8") as sorgente:
+                esegui(args, sorgente, sys.stdout, archivio)
+        else:
+            esegui(args, sys.stdin, sys.stdout, archivio)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Confronto P.IVA forfettaria vs co.co.co. su un intervallo di importi.
+
+sweep_confronto valuta entrambi i motori su tutta la griglia in un passaggio
+vettoriale (a blocchi, per contenere la memoria a passi molto fini);
+grafico_confronto ne calcola solo i punti che servono al grafico;
+punti_incrocio trova in forma chiusa gli importi in cui cambia il regime più
+conveniente, sfruttando il fatto che netto e costo sono lineari a tratti.
+Come nella tab Confronto, la stessa cifra è il compenso base della P.IVA
+(senza rivalsa né bollo) e il lordo del co.co.co.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from motore import calcoli_avanzati_piva_batch, calcola_cococo_batch, punti_rottura
+from parametri import parametri
+
+BLOCCO_SWEEP = 1_000_000
+
+METRICHE = {
+    "netto":             ("netto_piva", "netto_cococo"),
+    "costo_committente": ("costo_piva", "costo_cococo"),
+}
+
+
+def valuta(importi, aliquota_imp: float, gia_assicurato: bool = False,
+           anno: Optional[int] = None) -> pd.DataFrame:
+    """Netto lavoratore e costo committente nei due regimi per ogni importo."""
+    importi = np.asarray(importi, dtype=float)
+    piva = calcoli_avanzati_piva_batch(importi, False, False, aliquota_imp, anno=anno)
+    dip = calcola_cococo_batch(importi, gia_assicurato, anno=anno)
+    return pd.DataFrame({
+        "importo":      importi,
+        "netto_piva":   piva["netto"].to_numpy(),
+        "netto_cococo": dip["netto"].to_numpy(),
+        "costo_piva":   piva["fatturato"].to_numpy(),
+        "costo_cococo": dip["costo_committente"].to_numpy(),
+    })
+
+
+def sweep_confronto(aliquota_imp: float, gia_assicurato: bool = False,
+                    anno: Optional[int] = None, massimo: Optional[float] = None,
+                    passo: float = 1.0) -> pd.DataFrame:
+    """Valuta i due regimi da 0 a `massimo` (default soglia forfettario) con il passo dato."""
+    if massimo is None:
+        massimo = parametri(anno)["soglia_forfettario"]
+    n = punti_griglia(massimo, passo)
+    blocchi = []
+    for inizio in range(0, n, BLOCCO_SWEEP):
+        importi = np.arange(inizio, min(inizio + BLOCCO_SWEEP, n)) * passo
+        blocchi.append(valuta(importi, aliquota_imp, gia_assicurato, anno))
+    return pd.concat(blocchi, ignore_index=True)
+
+
+def punti_griglia(massimo: float, passo: float) -> int:
+    """Importi della griglia 0, passo, 2·passo, ... fino a `massimo`."""
+    return int(round(massimo / passo)) + 1
+
+
+def grafico_confronto(aliquota_imp: float, gia_assicurato: bool = False,
+                      anno: Optional[int] = None, massimo: Optional[float] = None,
+                      passo: float = 1.0, punti: int = 400) -> pd.DataFrame:
+    """
+    Le righe di sweep_confronto che riduci_per_grafico terrebbe, senza lo sweep.
+
+    Gli stessi indici (griglia regolare di `punti` importi più il primo importo
+    della griglia su ogni nodo) si ricavano in forma chiusa: si valutano solo
+    quelli, qualche centinaio invece di milioni a passi fini.
+    """
+    if massimo is None:
+        massimo = parametri(anno)["soglia_forfettario"]
+    n = punti_griglia(massimo, passo)
+    nodi = nodi_confronto(gia_assicurato, anno, massimo)
+    sopra = np.ceil(nodi / passo)                   # primo importo della griglia >= nodo
+    sopra -= (sopra - 1) * passo >= nodi            # correzione degli arrotondamenti
+    sopra += sopra * passo < nodi
+    indici = np.unique(np.concatenate([
+        np.linspace(0, n - 1, min(punti, n)).astype(np.int64),
+        np.clip(sopra, 0, n - 1).astype(np.int64),
+    ]))
+    return valuta(indici * passo, aliquota_imp, gia_assicurato, anno)
+
+
+def nodi_confronto(gia_assicurato: bool = False, anno: Optional[int] = None,
+                   massimo: Optional[float] = None) -> np.ndarray:
+    """Unione dei punti di rottura dei due motori, più gli estremi dell'intervallo."""
+    if massimo is None:
+        massimo = parametri(anno)["soglia_forfettario"]
+    nodi = np.concatenate([
+        punti_rottura("piva", anno=anno),
+        punti_rottura("cococo", gia_assicurato=gia_assicurato, anno=anno),
+        [0.0, massimo],
+    ])
+    return np.unique(nodi[nodi <= massimo])
+
+
+def _cambi_segno(nodi: np.ndarray, diff: np.ndarray) -> list:
+    """
+    (importo, segno dopo) per ogni cambio di segno della differenza lineare a tratti.
+
+    Il segno è confrontato con l'ultimo segno non nullo: un passaggio diretto
+    tra due nodi si interpola; se in mezzo la differenza si annulla (pareggio
+    su un nodo o su un tratto) l'incrocio è l'ultimo nodo del pareggio, da cui
+    conviene l'altro regime.
+    """
+    # Tolleranza di mezzo centesimo: l'IRPEF è arrotondata al centesimo.
+    segno = np.where(np.abs(diff) < 0.005, 0, np.sign(diff))
+    cambi = []
+    ultimo = None                               # indice dell'ultimo nodo con segno non nullo
+    for k in np.flatnonzero(segno):
+        if ultimo is not None and segno[k] != segno[ultimo]:
+            if k == ultimo + 1:
+                x = nodi[ultimo] - diff[ultimo] * (nodi[k] - nodi[ultimo]) / (diff[k] - diff[ultimo])
+            else:
+                x = nodi[k - 1]
+            cambi.append((float(x), segno[k]))
+        ultimo = k
+    return cambi
+
+
+def punti_incrocio(aliquota_imp: float, gia_assicurato: bool = False,
+                   anno: Optional[int] = None, massimo: Optional[float] = None) -> pd.DataFrame:
+    """
+    Importi in cui il regime più conveniente cambia, per netto e costo committente.
+
+    Sui nodi (unione dei punti di rottura) la differenza P.IVA − co.co.co. è
+    lineare a tratti: dove cambia segno tra due nodi l'incrocio si ottiene per
+    interpolazione lineare, senza griglia; un pareggio esatto su un nodo o su
+    un tratto conta come incrocio alla sua fine (vedi _cambi_segno). Per ogni
+    incrocio indica il regime che conviene subito dopo (netto più alto / costo
+    più basso).
+    """
+    nodi = nodi_confronto(gia_assicurato, anno, massimo)
+    valori = valuta(nodi, aliquota_imp, gia_assicurato, anno)
+    righe = []
+    for metrica, (col_piva, col_coco) in METRICHE.items():
+        diff = valori[col_piva].to_numpy() - valori[col_coco].to_numpy()
+        for x, segno_dopo in _cambi_segno(nodi, diff):
+            dopo = segno_dopo > 0
+            if metrica == "costo_committente":
+                dopo = not dopo
+            righe.append({"metrica": metrica, "importo": x,
+                          "conviene_dopo": "P.IVA" if dopo else "Co.co.co."})
+    return pd.DataFrame(righe, columns=["metrica", "importo", "conviene_dopo"])
+
+
+def riduci_per_grafico(df: pd.DataFrame, nodi: np.ndarray, punti: int = 400) -> pd.DataFrame:
+    """
+    Sottocampiona lo sweep per il browser senza perdere la forma delle curve.
+
+    Le curve sono lineari a tratti: tenendo i nodi (più una griglia regolare
+    per il tooltip) il grafico è identico a quello sull'intera griglia.
+    """
+    importi = df["importo"].to_numpy()
+    indici = np.unique(np.concatenate([
+        np.linspace(0, len(df) - 1, min(punti, len(df))).astype(int),
+        np.clip(np.searchsorted(importi, nodi), 0, len(df) - 1),
+    ]))
+    return df.iloc[indici].reset_index(drop=True)
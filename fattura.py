@@ -0,0 +1,185 @@
+"""
+Generazione PDF della fattura pro-forma / nota di competenza.
+
+Nessuna dipendenza da Streamlit: usato dalla tab "Genera Fattura PDF" e
+importabile da script e worker.
+"""
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from fpdf import FPDF
+
+from metriche import cronometra, misura
+
+NOTE_LEGALI = (
+    "Operazione in franchigia da IVA ai sensi della Legge 190/2014 (Regime Forfettario).\n"
+    "Operazione non soggetta a ritenuta alla fonte ai sensi dell'art. 1 c. 67 L. 190/2014.\n"
+    "Prestazione sportiva ai sensi del D.Lgs. 36/2021 e successive modificazioni.\n"
+    "Compensi soggetti alla franchigia fiscale di EUR 15.000 (art. 36 c. 6 D.Lgs. 36/2021)."
+)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MODELLO (intestazione comune a tutti i documenti)
+# ─────────────────────────────────────────────────────────────────────────────
+class ModelloFattura(FPDF):
+    """
+    FPDF con l'intestazione della fattura: titolo e filetto in header().
+
+    Con fpdf 1.7.2 un documento non si riusa dopo output(), quindi ogni
+    fattura crea la sua istanza; il modello evita di ripetere l'intestazione
+    in create_pdf e la ridisegna sulle pagine successive alla prima.
+    """
+
+    def header(self):
+        self.set_font("Arial", 'B', 14)
+        self.cell(200, 10, txt="FATTURA PRO-FORMA / NOTA DI COMPETENZA", ln=1, align='C')
+        self.line(10, 25, 200, 25)
+        self.ln(10)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# NOTE LEGALI (righe già spezzate, riusate tra i documenti)
+# ─────────────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=1)
+def _righe_note_legali() -> tuple:
+    """
+    Righe delle note legali spezzate sulla larghezza utile, una sola volta per processo.
+
+    Misurate in Arial 8 (il font con cui create_pdf le scrive): ogni fattura
+    scrive le righe con cell() invece di ripetere il calcolo di multi_cell.
+    """
+    pdf = ModelloFattura()
+    pdf.add_page()
+    pdf.set_font("Arial", '', 8)
+    larghezza = pdf.w - pdf.l_margin - pdf.r_margin - 2 * pdf.c_margin
+    righe = []
+    for paragrafo in NOTE_LEGALI.split("\n"):
+        riga = ""
+        for parola in paragrafo.split(" "):
+            prova = f"{riga} {parola}" if riga else parola
+            if riga and pdf.get_string_width(prova) > larghezza:
+                righe.append(riga)
+                riga = parola
+            else:
+                riga = prova
+        righe.append(riga)
+    return tuple(righe)
+
+
+def _scrivi_note_legali(pdf: FPDF) -> None:
+    """Scrive le note legali alla posizione corrente (Arial 8 e colore già impostati)."""
+    for riga in _righe_note_legali():
+        pdf.cell(0, 4, txt=riga, ln=1)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FUNZIONE PDF (intestazione dal modello, note legali pre-spezzate, vedi sopra)
+# ─────────────────────────────────────────────────────────────────────────────
+@cronometra("fattura.create_pdf")
+def create_pdf(dati):
+    pdf = ModelloFattura()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(95, 10, txt="FORNITORE (Emittente):", border=0)
+    pdf.cell(95, 10, txt="CLIENTE (Destinatario):", border=0, ln=1)
+    pdf.set_font("Arial", '', 10)
+    y_start = pdf.get_y()
+    pdf.multi_cell(95, 5, txt=dati['mittente'])
+    y_end_left = pdf.get_y()
+    pdf.set_xy(105, y_start)
+    pdf.multi_cell(95, 5, txt=dati['destinatario'])
+    y_end_right = pdf.get_y()
+    pdf.set_xy(10, max(y_end_left, y_end_right) + 10)
+    pdf.set_fill_color(240, 240, 240)
+    pdf.cell(200, 8, txt=f"Documento n. {dati['numero']} del {dati['data']}", ln=1, fill=True)
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(130, 8, txt="Descrizione", border=1)
+    pdf.cell(60, 8, txt="Importo", border=1, align='R', ln=1)
+    pdf.set_font("Arial", '', 10)
+    pdf.cell(130, 8, txt=dati['descrizione'], border=1)
+    pdf.cell(60, 8, txt=f"EUR {dati['compenso']:,.2f}", border=1, align='R', ln=1)
+    if dati['rivalsa'] > 0:
+        pdf.cell(130, 8, txt="Rivalsa INPS 4% (L. 662/96)", border=1)
+        pdf.cell(60, 8, txt=f"EUR {dati['rivalsa']:,.2f}", border=1, align='R', ln=1)
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 11)
+    pdf.cell(130, 8, txt="TOTALE LORDO", border=0, align='R')
+    pdf.cell(60, 8, txt=f"EUR {dati['totale_lordo']:,.2f}", border=1, align='R', ln=1)
+    if dati['bollo'] > 0:
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(130, 8, txt="Bollo (Art. 15 DPR 633/72)", border=0, align='R')
+        pdf.cell(60, 8, txt=f"EUR {dati['bollo']:,.2f}", border=0, align='R', ln=1)
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(130, 8, txt="TOTALE A PAGARE", border=0, align='R')
+        pdf.cell(60, 8, txt=f"EUR {dati['totale_pagare']:,.2f}", border=0, align='R', ln=1)
+    pdf.ln(20)
+    pdf.set_font("Arial", '', 8)
+    pdf.set_text_color(100, 100, 100)
+    _scrivi_note_legali(pdf)
+    with misura("fattura.codifica"):
+        return pdf.output(dest='S').encode('latin-1')
+
+
+def prepara_dati(mittente: str, destinatario: str, numero: str, data: str,
+                 descrizione: str, compenso: float, rivalsa: bool, bollo: bool) -> dict:
+    """Costruisce il dict per create_pdf calcolando rivalsa, bollo e totali."""
+    val_riv   = compenso * 0.04 if rivalsa else 0.0
+    tot_lordo = compenso + val_riv
+    val_bol   = 2.0 if bollo and tot_lordo > 77.47 else 0.0
+    return {
+        "mittente": mittente, "destinatario": destinatario,
+        "numero": numero, "data": data,
+        "descrizione": descrizione, "compenso": compenso,
+        "rivalsa": val_riv, "totale_lordo": tot_lordo,
+        "bollo": val_bol, "totale_pagare": tot_lordo + val_bol,
+    }
+
+
+def nome_file_fattura(numero: str) -> str:
+    return f"Fattura_{re.sub(r'[^0-9A-Za-z_-]+', '_', str(numero))}.pdf"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GENERAZIONE MASSIVA (process pool → ZIP in streaming)
+# ─────────────────────────────────────────────────────────────────────────────
+SOGLIA_PARALLELO = 200       # sotto questa soglia il pool costa più di quanto rende
+
+
+def genera_fatture_zip(elenco_dati, destinazione, processi=None, on_progress=None) -> int:
+    """
+    Genera una fattura per ogni dict di `elenco_dati` e le scrive in uno ZIP.
+
+    `destinazione` è un percorso o un file binario. I PDF sono prodotti da un
+    pool di processi e aggiunti allo ZIP man mano che arrivano, nell'ordine di
+    input; nomi duplicati ricevono un suffisso. Restituisce il numero di PDF.
+    """
+    elenco_dati = list(elenco_dati)
+    totale = len(elenco_dati)
+    processi = processi or os.cpu_count() or 1
+    usati = set()
+    with zipfile.ZipFile(destinazione, "w", zipfile.ZIP_STORED) as zf:
+        if processi > 1 and totale >= SOGLIA_PARALLELO:
+            pool = ProcessPoolExecutor(max_workers=processi)
+            blocco = max(1, totale // (processi * 8))
+            risultati = pool.map(create_pdf, elenco_dati, chunksize=blocco)
+        else:
+            pool = None
+            risultati = map(create_pdf, elenco_dati)
+        try:
+            for i, (dati, pdf_bytes) in enumerate(zip(elenco_dati, risultati), 1):
+                nome = nome_file_fattura(dati["numero"])
+                base, n = nome[:-4], 1
+                while nome in usati:
+                    n += 1
+                    nome = f"{base}_{n}.pdf"
+                usati.add(nome)
+                zf.writestr(nome, pdf_bytes)
+                if on_progress:
+                    on_progress(i / totale)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    return totale
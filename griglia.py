@@ -0,0 +1,116 @@
+"""
+Griglia what-if: tutte le combinazioni di importo, regime, assicurato,
+rivalsa, bollo, riduzione IVS e anno fiscale calcolate in un solo passaggio.
+
+Per ogni anno i motori vettoriali ricevono il prodotto cartesiano completo
+come un unico array (flag per riga), quindi una chiamata per regime e anno.
+Le dimensioni che non toccano un regime (rivalsa e bollo per il co.co.co.,
+assicurato per la P.IVA) sono comunque presenti, con valori ripetuti: ogni
+fetta della griglia ha tutte le combinazioni.
+
+La griglia è in cache (per importi e versione del registro parametri), con
+indice ordinato sulle dimensioni: fette e pivot (fetta, pivot) sono letture
+dalla griglia già calcolata, nessun ricalcolo.
+"""
+from functools import lru_cache
+from itertools import product
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from motore import calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import anni_disponibili, parametri, versione_registro
+
+DIMENSIONI = ("anno", "riduzione_ivs", "regime", "assicurato", "rivalsa", "bollo", "importo")
+VALORI_GRIGLIA = ("netto", "imposte", "inps", "costo_committente")
+MASSIMO_IMPORTI = 2_000
+
+
+def _regimi(anno: int) -> dict:
+    """Etichetta → aliquota sostitutiva (None per il co.co.co.)."""
+    P = parametri(anno)
+    return {"P.IVA start-up": P["aliq_forfettario_new"],
+            "P.IVA ordinaria": P["aliq_forfettario_ord"],
+            "Co.co.co.": None}
+
+
+def importi_griglia(minimo: float, massimo: float, passo: float) -> tuple:
+    """Importi da `minimo` a `massimo` compresi, ogni `passo` euro."""
+    if passo <= 0 or massimo < minimo:
+        raise ValueError("Intervallo di importi non valido")
+    importi = np.round(np.arange(minimo, massimo + passo / 2, passo), 2)
+    if len(importi) > MASSIMO_IMPORTI:
+        raise ValueError(f"Troppi importi ({len(importi):,}): massimo {MASSIMO_IMPORTI:,}")
+    return tuple(importi.tolist())
+
+
+def _griglia_anno(anno: int, importi: np.ndarray) -> pd.DataFrame:
+    regimi = _regimi(anno)
+    combinazioni = list(product((True, False), regimi, (False, True), (False, True), (False, True)))
+    n, m = len(importi), len(combinazioni)
+    riduzione, etichette, assicurato, rivalsa, bollo = (np.repeat(np.array(col), n)
+                                                        for col in zip(*combinazioni))
+    aliquote = np.array([regimi[e] or 0.0 for e in etichette])
+    importo = np.tile(importi, m)
+    cococo = etichette == "Co.co.co."
+    piva = ~cococo
+
+    netto = np.empty(n * m)
+    imposte = np.empty(n * m)
+    inps = np.empty(n * m)
+    costo = np.empty(n * m)
+    res = calcoli_avanzati_piva_batch(importo[piva], rivalsa[piva], bollo[piva], aliquote[piva],
+                                      anno=anno, riduzione_ivs=riduzione[piva])
+    netto[piva] = res["netto"].to_numpy()
+    imposte[piva] = res["tasse"].to_numpy()
+    inps[piva] = res["inps"].to_numpy()
+    costo[piva] = res["fatturato"].to_numpy()
+    res = calcola_cococo_batch(importo[cococo], assicurato[cococo], anno=anno,
+                               riduzione_ivs=riduzione[cococo])
+    netto[cococo] = res["netto"].to_numpy()
+    imposte[cococo] = res["irpef_lorda"].to_numpy()
+    inps[cococo] = res["quota_lav"].to_numpy()
+    costo[cococo] = res["costo_committente"].to_numpy()
+
+    return pd.DataFrame({
+        "anno": np.full(n * m, anno), "riduzione_ivs": riduzione, "regime": etichette,
+        "assicurato": assicurato, "rivalsa": rivalsa, "bollo": bollo, "importo": importo,
+        "netto": netto, "imposte": imposte, "inps": inps, "costo_committente": costo,
+    })
+
+
+@lru_cache(maxsize=8)
+def _griglia(importi: tuple, anni: tuple, versione: int) -> pd.DataFrame:
+    importi = np.asarray(importi, dtype=float)
+    griglia = pd.concat([_griglia_anno(anno, importi) for anno in anni], ignore_index=True)
+    return griglia.set_index(list(DIMENSIONI)).sort_index()
+
+
+@cronometra("griglia.griglia_whatif")
+def griglia_whatif(importi: tuple, anni: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Griglia completa (indice = DIMENSIONI, colonne = VALORI_GRIGLIA).
+
+    `importi` è una tupla (vedi importi_griglia); `anni` di default sono tutti
+    quelli del registro. Il DataFrame è condiviso dalla cache: non modificarlo.
+    """
+    return _griglia(tuple(importi), tuple(anni or anni_disponibili()), versione_registro())
+
+
+def fetta(griglia: pd.DataFrame, **fissi) -> pd.DataFrame:
+    """Righe con le dimensioni indicate fissate (es. anno=2026, regime="Co.co.co.")."""
+    livelli = [d for d in DIMENSIONI if d in fissi]
+    if not livelli:
+        return griglia
+    return griglia.xs(tuple(fissi[d] for d in livelli), level=livelli, drop_level=True)
+
+
+def pivot(griglia: pd.DataFrame, valore: str, colonne: str, **fissi) -> pd.DataFrame:
+    """Tabella importo × `colonne` del `valore` scelto, con le altre dimensioni fissate."""
+    dati = fetta(griglia, **fissi)[valore]
+    altre = [d for d in dati.index.names if d not in ("importo", colonne)]
+    if altre:
+        raise ValueError(f"Dimensioni da fissare: {', '.join(altre)}")
+    return dati.unstack(colonne)
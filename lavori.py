@@ -0,0 +1,192 @@
+"""
+Lavori in background per le operazioni lunghe della pagina Streamlit.
+
+Roster, ZIP di fatture e simulazioni Monte Carlo bloccavano il thread di
+rerun della sessione fino alla fine: la pagina restava ferma. Ora lo script
+avvia il lavoro e prosegue; un fragment della tab ne mostra l'avanzamento e il
+pulsante per annullarlo, e al termine la tab legge il risultato.
+
+Un solo GestoreLavori per processo server (st.cache_resource nell'app): i
+lavori girano in un pool di thread limitato a `massimo_in_corso`, gli altri
+restano in coda nell'ordine di arrivo. I lavori pesanti usano a loro volta i
+propri pool di processi (fatture, simulazione), quindi il limite vale anche
+per i processi avviati. Ogni utente ha al più `massimo_per_utente` lavori
+attivi (in coda o in corso): il batch di un consulente non occupa tutti i
+posti e non affama gli altri utenti collegati.
+
+La funzione del lavoro riceve come primo argomento `avanzamento(frazione,
+parziale=None)`, da chiamare dopo ogni blocco: aggiorna la percentuale,
+conserva l'ultimo risultato parziale e, se il lavoro è stato annullato,
+solleva LavoroAnnullato. L'annullamento è quindi cooperativo (al blocco
+successivo) e il risultato parziale resta disponibile in `Lavoro.parziale`.
+
+Limiti da variabili d'ambiente: SIMULATORE_LAVORI (lavori in corso nel
+server, default 2) e SIMULATORE_LAVORI_UTENTE (lavori attivi per utente,
+default 1). I lavori finiti restano consultabili per CONSERVA_SECONDI.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+from metriche import misura
+
+MASSIMO_IN_CORSO = int(os.environ.get("SIMULATORE_LAVORI", "2"))
+MASSIMO_PER_UTENTE = int(os.environ.get("SIMULATORE_LAVORI_UTENTE", "1"))
+CONSERVA_SECONDI = 3_600
+STATI_ATTIVI = ("in coda", "in corso")
+
+
+class LavoroAnnullato(Exception):
+    """Sollevata da avanzamento() quando il lavoro è stato annullato."""
+
+
+class TroppiLavori(RuntimeError):
+    """L'utente ha già il numero massimo di lavori attivi."""
+
+
+@dataclass(eq=False)
+class Lavoro:
+    """
+    Stato di un lavoro: in coda, in corso, completato, annullato o errore.
+
+    I campi sono scritti dal thread del lavoro e letti dalle sessioni:
+    assegnazioni singole, senza stati intermedi visibili.
+    """
+    id: str
+    tipo: str
+    utente: str
+    descrizione: str = ""
+    stato: str = "in coda"
+    avanzamento: float = 0.0
+    parziale: Any = None
+    risultato: Any = None
+    errore: str = ""
+    creato: float = field(default_factory=time.time)
+    iniziato: Optional[float] = None
+    finito: Optional[float] = None
+    _annullato: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def attivo(self) -> bool:
+        return self.stato in STATI_ATTIVI
+
+    @property
+    def annullato(self) -> bool:
+        """Annullamento richiesto (il lavoro può essere ancora in corso fino al blocco successivo)."""
+        return self._annullato.is_set()
+
+    @property
+    def durata(self) -> float:
+        """Secondi di esecuzione (fino a ora, se in corso)."""
+        if self.iniziato is None:
+            return 0.0
+        return (self.finito or time.time()) - self.iniziato
+
+    def annulla(self) -> None:
+        """Chiede l'annullamento: un lavoro in coda non parte, uno in corso si ferma al blocco successivo."""
+        self._annullato.set()
+
+    def _aggiorna(self, frazione: float, parziale: Any = None) -> None:
+        if parziale is not None:                    # conservato anche se poi si interrompe
+            self.parziale = parziale
+        if self._annullato.is_set():
+            raise LavoroAnnullato(self.id)
+        self.avanzamento = min(max(float(frazione), 0.0), 1.0)
+
+
+class GestoreLavori:
+    """Tabella dei lavori del server e pool di thread che li esegue."""
+
+    def __init__(self, massimo_in_corso: int = MASSIMO_IN_CORSO,
+                 massimo_per_utente: int = MASSIMO_PER_UTENTE,
+                 conserva_secondi: float = CONSERVA_SECONDI):
+        self.massimo_in_corso = max(int(massimo_in_corso), 1)
+        self.massimo_per_utente = max(int(massimo_per_utente), 1)
+        self.conserva_secondi = conserva_secondi
+        self._pool = ThreadPoolExecutor(max_workers=self.massimo_in_corso,
+                                        thread_name_prefix="lavoro")
+        self._lavori: dict = {}
+        self._lock = threading.Lock()
+
+    def avvia(self, tipo: str, funzione: Callable, *args, utente: str = "",
+              descrizione: str = "", **kwargs) -> Lavoro:
+        """
+        Mette in coda funzione(avanzamento, *args, **kwargs) e restituisce il Lavoro.
+
+        Solleva TroppiLavori se `utente` ha già massimo_per_utente lavori attivi.
+        """
+        with self._lock:
+            self._pulisci()
+            attivi = sum(1 for l in self._lavori.values() if l.utente == utente and l.attivo)
+            if attivi >= self.massimo_per_utente:
+                raise TroppiLavori(f"Raggiunto il massimo di {attivi} lavori in esecuzione o in "
+                                   "coda: attendere che finiscano o annullarne uno.")
+            lavoro = Lavoro(uuid4().hex[:12], tipo, utente, descrizione)
+            self._lavori[lavoro.id] = lavoro
+        self._pool.submit(self._esegui, lavoro, funzione, args, kwargs)
+        return lavoro
+
+    def _esegui(self, lavoro: Lavoro, funzione: Callable, args: tuple, kwargs: dict) -> None:
+        if lavoro.annullato:
+            lavoro.stato, lavoro.finito = "annullato", time.time()
+            return
+        lavoro.iniziato = time.time()
+        lavoro.stato = "in corso"
+        try:
+            with misura(f"lavori.{lavoro.tipo}"):
+                risultato = funzione(lavoro._aggiorna, *args, **kwargs)
+        except LavoroAnnullato:
+            lavoro.stato = "annullato"
+        except Exception as e:
+            lavoro.errore = str(e) or type(e).__name__
+            lavoro.stato = "errore"
+        else:
+            lavoro.risultato = risultato
+            lavoro.avanzamento = 1.0
+            lavoro.stato = "completato"
+        finally:
+            lavoro.finito = time.time()
+
+    def _pulisci(self) -> None:
+        limite = time.time() - self.conserva_secondi
+        for id_lavoro in [i for i, l in self._lavori.items()
+                          if not l.attivo and (l.finito or 0) < limite]:
+            del self._lavori[id_lavoro]
+
+    def lavoro(self, id_lavoro: Optional[str]) -> Optional[Lavoro]:
+        with self._lock:
+            return self._lavori.get(id_lavoro)
+
+    def lavori(self, utente: Optional[str] = None) -> list:
+        """Lavori (di un utente, o tutti), dal più recente."""
+        with self._lock:
+            elenco = [l for l in self._lavori.values() if utente is None or l.utente == utente]
+        return sorted(elenco, key=lambda l: l.creato, reverse=True)
+
+    def davanti(self, lavoro: Lavoro) -> int:
+        """Lavori in coda partiti prima di `lavoro` (0 se è in corso)."""
+        if lavoro.stato != "in coda":
+            return 0
+        with self._lock:
+            return sum(1 for l in self._lavori.values()
+                       if l.stato == "in coda" and l.creato < lavoro.creato)
+
+    def occupazione(self) -> dict:
+        """Lavori in corso e in coda nel server, col limite di concorrenza."""
+        with self._lock:
+            stati = [l.stato for l in self._lavori.values()]
+        return {"in_corso": stati.count("in corso"), "in_coda": stati.count("in coda"),
+                "massimo_in_corso": self.massimo_in_corso}
+
+    def chiudi(self) -> None:
+        """Annulla tutti i lavori e ferma il pool (senza attendere quelli in corso)."""
+        for lavoro in self.lavori():
+            lavoro.annulla()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for lavoro in self.lavori():
+            if lavoro.stato == "in coda":                # mai partiti: il pool li ha scartati
+                lavoro.stato, lavoro.finito = "annullato", time.time()
@@ -0,0 +1,211 @@
+"""
+Strumentazione opzionale dei punti caldi: registro in memoria delle durate.
+
+Si attiva con la variabile d'ambiente SIMULATORE_METRICHE=1 oppure con
+abilita(True) (pannello Prestazioni nella barra laterale). Da disattivata,
+cronometra() e misura() costano un controllo di un flag per chiamata.
+
+Per ogni nome il registro tiene conteggio, somma e un campione circolare
+delle ultime durate, da cui si ricavano p50 / p95 / p99. Il testo per
+Prometheus (esporta_prometheus) include anche le statistiche della cache
+dei risultati; è servito dall'endpoint /metriche del servizio HTTP e, con
+SIMULATORE_PROMETHEUS_FILE=percorso, scritto su file (textfile collector di
+node_exporter) ogni SIMULATORE_PROMETHEUS_INTERVALLO secondi (default 15) e
+all'uscita del processo, da pagina, servizio e riga di comando.
+
+Le fatture generate dal pool di processi (genera_fatture_zip) sono misurate
+nei processi figli e non compaiono nel registro del processo principale.
+"""
+import atexit
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+CAMPIONE_MASSIMO = 2048
+QUANTILI = (0.5, 0.95, 0.99)
+
+_attive = os.environ.get("SIMULATORE_METRICHE", "").strip().lower() in {"1", "true", "si", "sì"}
+FILE_PROMETHEUS = os.environ.get("SIMULATORE_PROMETHEUS_FILE", "").strip()
+INTERVALLO_PROMETHEUS = float(os.environ.get("SIMULATORE_PROMETHEUS_INTERVALLO", "15"))
+_NULLA = nullcontext()
+
+
+def attive() -> bool:
+    return _attive
+
+
+def abilita(valore: bool = True) -> None:
+    global _attive
+    _attive = bool(valore)
+
+
+class RegistroMetriche:
+    """Durate per nome: conteggio, somma, massimo e ultime CAMPIONE_MASSIMO osservazioni."""
+
+    def __init__(self, campione_massimo: int = CAMPIONE_MASSIMO):
+        self.campione_massimo = campione_massimo
+        self._dati = {}
+        self._lock = threading.Lock()
+
+    def osserva(self, nome: str, secondi: float) -> None:
+        with self._lock:
+            voce = self._dati.get(nome)
+            if voce is None:
+                voce = self._dati[nome] = [0, 0.0, 0.0, deque(maxlen=self.campione_massimo)]
+            voce[0] += 1
+            voce[1] += secondi
+            voce[2] = max(voce[2], secondi)
+            voce[3].append(secondi)
+
+    def svuota(self) -> None:
+        with self._lock:
+            self._dati.clear()
+
+    def riepilogo(self) -> list:
+        """Una riga per metrica: nome, conteggio, totale, media, p50/p95/p99, massimo (secondi)."""
+        import numpy as np  # solo qui: importare metriche non deve caricare numpy all'avvio
+        with self._lock:
+            copia = {nome: (n, somma, massimo, np.array(campione))
+                     for nome, (n, somma, massimo, campione) in self._dati.items()}
+        righe = []
+        for nome in sorted(copia):
+            n, somma, massimo, campione = copia[nome]
+            p50, p95, p99 = np.quantile(campione, QUANTILI)
+            righe.append({"nome": nome, "conteggio": n, "totale_s": somma, "media_s": somma / n,
+                          "p50_s": p50, "p95_s": p95, "p99_s": p99, "max_s": massimo})
+        return righe
+
+
+REGISTRO = RegistroMetriche()
+
+
+def osserva(nome: str, secondi: float) -> None:
+    if _attive:
+        REGISTRO.osserva(nome, secondi)
+
+
+@contextmanager
+def _cronometro(nome: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRO.osserva(nome, time.perf_counter() - t0)
+
+
+def misura(nome: str):
+    """Context manager: `with misura("tab.piva.tabella"): ...`."""
+    return _cronometro(nome) if _attive else _NULLA
+
+
+def cronometra(nome: str):
+    """Decoratore: registra la durata di ogni chiamata sotto `nome`."""
+    def decora(funzione):
+        @wraps(funzione)
+        def wrapper(*args, **kwargs):
+            if not _attive:
+                return funzione(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return funzione(*args, **kwargs)
+            finally:
+                REGISTRO.osserva(nome, time.perf_counter() - t0)
+        return wrapper
+    return decora
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# EXPORT PROMETHEUS
+# ─────────────────────────────────────────────────────────────────────────────
+def _nome_prometheus(nome: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", nome)
+
+
+def esporta_prometheus(registro: RegistroMetriche = REGISTRO) -> str:
+    """Metriche in formato testo Prometheus 0.0.4 (summary per durata + gauge cache)."""
+    righe = [
+        "# HELP simulatore_durata_secondi Durata delle operazioni strumentate.",
+        "# TYPE simulatore_durata_secondi summary",
+    ]
+    for r in registro.riepilogo():
+        etichetta = f'operazione="{_nome_prometheus(r["nome"])}"'
+        for q, chiave in zip(QUANTILI, ("p50_s", "p95_s", "p99_s")):
+            righe.append(f'simulatore_durata_secondi{{{etichetta},quantile="{q}"}} {r[chiave]:.9f}')
+        righe.append(f"simulatore_durata_secondi_sum{{{etichetta}}} {r['totale_s']:.9f}")
+        righe.append(f"simulatore_durata_secondi_count{{{etichetta}}} {r['conteggio']}")
+
+    # Senza importare cache (e i motori): se non è caricata nessun calcolo è passato di lì.
+    cache = sys.modules.get("cache")
+    stat = (cache.CACHE.statistiche() if cache is not None
+            else {"hit": 0, "miss": 0, "hit_rate": 0.0, "voci": 0, "invalidazioni": 0})
+    for chiave, tipo, descrizione in (
+        ("hit", "counter", "Richieste servite dalla cache dei risultati."),
+        ("miss", "counter", "Richieste calcolate dal motore (cache mancata)."),
+        ("hit_rate", "gauge", "Quota di richieste servite dalla cache."),
+        ("voci", "gauge", "Risultati attualmente in cache."),
+        ("invalidazioni", "counter", "Svuotamenti per cambio parametri."),
+    ):
+        nome = f"simulatore_cache_{chiave}"
+        righe += [f"# HELP {nome} {descrizione}", f"# TYPE {nome} {tipo}",
+                  f"{nome} {stat[chiave]}"]
+    righe += ["# HELP simulatore_metriche_attive 1 se la registrazione dei tempi è attiva.",
+              "# TYPE simulatore_metriche_attive gauge",
+              f"simulatore_metriche_attive {int(_attive)}"]
+    return "\n".join(righe) + "\n"
+
+
+def scrivi_prometheus(percorso: str, registro: RegistroMetriche = REGISTRO) -> None:
+    """Scrive l'export su file in modo atomico (per il textfile collector di node_exporter)."""
+    temporaneo = f"{percorso}.{os.getpid()}.tmp"
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        f.write(esporta_prometheus(registro))
+    os.replace(temporaneo, percorso)
+
+
+_scrittore = None
+_scrittore_lock = threading.Lock()
+
+
+def _scrivi_ignorando_errori(percorso: str) -> None:
+    try:
+        scrivi_prometheus(percorso)
+    except OSError as e:
+        print(f"Metriche non scritte su {percorso}: {e}", file=sys.stderr)
+
+
+def avvia_scrittura_periodica(percorso: str = "", intervallo: float = 0) -> bool:
+    """
+    Scrive l'export su `percorso` ogni `intervallo` secondi e all'uscita del processo.
+
+    Default da SIMULATORE_PROMETHEUS_FILE / SIMULATORE_PROMETHEUS_INTERVALLO;
+    senza percorso non fa nulla. Un solo thread per processo: le chiamate
+    successive (i rerun della pagina) non ne avviano altri. Restituisce True
+    se la scrittura è attiva.
+    """
+    global _scrittore
+    percorso = percorso or FILE_PROMETHEUS
+    if not percorso:
+        return False
+    intervallo = intervallo or INTERVALLO_PROMETHEUS
+    with _scrittore_lock:
+        if _scrittore is None:
+            fermo = threading.Event()
+
+            def ciclo():
+                while not fermo.wait(intervallo):
+                    _scrivi_ignorando_errori(percorso)
+
+            def all_uscita():
+                fermo.set()
+                _scrittore.join()               # lascia finire una scrittura in corso
+                _scrivi_ignorando_errori(percorso)
+
+            _scrittore = threading.Thread(target=ciclo, name="metriche-prometheus", daemon=True)
+            _scrittore.start()
+            atexit.register(all_uscita)
+    return True
@@ -0,0 +1,571 @@
+"""
+Motore di calcolo Studio Gaetani – Sport Tax Advisor.
+
+Funzioni di calcolo P.IVA forfettaria / co.co.co. sportivo (i parametri
+normativi per anno fiscale sono in parametri.py), senza dipendenze da Streamlit: importabile da app.py, dagli script
+batch e dai benchmark.
+"""
+from datetime import date
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from parametri import parametri, versione_registro
+
+# Parametri dell'anno predefinito (sola lettura), per etichette e default.
+# I motori accettano `anno` e leggono i parametri di quell'anno dal registro.
+PARAMS = parametri().valori
+
+# ─────────────────────────────────────────────────────────────────────────────
+# UTILITY: IRPEF progressiva a scaglioni
+# ─────────────────────────────────────────────────────────────────────────────
+def calcola_irpef(imponibile: float, anno: Optional[int] = None) -> float:
+    """
+    Calcola IRPEF lorda applicando gli scaglioni progressivi dell'anno fiscale.
+    Fonte: TUIR art. 11, aggiornato dalla L. Bilancio dell'anno.
+    """
+    return parametri(anno).irpef(imponibile)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# UTILITY: warning scadenza riduzione IVS
+# ─────────────────────────────────────────────────────────────────────────────
+def check_riduzione_ivs_attiva(anno: Optional[int] = None) -> bool:
+    """
+    Restituisce True se la riduzione 50% IVS è in vigore.
+    Art. 35 c. 8-ter D.Lgs. 36/2021: valida fino al 31/12/2027.
+
+    Con `anno` la risposta vale per l'intero anno fiscale indicato; senza,
+    si confronta la data odierna con la scadenza (banner dell'app).
+    """
+    if anno is not None:
+        return parametri(anno).riduzione_attiva
+    return date.today() <= PARAMS["scadenza_riduzione_ivs"]
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RISULTATI DEI MOTORI SCALARI
+# ─────────────────────────────────────────────────────────────────────────────
+# Tuple con nome (immutabili, senza __dict__): meno della metà della memoria di
+# un dict con le stesse chiavi, condivisibili senza copie tra cache e sessioni
+# e veloci da costruire. Si leggono come attributi (res.netto) o, per
+# compatibilità, per chiave (res["netto"], dict(res)). I campi hanno nomi e
+# ordine delle colonne dei motori batch; la formattazione degli importi
+# avviene solo in visualizzazione.
+def _per_chiave(self, chiave):
+    if isinstance(chiave, str):
+        try:
+            return getattr(self, chiave)
+        except AttributeError:
+            raise KeyError(chiave) from None
+    return tuple.__getitem__(self, chiave)
+
+
+def _chiavi(self) -> tuple:
+    return self._fields
+
+
+class RisultatoPiva(NamedTuple):
+    compenso: float
+    rivalsa: float
+    fatturato: float
+    BIC_lorda: float
+    BIC_IVS: float
+    contrib_IVS: float
+    contrib_add: float
+    inps: float
+    componenti_pos: float
+    reddito_forf: float
+    imponibile_forf: float
+    tasse: float
+    bollo: float
+    netto: float
+    riduzione_attiva: bool
+
+    __getitem__ = _per_chiave
+    keys = _chiavi
+
+
+class RisultatoCococo(NamedTuple):
+    lordo: float
+    BIC_lorda: float
+    BIC_IVS: float
+    contrib_IVS: float
+    contrib_add: float
+    contrib_tot: float
+    quota_lav: float
+    quota_comm: float
+    imponibile_irpef: float
+    ritenuta_acconto: float
+    irpef_lorda: float
+    saldo_irpef: float
+    netto: float
+    costo_committente: float
+    riduzione_attiva: bool
+
+    __getitem__ = _per_chiave
+    keys = _chiavi
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MOTORE DI CALCOLO P.IVA FORFETTARIA (CORRETTO)
+# ─────────────────────────────────────────────────────────────────────────────
+@cronometra("motore.calcoli_avanzati_piva")
+def calcoli_avanzati_piva(compenso_base: float, apply_rivalsa: bool,
+                          apply_bollo: bool, aliquota_imp: float,
+                          anno: Optional[int] = None) -> RisultatoPiva:
+    """
+    Calcola il netto P.IVA forfettaria sportiva applicando la normativa corretta.
+
+    CORREZIONI rispetto alla versione precedente:
+    ──────────────────────────────────────────────
+    BUG #1 – Imponibile forfettario (AdE CG 14/2025):
+        VECCHIO: reddito_forf = fatturato × 0.78 → imponibile = reddito_forf - INPS - 15.000
+        CORRETTO: componenti_pos = fatturato - 15.000 → reddito_forf = componenti_pos × 0.78
+                  imponibile = reddito_forf - INPS
+        Il vecchio metodo applicava il coeff. 78% anche sulla franchigia €15.000,
+        producendo un imponibile fiscale più basso (tasse sottostimate di ~€2.500 su €30k).
+
+    BUG #2 – Calcolo INPS (art. 35 c.8-ter D.Lgs. 36/2021):
+        VECCHIO: inps = (BIC_lorda × 50%) × 26.07%
+                 → sbagliato: le aggiuntive (1,07%) beneficiavano della riduzione 50%
+        CORRETTO: contrib_IVS  = (BIC_lorda × 50%) × 25%      [IVS: riduzione applicata]
+                  contrib_add  = BIC_lorda          × 1,07%    [aggiuntive: NO riduzione]
+                  inps_totale  = contrib_IVS + contrib_add
+    """
+    P = parametri(anno)
+    riduzione_attiva = P.riduzione_attiva
+    riduzione = P.riduzione
+
+    # A. FATTURATO LORDO (Compenso + eventuale rivalsa 4%)
+    rivalsa_val = compenso_base * 0.04 if apply_rivalsa else 0.0
+    fatturato_lordo = compenso_base + rivalsa_val
+
+    # B. CALCOLO INPS – BASE PREVIDENZIALE
+    # BIC_lorda = fatturato lordo − franchigia previdenziale €5.000 (art. 35 c.8-bis)
+    BIC_lorda = max(0.0, fatturato_lordo - P["soglia_prev"])
+    BIC_IVS   = BIC_lorda * riduzione                              # 50% fino al 2027
+
+    contrib_IVS = BIC_IVS   * P["aliq_ivs_piva"]             # 25% su BIC ridotta
+    contrib_add = BIC_lorda * P["aliq_add_piva"]             # 1,07% su BIC intera
+    inps_totale = contrib_IVS + contrib_add                        # 100% a carico autonomo
+
+    # C. CALCOLO REDDITO FORFETTARIO (FISCO)
+    # AdE CG 14/2025: coeff. 78% sui compensi AL NETTO della franchigia fiscale €15.000
+    componenti_pos    = max(0.0, fatturato_lordo - P["soglia_fiscale"])
+    reddito_forfett   = componenti_pos * P["coeff_redditivita"]
+
+    # D. IMPONIBILE FISCALE: reddito forfettario − INPS versata
+    imponibile_fiscale = max(0.0, reddito_forfett - inps_totale)
+    tasse = imponibile_fiscale * aliquota_imp
+
+    # E. NETTO LAVORATORE
+    bollo_val = 2.0 if apply_bollo and fatturato_lordo > 77.47 else 0.0
+    netto = fatturato_lordo - inps_totale - tasse
+
+    return RisultatoPiva(  # stesso ordine dei campi
+        compenso_base,
+        rivalsa_val,
+        fatturato_lordo,
+        BIC_lorda,
+        BIC_IVS,
+        contrib_IVS,
+        contrib_add,
+        inps_totale,
+        componenti_pos,
+        reddito_forfett,
+        imponibile_fiscale,
+        tasse,
+        bollo_val,
+        netto,
+        riduzione_attiva,
+    )
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CALCOLO INVERSO P.IVA (forma chiusa – vedi calcolo_inverso più sotto)
+# ─────────────────────────────────────────────────────────────────────────────
+@cronometra("motore.calcolo_inverso_piva")
+def calcolo_inverso_piva(netto_target: float, apply_rivalsa: bool,
+                         apply_bollo: bool, aliquota_imp: float,
+                         anno: Optional[int] = None) -> RisultatoPiva:
+    """Compenso base necessario per ottenere il netto indicato."""
+    compenso = calcolo_inverso("piva", "netto", netto_target, apply_rivalsa=apply_rivalsa,
+                               aliquota_imp=aliquota_imp, anno=anno)
+    return calcoli_avanzati_piva(compenso, apply_rivalsa, apply_bollo, aliquota_imp, anno=anno)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MOTORE DI CALCOLO CO.CO.CO. (CORRETTO)
+# ─────────────────────────────────────────────────────────────────────────────
+@cronometra("motore.calcola_cococo")
+def calcola_cococo(lordo: float, gia_assicurato: bool = False,
+                   anno: Optional[int] = None) -> RisultatoCococo:
+    """
+    Calcola il netto co.co.co. sportivo dilettantistico con normativa corretta.
+
+    CORREZIONI rispetto alla versione precedente:
+    ──────────────────────────────────────────────
+    BUG #3 – Aliquota INPS co.co.co. incompleta:
+        VECCHIO: aliquota_inps_tot = 25% applicata su BIC_IVS (50% di BIC_lorda)
+                 → mancavano le aliquote aggiuntive DIS-COLL + malattia + maternità (2,03%)
+        CORRETTO: contrib_IVS = BIC_IVS   × 25%    [solo IVS beneficia della riduzione 50%]
+                  contrib_add = BIC_lorda × 2,03%   [aggiuntive su base intera]
+
+    BUG #4 – IRPEF flat 23%:
+        VECCHIO: irpef = imponibile × 0.23 (scaglione unico)
+        CORRETTO: scaglioni progressivi 23% / 35% / 43% (TUIR art.11, L. Bilancio 2025)
+
+    AGGIUNTO: costo_committente = lordo + quota_committente_INPS (2/3 dei contributi totali)
+    """
+    P = parametri(anno)
+    riduzione_attiva = P.riduzione_attiva
+    riduzione = P.riduzione
+
+    aliq_ivs = (P["aliq_ivs_cococo_assicurato"] if gia_assicurato
+                else P["aliq_ivs_cococo"])
+
+    # B. CALCOLO INPS
+    BIC_lorda = max(0.0, lordo - P["soglia_prev"])
+    BIC_IVS   = BIC_lorda * riduzione                     # 50% fino al 2027
+
+    contrib_IVS = BIC_IVS   * aliq_ivs                   # 25% (o 24%) su BIC ridotta
+    contrib_add = BIC_lorda * P["aliq_add_cococo"]  # 2,03% su BIC intera
+    contrib_tot  = contrib_IVS + contrib_add
+
+    quota_lav   = contrib_tot * P["quota_lav_cococo"]   # 1/3 lavoratore
+    quota_comm  = contrib_tot * (1 - P["quota_lav_cococo"])  # 2/3 committente
+
+    # C. CALCOLO FISCALE
+    # Soglia €15.000 sul lordo + deduzione INPS quota lavoratore (art. 10 TUIR)
+    imponibile_irpef = max(0.0, lordo - P["soglia_fiscale"] - quota_lav)
+    ritenuta_acconto = max(0.0, lordo - P["soglia_fiscale"]) * P["aliq_ritenuta_acconto"]
+    irpef_lorda      = P.irpef(imponibile_irpef)
+    saldo_irpef      = max(0.0, irpef_lorda - ritenuta_acconto)
+
+    # D. NETTO E COSTO COMMITTENTE
+    netto            = lordo - quota_lav - irpef_lorda
+    costo_committente = lordo + quota_comm
+
+    return RisultatoCococo(  # stesso ordine dei campi
+        lordo,
+        BIC_lorda,
+        BIC_IVS,
+        contrib_IVS,
+        contrib_add,
+        contrib_tot,
+        quota_lav,
+        quota_comm,
+        imponibile_irpef,
+        ritenuta_acconto,
+        irpef_lorda,
+        saldo_irpef,
+        netto,
+        costo_committente,
+        riduzione_attiva,
+    )
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MOTORE BATCH (vettoriale) – intere rose di collaboratori in un solo passaggio
+# ─────────────────────────────────────────────────────────────────────────────
+# Le funzioni *_batch replicano operazione per operazione (stesso ordine, stesse
+# costanti) i motori scalari: i risultati coincidono bit a bit, quindi al
+# centesimo. I flag possono essere scalari o array per riga.
+
+def _as_array(valori, dtype=float) -> np.ndarray:
+    """Converte scalari, liste, array NumPy o Series pandas in array 1-D."""
+    return np.atleast_1d(np.asarray(valori, dtype=dtype))
+
+
+def _round2(valori: np.ndarray) -> np.ndarray:
+    """
+    Arrotondamento al centesimo identico a round(x, 2) di Python.
+
+    np.round lavora su x*100 e può divergere da round() sui casi "a metà";
+    quei pochi elementi vengono ricalcolati con round() scalare.
+    """
+    arr = np.round(valori, 2)
+    scaled = valori * 100.0
+    frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    ties = frac < 1e-6
+    if ties.any():
+        arr[ties] = [round(float(v), 2) for v in valori[ties]]
+    return arr
+
+
+def _riduzione(P, riduzione_ivs, n: int):
+    """Flag e moltiplicatore della base IVS: quelli dell'anno o quelli forzati per riga."""
+    if riduzione_ivs is None:
+        return P.riduzione_attiva, P.riduzione
+    attiva = np.broadcast_to(_as_array(riduzione_ivs, bool), (n,))
+    return attiva, np.where(attiva, P["riduzione_ivs"], 1.0)
+
+
+def calcola_irpef_batch(imponibili, anno: Optional[int] = None) -> np.ndarray:
+    """Versione vettoriale di calcola_irpef (stesse tabelle, stesso arrotondamento)."""
+    return _round2(parametri(anno).irpef_batch(_as_array(imponibili)))
+
+
+@cronometra("motore.calcoli_avanzati_piva_batch")
+def calcoli_avanzati_piva_batch(compensi, apply_rivalsa=False, apply_bollo=False,
+                                aliquota_imp=0.05, anno: Optional[int] = None,
+                                riduzione_ivs=None) -> pd.DataFrame:
+    """
+    Versione colonnare di calcoli_avanzati_piva per array o Series di compensi.
+
+    `apply_rivalsa`, `apply_bollo` e `aliquota_imp` possono essere scalari o
+    array della stessa lunghezza dei compensi. Restituisce un DataFrame con le
+    stesse colonne (e nello stesso ordine) delle chiavi del dict scalare; se
+    `compensi` è una Series ne conserva l'indice. `riduzione_ivs` (flag
+    scalare o per riga) forza la riduzione IVS al posto di quella dell'anno,
+    per le analisi what-if.
+    """
+    index = compensi.index if isinstance(compensi, pd.Series) else None
+    compenso_base = _as_array(compensi)
+    n = compenso_base.shape[0]
+    rivalsa_flag = np.broadcast_to(_as_array(apply_rivalsa, bool), (n,))
+    bollo_flag = np.broadcast_to(_as_array(apply_bollo, bool), (n,))
+    aliquota = np.broadcast_to(_as_array(aliquota_imp), (n,))
+
+    P = parametri(anno)
+    riduzione_attiva, riduzione = _riduzione(P, riduzione_ivs, n)
+
+    # A. FATTURATO LORDO
+    rivalsa_val = np.where(rivalsa_flag, compenso_base * 0.04, 0.0)
+    fatturato_lordo = compenso_base + rivalsa_val
+
+    # B. INPS
+    BIC_lorda = np.maximum(0.0, fatturato_lordo - P["soglia_prev"])
+    BIC_IVS   = BIC_lorda * riduzione
+    contrib_IVS = BIC_IVS   * P["aliq_ivs_piva"]
+    contrib_add = BIC_lorda * P["aliq_add_piva"]
+    inps_totale = contrib_IVS + contrib_add
+
+    # C-D. FISCO FORFETTARIO
+    componenti_pos     = np.maximum(0.0, fatturato_lordo - P["soglia_fiscale"])
+    reddito_forfett    = componenti_pos * P["coeff_redditivita"]
+    imponibile_fiscale = np.maximum(0.0, reddito_forfett - inps_totale)
+    tasse = imponibile_fiscale * aliquota
+
+    # E. NETTO
+    bollo_val = np.where(bollo_flag & (fatturato_lordo > 77.47), 2.0, 0.0)
+    netto = fatturato_lordo - inps_totale - tasse
+
+    return pd.DataFrame({
+        "compenso":         compenso_base,
+        "rivalsa":          rivalsa_val,
+        "fatturato":        fatturato_lordo,
+        "BIC_lorda":        BIC_lorda,
+        "BIC_IVS":          BIC_IVS,
+        "contrib_IVS":      contrib_IVS,
+        "contrib_add":      contrib_add,
+        "inps":             inps_totale,
+        "componenti_pos":   componenti_pos,
+        "reddito_forf":     reddito_forfett,
+        "imponibile_forf":  imponibile_fiscale,
+        "tasse":            tasse,
+        "bollo":            bollo_val,
+        "netto":            netto,
+        "riduzione_attiva": np.full(n, riduzione_attiva),
+    }, index=index)
+
+
+@cronometra("motore.calcola_cococo_batch")
+def calcola_cococo_batch(lordi, gia_assicurato=False,
+                         anno: Optional[int] = None, riduzione_ivs=None) -> pd.DataFrame:
+    """
+    Versione colonnare di calcola_cococo per array o Series di compensi lordi.
+
+    `gia_assicurato` può essere scalare o un array di flag per riga;
+    `riduzione_ivs` come in calcoli_avanzati_piva_batch.
+    """
+    index = lordi.index if isinstance(lordi, pd.Series) else None
+    lordo = _as_array(lordi)
+    n = lordo.shape[0]
+    assicurato = np.broadcast_to(_as_array(gia_assicurato, bool), (n,))
+
+    P = parametri(anno)
+    riduzione_attiva, riduzione = _riduzione(P, riduzione_ivs, n)
+
+    aliq_ivs = np.where(assicurato, P["aliq_ivs_cococo_assicurato"],
+                        P["aliq_ivs_cococo"])
+
+    # B. INPS
+    BIC_lorda = np.maximum(0.0, lordo - P["soglia_prev"])
+    BIC_IVS   = BIC_lorda * riduzione
+    contrib_IVS = BIC_IVS   * aliq_ivs
+    contrib_add = BIC_lorda * P["aliq_add_cococo"]
+    contrib_tot = contrib_IVS + contrib_add
+    quota_lav   = contrib_tot * P["quota_lav_cococo"]
+    quota_comm  = contrib_tot * (1 - P["quota_lav_cococo"])
+
+    # C. FISCO
+    imponibile_irpef = np.maximum(0.0, lordo - P["soglia_fiscale"] - quota_lav)
+    ritenuta_acconto = np.maximum(0.0, lordo - P["soglia_fiscale"]) * P["aliq_ritenuta_acconto"]
+    irpef_lorda      = _round2(P.irpef_batch(imponibile_irpef))
+    saldo_irpef      = np.maximum(0.0, irpef_lorda - ritenuta_acconto)
+
+    # D. NETTO E COSTO COMMITTENTE
+    netto             = lordo - quota_lav - irpef_lorda
+    costo_committente = lordo + quota_comm
+
+    return pd.DataFrame({
+        "lordo":              lordo,
+        "BIC_lorda":          BIC_lorda,
+        "BIC_IVS":            BIC_IVS,
+        "contrib_IVS":        contrib_IVS,
+        "contrib_add":        contrib_add,
+        "contrib_tot":        contrib_tot,
+        "quota_lav":          quota_lav,
+        "quota_comm":         quota_comm,
+        "imponibile_irpef":   imponibile_irpef,
+        "ritenuta_acconto":   ritenuta_acconto,
+        "irpef_lorda":        irpef_lorda,
+        "saldo_irpef":        saldo_irpef,
+        "netto":              netto,
+        "costo_committente":  costo_committente,
+        "riduzione_attiva":   np.full(n, riduzione_attiva),
+    }, index=index)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CALCOLO INVERSO GENERALE (goal-seek in forma chiusa)
+# ─────────────────────────────────────────────────────────────────────────────
+# Ogni grandezza prodotta dai motori è lineare a tratti nell'importo di input:
+# i punti di rottura sono le soglie (€5.000, €15.000), gli scaglioni IRPEF e i
+# max(0, …) sull'imponibile. Calcolati i punti di rottura, l'inverso su ogni
+# tratto è un'interpolazione lineare esatta, valida per array di target.
+
+CAMPI_INVERSO = {
+    "piva":   {"netto": "netto", "fatturato": "fatturato",
+               "costo_committente": "fatturato"},
+    "cococo": {"netto": "netto", "costo_committente": "costo_committente",
+               "lordo": "lordo", "fatturato": "lordo"},
+}
+
+
+def _punti_rottura_piva(apply_rivalsa: bool, P) -> np.ndarray:
+    """Punti di rottura (in compenso base) del motore P.IVA."""
+    k = P.riduzione * P["aliq_ivs_piva"] + P["aliq_add_piva"]
+    coeff = P["coeff_redditivita"]
+    # imponibile forfettario = 0  ⇔  coeff·(F − soglia_fiscale) = k·(F − soglia_prev)
+    f_zero = (coeff * P["soglia_fiscale"] - k * P["soglia_prev"]) / (coeff - k)
+    fatturati = np.array([0.0, P["soglia_prev"], P["soglia_fiscale"], f_zero])
+    return fatturati / (1.04 if apply_rivalsa else 1.0)
+
+
+def _punti_rottura_cococo(gia_assicurato: bool, P) -> np.ndarray:
+    """Punti di rottura (in lordo) del motore co.co.co."""
+    aliq_ivs = (P["aliq_ivs_cococo_assicurato"] if gia_assicurato
+                else P["aliq_ivs_cococo"])
+    q = (P.riduzione * aliq_ivs + P["aliq_add_cococo"]) * P["quota_lav_cococo"]
+    # imponibile IRPEF = L  ⇔  lordo − soglia_fiscale − q·(lordo − soglia_prev) = L
+    limiti = P.limiti_irpef
+    punti = [(lim + P["soglia_fiscale"] - q * P["soglia_prev"]) / (1 - q)
+             for lim in limiti]
+    return np.array([0.0, P["soglia_prev"], P["soglia_fiscale"], *punti])
+
+
+def punti_rottura(regime: str, apply_rivalsa: bool = False, gia_assicurato: bool = False,
+                  anno: Optional[int] = None) -> np.ndarray:
+    """Punti di rottura (ordinati, ≥ 0) dell'importo di input per il regime indicato."""
+    P = parametri(anno)
+    if regime == "piva":
+        x_k = _punti_rottura_piva(apply_rivalsa, P)
+    else:
+        x_k = _punti_rottura_cococo(gia_assicurato, P)
+    return np.unique(np.maximum(x_k, 0.0))
+
+
+def _inverti_tratti(x_k: np.ndarray, f_k: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Inverte una funzione lineare a tratti non decrescente data dai suoi nodi."""
+    seg = np.clip(np.searchsorted(f_k, target, side="right") - 1, 0, len(f_k) - 2)
+    df = f_k[seg + 1] - f_k[seg]
+    dx = x_k[seg + 1] - x_k[seg]
+    pendenza = np.divide(dx, df, out=np.zeros_like(dx), where=df > 0)
+    return np.maximum(0.0, x_k[seg] + (target - f_k[seg]) * pendenza)
+
+
+@lru_cache(maxsize=256)
+def _tabella_inversa(regime: str, colonna: str, flag: bool, aliquota: float,
+                     anno: int, versione: int):
+    """
+    Nodi (input, output) della funzione da invertire per una combinazione di flag.
+
+    In cache: le richieste singole (pagina, servizio HTTP) non ricalcolano i
+    nodi col motore batch a ogni goal-seek. `versione` è quella del registro
+    parametri, così un registra_anno() invalida le tabelle.
+    """
+    if regime == "piva":
+        x = punti_rottura("piva", apply_rivalsa=flag, anno=anno)
+    else:
+        x = punti_rottura("cococo", gia_assicurato=flag, anno=anno)
+    # Oltre l'ultimo nodo la funzione è lineare: un nodo lontano basta.
+    x = np.append(x, x[-1] * 2 + 100_000.0)
+    if regime == "piva":
+        f = calcoli_avanzati_piva_batch(x, flag, False, aliquota, anno=anno)[colonna].to_numpy()
+    else:
+        f = calcola_cococo_batch(x, flag, anno=anno)[colonna].to_numpy()
+    x.setflags(write=False)
+    f.setflags(write=False)
+    return x, f
+
+
+@cronometra("motore.calcolo_inverso")
+def calcolo_inverso(regime: str, campo: str, target, apply_rivalsa=False,
+                    aliquota_imp=0.05, gia_assicurato=False, anno: Optional[int] = None):
+    """
+    Goal-seek: restituisce l'importo di input che produce `target` sul `campo`.
+
+    regime:  "piva" (input = compenso base) o "cococo" (input = lordo).
+    campo:   vedi CAMPI_INVERSO; per la P.IVA il costo committente coincide
+             col fatturato (nessun onere contributivo a carico del club).
+             Il bollo non entra nel netto, quindi non serve come flag.
+    target e i flag possono essere scalari o array per riga: con target
+    scalare si ottiene un float, altrimenti un array NumPy. `anno` seleziona
+    i parametri fiscali (default: ANNO_PREDEFINITO).
+    """
+    if regime not in CAMPI_INVERSO:
+        raise ValueError(f"Regime non valido: {regime!r} (usa 'piva' o 'cococo')")
+    if campo not in CAMPI_INVERSO[regime]:
+        raise ValueError(f"Campo non invertibile per {regime}: {campo!r} "
+                         f"(disponibili: {', '.join(CAMPI_INVERSO[regime])})")
+    colonna = CAMPI_INVERSO[regime][campo]
+    P = parametri(anno)
+
+    scalare = np.ndim(target) == 0
+    target = _as_array(target)
+    n = target.shape[0]
+    risultato = np.empty(n)
+
+    if regime == "piva":
+        flag_riga = np.ndim(apply_rivalsa) > 0 or np.ndim(aliquota_imp) > 0
+        rivalsa = np.broadcast_to(_as_array(apply_rivalsa, bool), (n,))
+        aliquote, idx_aliq = np.unique(np.broadcast_to(_as_array(aliquota_imp), (n,)),
+                                       return_inverse=True)
+        chiave = idx_aliq.reshape(-1) * 2 + rivalsa
+    else:
+        flag_riga = np.ndim(gia_assicurato) > 0
+        chiave = np.broadcast_to(_as_array(gia_assicurato, bool), (n,)).astype(np.intp)
+
+    # Un solo set di nodi per ogni combinazione distinta di flag.
+    for k in (np.unique(chiave) if flag_riga else chiave[:1]):
+        if regime == "piva":
+            x_k, f_k = _tabella_inversa(regime, colonna, bool(k % 2), float(aliquote[k // 2]),
+                                        P.anno, versione_registro())
+        else:
+            x_k, f_k = _tabella_inversa(regime, colonna, bool(k), 0.0,
+                                        P.anno, versione_registro())
+        if flag_riga:
+            righe = chiave == k
+            risultato[righe] = _inverti_tratti(x_k, f_k, target[righe])
+        else:
+            risultato[:] = _inverti_tratti(x_k, f_k, target)
+
+    return float(risultato[0]) if scalare else risultato
+
+
+@cronometra("motore.calcolo_inverso_cococo")
+def calcolo_inverso_cococo(netto_target: float, gia_assicurato: bool = False,
+                           anno: Optional[int] = None) -> RisultatoCococo:
+    """Lordo co.co.co. necessario per ottenere il netto indicato."""
+    lordo = calcolo_inverso("cococo", "netto", netto_target,
+                            gia_assicurato=gia_assicurato, anno=anno)
+    return calcola_cococo(lordo, gia_assicurato=gia_assicurato, anno=anno)
@@ -0,0 +1,147 @@
+"""
+Scelta del regime per collaboratore che minimizza il costo totale del club.
+
+Per ogni persona della rosa il netto minimo da garantire fissa, tramite il
+goal-seek in forma chiusa (calcolo_inverso), il compenso necessario in
+ciascun regime: il costo committente è funzione lineare a tratti e crescente
+del netto, quindi il costo minimo in un regime è quello al netto minimo. Il
+costo totale è separabile per persona: il minimo della rosa è la somma dei
+minimi individuali, scelti tra i regimi ammessi (forfettario solo se
+consentito e con ricavi entro soglia_forfettario). Nessuna ricerca per
+tentativi: una rosa di 10.000 persone si risolve in pochi millisecondi.
+
+Colonne riconosciute (maiuscole/minuscole indifferenti):
+    nome, netto (netto minimo), regime (piva / cococo / vuoto = libero),
+    forfettario (ammesso al forfettario), rivalsa, aliquota, assicurato
+Solo `netto` è obbligatoria; le altre hanno i default passati al chiamante.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from motore import PARAMS, calcoli_avanzati_piva_batch, calcola_cococo_batch, calcolo_inverso
+from parametri import parametri
+from roster import aliquote_colonna, flag_colonna
+
+COLONNE_OTTIMIZZAZIONE = [
+    "nome", "netto_minimo", "regime", "importo", "netto", "costo_committente",
+    "costo_piva", "costo_cococo", "risparmio", "note",
+]
+
+_SINONIMI = {
+    "nominativo": "nome", "collaboratore": "nome", "atleta": "nome",
+    "netto_minimo": "netto", "netto_target": "netto", "target": "netto",
+    "ammesso_forfettario": "forfettario",
+    "gia_assicurato": "assicurato", "già assicurato": "assicurato",
+}
+
+
+def _normalizza(rosa: pd.DataFrame) -> pd.DataFrame:
+    df = rosa.copy()
+    df.columns = [_SINONIMI.get(str(c).strip().lower(), str(c).strip().lower())
+                  for c in df.columns]
+    if "netto" not in df.columns:
+        raise ValueError("La rosa deve contenere una colonna 'netto' (netto minimo per persona).")
+    netto = df["netto"]
+    if netto.dtype.kind not in "if":
+        netto = netto.astype(str).str.replace(",", ".", regex=False)
+    df["netto"] = pd.to_numeric(netto, errors="coerce")
+    if df["netto"].isna().any() or (df["netto"] < 0).any():
+        raise ValueError("Colonna 'netto' con valori mancanti, negativi o non numerici.")
+    return df
+
+
+def _importo_minimo(importi: np.ndarray, target: np.ndarray, motore_batch) -> pd.DataFrame:
+    """
+    Risultati del motore all'importo, al centesimo superiore, che dà netto ≥ target.
+
+    L'IRPEF è arrotondata al centesimo, quindi il netto può restare sotto il
+    target di frazioni di centesimo: quelle righe salgono di un centesimo.
+    """
+    importi = np.ceil(np.round(importi * 100, 6)) / 100
+    res = motore_batch(importi, np.arange(len(importi)))
+    for _ in range(5):
+        corti = np.flatnonzero(res["netto"].to_numpy() < target)
+        if not len(corti):
+            break
+        importi[corti] += 0.01
+        res.iloc[corti] = motore_batch(importi[corti], corti).to_numpy()
+    return res
+
+
+@cronometra("ottimizzatore.ottimizza_rosa")
+def ottimizza_rosa(rosa: pd.DataFrame, budget: Optional[float] = None, rivalsa: bool = False,
+                   aliquota: float = PARAMS["aliq_forfettario_new"], assicurato: bool = False,
+                   forfettario: bool = True, anno: Optional[int] = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Regime e compenso di ogni collaboratore al costo minimo per il club.
+
+    Restituisce (piano, riepilogo): il piano ha le colonne di
+    COLONNE_OTTIMIZZAZIONE (importo = compenso base P.IVA o lordo co.co.co.,
+    al centesimo superiore); il riepilogo riporta costo minimo, costi con un
+    solo regime e, se indicato, il confronto col `budget`.
+    """
+    df = _normalizza(rosa)
+    n = len(df)
+    P = parametri(anno)
+    target = df["netto"].to_numpy(float)
+    flag_rivalsa = flag_colonna(df, "rivalsa", rivalsa)
+    aliquote = aliquote_colonna(df, aliquota)
+    flag_assicurato = flag_colonna(df, "assicurato", assicurato)
+    ammesso = flag_colonna(df, "forfettario", forfettario)
+    vincolo = (df["regime"].fillna("").astype(str).str.lower().str.replace(r"[\s.]", "", regex=True)
+               if "regime" in df.columns else pd.Series("", index=df.index))
+    ammesso = ammesso & ~vincolo.str.startswith("coco").to_numpy()
+    solo_piva = vincolo.str.startswith(("piva", "forf")).to_numpy()
+
+    piva = _importo_minimo(
+        calcolo_inverso("piva", "netto", target, apply_rivalsa=flag_rivalsa,
+                        aliquota_imp=aliquote, anno=P.anno),
+        target, lambda x, righe: calcoli_avanzati_piva_batch(
+            x, flag_rivalsa[righe], False, aliquote[righe], anno=P.anno))
+    dip = _importo_minimo(
+        calcolo_inverso("cococo", "netto", target, gia_assicurato=flag_assicurato, anno=P.anno),
+        target, lambda x, righe: calcola_cococo_batch(x, flag_assicurato[righe], anno=P.anno))
+    compenso = piva["compenso"].to_numpy()
+    lordo = dip["lordo"].to_numpy()
+
+    costo_piva = piva["fatturato"].to_numpy()
+    costo_cococo = dip["costo_committente"].to_numpy()
+    entro_soglia = costo_piva <= P["soglia_forfettario"]
+    piva_possibile = ammesso & entro_soglia
+    scegli_piva = piva_possibile & ((costo_piva < costo_cococo) | solo_piva)
+
+    note = np.full(n, "", dtype=object)
+    note[ammesso & ~entro_soglia] = "ricavi oltre soglia forfettario"
+    note[solo_piva & ~piva_possibile] = "P.IVA richiesta ma non applicabile: co.co.co."
+    note[~ammesso & ~solo_piva & (costo_piva < costo_cococo)] = "P.IVA più economica ma non ammessa"
+
+    piano = pd.DataFrame({
+        "nome":              (df["nome"].astype(str).to_numpy() if "nome" in df.columns
+                              else np.full(n, "")),
+        "netto_minimo":      target,
+        "regime":            np.where(scegli_piva, "piva", "cococo"),
+        "importo":           np.where(scegli_piva, compenso, lordo),
+        "netto":             np.where(scegli_piva, piva["netto"].to_numpy(), dip["netto"].to_numpy()),
+        "costo_committente": np.where(scegli_piva, costo_piva, costo_cococo),
+        "costo_piva":        np.where(piva_possibile, costo_piva, np.nan),
+        "costo_cococo":      costo_cococo,
+        "risparmio":         costo_cococo - np.where(scegli_piva, costo_piva, costo_cococo),
+        "note":              note,
+    }, index=df.index)
+
+    costo_totale = float(piano["costo_committente"].sum())
+    riepilogo = {
+        "collaboratori":       n,
+        "piva":                int(scegli_piva.sum()),
+        "cococo":              int(n - scegli_piva.sum()),
+        "costo_totale":        costo_totale,
+        "costo_solo_cococo":   float(costo_cococo.sum()),
+        "risparmio":           float(costo_cococo.sum() - costo_totale),
+        "budget":              budget,
+        "entro_budget":        None if budget is None else costo_totale <= budget,
+        "margine":             None if budget is None else float(budget - costo_totale),
+    }
+    return piano, riepilogo
@@ -0,0 +1,188 @@
+"""
+Paghe mensili co.co.co. e riepilogo F24 per committente.
+
+Per ogni mese si elaborano in un solo passaggio vettoriale tutti i pagamenti
+di tutti i committenti: i cumulati annui per lavoratore (criterio di cassa,
+su tutti i committenti) sono tenuti in un array indicizzato per lavoratore,
+quindi le soglie di €5.000 (contributi) e €15.000 (ritenuta) superate a metà
+anno si applicano solo alla quota del pagamento che le eccede, esattamente
+come nel registro incrementale (registro_pagamenti.RegistroPagamenti).
+
+Il committente versa con F24 entro il 16 del mese successivo i contributi
+INPS (quota sua 2/3 + quota lavoratore 1/3 trattenuta in busta) e le
+ritenute IRPEF operate.
+"""
+from datetime import date, timedelta
+from typing import Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from parametri import parametri
+from registro_pagamenti import _aliquota_contributiva
+from roster import flag_colonna, leggi_rosa, rinomina_colonne
+
+COLONNE_CEDOLINI = [
+    "mese", "committente", "lavoratore", "importo", "cumulato",
+    "base_contributiva", "contributi", "quota_lav", "quota_comm",
+    "eccedenza_fiscale", "ritenuta", "netto",
+]
+
+# Oltre ai sinonimi della rosa (importo, assicurato): qui la persona è il lavoratore.
+_SINONIMI = {
+    "nome": "lavoratore", "nominativo": "lavoratore", "collaboratore": "lavoratore",
+    "atleta": "lavoratore", "codice_fiscale": "lavoratore", "cf": "lavoratore",
+    "club": "committente", "societa": "committente", "società": "committente",
+    "asd": "committente", "ssd": "committente",
+}
+
+
+def scadenza_f24(anno: int, mese: int) -> date:
+    """16 del mese successivo, spostato al lunedì se cade di sabato o domenica."""
+    giorno = date(anno + 1, 1, 16) if mese == 12 else date(anno, mese + 1, 16)
+    if giorno.weekday() >= 5:
+        giorno += timedelta(days=7 - giorno.weekday())
+    return giorno
+
+
+def _mesi(valori: pd.Series, anno: int) -> pd.Series:
+    """
+    Mese 1–12 da numeri o date dell'anno `anno`.
+
+    Le date ISO (2025-03-04) sono lette come anno-mese-giorno; solo le altre
+    (04/03/2025) come giorno/mese. Una data di un altro anno è un errore:
+    il mese da solo la farebbe contare nelle soglie dell'anno sbagliato.
+    """
+    if valori.dtype.kind in "iuf":
+        return valori
+    if valori.dtype.kind == "M":
+        date = valori
+    else:
+        testo = valori.astype(str).str.strip()
+        numeri = pd.to_numeric(testo, errors="coerce")
+        if numeri.notna().all():
+            return numeri
+        iso = testo.str.match(r"\d{4}-\d{1,2}-\d{1,2}")
+        date = pd.Series(pd.NaT, index=valori.index, dtype="datetime64[ns]")
+        if iso.any():
+            date[iso] = pd.to_datetime(testo[iso], format="ISO8601", errors="coerce")
+        altre = ~iso & numeri.isna()
+        if altre.any():
+            date[altre] = pd.to_datetime(testo[altre], format="mixed", dayfirst=True,
+                                         errors="coerce")
+    altri_anni = date.notna() & (date.dt.year != anno)
+    if altri_anni.any():
+        esempio = date[altri_anni].iloc[0].date()
+        raise ValueError(f"Colonna 'mese' con {int(altri_anni.sum())} date fuori dall'anno "
+                         f"{anno} (es. {esempio:%d/%m/%Y}).")
+    if valori.dtype.kind == "M":
+        return date.dt.month
+    return numeri.fillna(date.dt.month)             # anche mesi numerici e date mescolati
+
+
+def _normalizza(pagamenti: pd.DataFrame, anno: int) -> pd.DataFrame:
+    df = rinomina_colonne(pagamenti.copy(), _SINONIMI)
+    mancanti = {"lavoratore", "committente", "mese", "importo"} - set(df.columns)
+    if mancanti:
+        raise ValueError(f"Colonne mancanti nel file paghe: {', '.join(sorted(mancanti))}.")
+    df["mese"] = pd.to_numeric(_mesi(df["mese"], anno), errors="coerce")
+    if df["mese"].isna().any() or not df["mese"].between(1, 12).all():
+        raise ValueError("Colonna 'mese' con valori mancanti o fuori da 1–12.")
+    df["mese"] = df["mese"].astype(int)
+    importo = df["importo"]
+    if importo.dtype.kind not in "if":
+        importo = importo.astype(str).str.replace(",", ".", regex=False)
+    df["importo"] = pd.to_numeric(importo, errors="coerce")
+    if df["importo"].isna().any() or (df["importo"] < 0).any():
+        raise ValueError("Colonna 'importo' con valori mancanti, negativi o non numerici.")
+    df["lavoratore"] = df["lavoratore"].astype(str)
+    df["committente"] = df["committente"].astype(str)
+    return df
+
+
+def elabora_paghe(pagamenti: pd.DataFrame, anno: Optional[int] = None,
+                  gia_assicurato: bool = False,
+                  cumulati_iniziali: Optional[Mapping[str, float]] = None):
+    """
+    Calcola i cedolini mensili e il riepilogo F24 per committente.
+
+    `pagamenti`: una riga per pagamento con lavoratore, committente, mese (1–12
+    o data dell'anno fiscale) e importo; `assicurato` facoltativa (default
+    `gia_assicurato`).
+    Nello stesso mese i pagamenti di un lavoratore consumano le soglie
+    nell'ordine delle righe. `cumulati_iniziali` riporta compensi sportivi
+    già percepiti nell'anno fuori dal file (per lavoratore).
+
+    Restituisce (cedolini, f24): cedolini con le colonne di COLONNE_CEDOLINI,
+    f24 con un totale per committente e mese e la relativa scadenza.
+    """
+    P = parametri(anno)
+    anno = P.anno
+    df = _normalizza(pagamenti, anno)
+    df = df.iloc[np.argsort(df["mese"].to_numpy(), kind="stable")].reset_index(drop=True)
+    n = len(df)
+
+    codici, lavoratori = pd.factorize(df["lavoratore"])
+    cumulato = np.zeros(len(lavoratori))
+    if cumulati_iniziali:
+        cumulato += pd.Series(cumulati_iniziali, dtype=float).reindex(lavoratori).fillna(0.0).to_numpy()
+
+    importo = df["importo"].to_numpy(float)
+    assicurato = flag_colonna(df, "assicurato", gia_assicurato)
+    aliquota = np.where(assicurato, _aliquota_contributiva(P, "cococo", True),
+                        _aliquota_contributiva(P, "cococo", False))
+    # Ordinale del pagamento del lavoratore all'interno del mese.
+    ordinale = df.groupby([df["mese"], codici], sort=False).cumcount().to_numpy()
+
+    prima = np.empty(n)
+    dopo = np.empty(n)
+    mesi = df["mese"].to_numpy()
+    inizi = np.flatnonzero(np.r_[True, mesi[1:] != mesi[:-1]])
+    for inizio, fine in zip(inizi, np.r_[inizi[1:], n]):
+        righe = np.arange(inizio, fine)
+        # Un giro per ordinale: in ogni giro ogni lavoratore compare al più una
+        # volta, quindi l'aggiornamento dei cumulati è un'assegnazione vettoriale.
+        for k in range(int(ordinale[righe].max()) + 1):
+            sel = righe[ordinale[righe] == k]
+            w = codici[sel]
+            prima[sel] = cumulato[w]
+            dopo[sel] = cumulato[w] + importo[sel]
+            cumulato[w] = dopo[sel]
+
+    sf, sp = P["soglia_fiscale"], P["soglia_prev"]
+    eccedenza = np.maximum(0.0, dopo - sf) - np.maximum(0.0, prima - sf)
+    base = np.maximum(0.0, dopo - sp) - np.maximum(0.0, prima - sp)
+    contributi = base * aliquota
+    quota_lav = contributi * P["quota_lav_cococo"]
+    ritenuta = eccedenza * P["aliq_ritenuta_acconto"]
+
+    cedolini = pd.DataFrame({
+        "mese": mesi, "committente": df["committente"], "lavoratore": df["lavoratore"],
+        "importo": importo, "cumulato": dopo,
+        "base_contributiva": base, "contributi": contributi,
+        "quota_lav": quota_lav, "quota_comm": contributi * (1 - P["quota_lav_cococo"]),
+        "eccedenza_fiscale": eccedenza, "ritenuta": ritenuta,
+        "netto": importo - quota_lav - ritenuta,
+    }, columns=COLONNE_CEDOLINI)
+    return cedolini, riepilogo_f24(cedolini, anno)
+
+
+def riepilogo_f24(cedolini: pd.DataFrame, anno: int) -> pd.DataFrame:
+    """Totali da versare per committente e mese (INPS = quota lavoratore + committente)."""
+    f24 = (cedolini.groupby(["committente", "mese"], sort=True)
+           .agg(collaboratori=("lavoratore", "nunique"), compensi=("importo", "sum"),
+                inps_quota_lav=("quota_lav", "sum"), inps_quota_comm=("quota_comm", "sum"),
+                ritenute_irpef=("ritenuta", "sum"))
+           .reset_index())
+    for col in ("compensi", "inps_quota_lav", "inps_quota_comm", "ritenute_irpef"):
+        f24[col] = f24[col].round(2)
+    f24["inps_totale"] = (f24["inps_quota_lav"] + f24["inps_quota_comm"]).round(2)
+    f24["totale_f24"] = (f24["inps_totale"] + f24["ritenute_irpef"]).round(2)
+    scadenze = {m: scadenza_f24(anno, m) for m in range(1, 13)}
+    f24["scadenza"] = f24["mese"].map(scadenze)
+    return f24
+
+
+def leggi_pagamenti(sorgente, nome_file: str) -> pd.DataFrame:
+    """Legge il file dei pagamenti mensili con il lettore della rosa (CSV ',' o ';', Excel)."""
+    return leggi_rosa(sorgente, nome_file)
@@ -0,0 +1,127 @@
+"""
+Motori batch su un pool di processi, con input e risultati in memoria condivisa.
+
+Gli importi (e le opzioni per riga: flag, aliquote, riduzione IVS) sono
+copiati una volta in una matrice float64 in memoria condivisa; i risultati
+sono scritti dai processi in una seconda matrice, una riga per colonna del
+motore. Ogni processo riceve solo nomi e forme dei due segmenti e l'intervallo
+di righe da elaborare: nessun array passa per pickle, né in andata né in
+ritorno, e ogni blocco scrive nella propria fetta, quindi l'ordine delle righe
+è quello degli importi qualunque sia l'ordine di completamento.
+
+Le righe sono divise in blocchi di dimensioni uguali (±1 riga), circa
+BLOCCHI_PER_PROCESSO per processo: chi finisce prima prende il blocco
+successivo. Come in simulazione.py il pool nasce e muore con la chiamata (i
+processi vedono i parametri registrati in quel momento); sotto
+SOGLIA_PARALLELO l'avvio dei processi costa più di quanto rende e il motore
+gira nel processo corrente.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from multiprocessing.shared_memory import SharedMemory
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from motore import _as_array, calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import parametri
+
+MOTORI = {"piva": calcoli_avanzati_piva_batch, "cococo": calcola_cococo_batch}
+SOGLIA_PARALLELO = 200_000
+BLOCCHI_PER_PROCESSO = 4
+BLOCCO_MINIMO = 25_000
+
+
+def blocchi(n: int, processi: int, blocco: Optional[int] = None) -> list:
+    """Intervalli [inizio, fine) che coprono n righe, di dimensioni uguali (±1)."""
+    if blocco is not None:
+        numero = -(-n // max(int(blocco), 1))
+    else:
+        numero = min(processi * BLOCCHI_PER_PROCESSO, max(n // BLOCCO_MINIMO, 1))
+    numero = max(min(numero, n), 1)
+    confini = [n * i // numero for i in range(numero + 1)]
+    return list(zip(confini[:-1], confini[1:]))
+
+
+@contextmanager
+def _matrice_condivisa(forma: tuple):
+    """Matrice float64 in un nuovo segmento di memoria condivisa, rimosso all'uscita."""
+    memoria = SharedMemory(create=True, size=max(int(np.prod(forma)) * 8, 1))
+    try:
+        yield memoria.name, np.ndarray(forma, dtype=np.float64, buffer=memoria.buf)
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+
+def _elabora_blocco(regime: str, ingresso: tuple, uscita: tuple, per_riga: tuple,
+                    booleani: frozenset, scalari: dict, anno: int, inizio: int, fine: int) -> int:
+    """Nel processo figlio: righe [inizio, fine) lette da `ingresso`, scritte in `uscita`."""
+    memoria_in, memoria_out = SharedMemory(ingresso[0]), SharedMemory(uscita[0])
+    try:
+        x = np.ndarray(ingresso[1], dtype=np.float64, buffer=memoria_in.buf)
+        y = np.ndarray(uscita[1], dtype=np.float64, buffer=memoria_out.buf)
+        opzioni = {nome: x[j, inizio:fine].astype(bool) if nome in booleani else x[j, inizio:fine]
+                   for j, nome in enumerate(per_riga, start=1)}
+        risultati = MOTORI[regime](x[0, inizio:fine], **scalari, **opzioni, anno=anno)
+        for k, colonna in enumerate(risultati.columns):
+            y[k, inizio:fine] = risultati[colonna].to_numpy()
+        del x, y, opzioni, risultati
+    finally:
+        memoria_in.close()
+        memoria_out.close()
+    return fine - inizio
+
+
+@cronometra("parallelo.calcola_parallelo")
+def calcola_parallelo(regime: str, importi, anno: Optional[int] = None,
+                      processi: Optional[int] = None, blocco: Optional[int] = None,
+                      **opzioni) -> pd.DataFrame:
+    """
+    Come il motore batch del regime ("piva" o "cococo"), su più processi.
+
+    `opzioni` sono quelle del motore (apply_rivalsa, apply_bollo, aliquota_imp,
+    gia_assicurato, riduzione_ivs), scalari o array per riga. Restituisce lo
+    stesso DataFrame del motore, con le righe nell'ordine degli importi.
+    """
+    if regime not in MOTORI:
+        raise ValueError(f"Regime non valido: {regime!r} (usa 'piva' o 'cococo')")
+    index = importi.index if isinstance(importi, pd.Series) else None
+    x = _as_array(importi)
+    n = len(x)
+    anno = parametri(anno).anno
+    processi = processi or os.cpu_count() or 1
+    if processi == 1 or n < SOGLIA_PARALLELO:
+        return MOTORI[regime](importi, **opzioni, anno=anno)
+
+    scalari = {nome: v for nome, v in opzioni.items() if np.ndim(v) == 0}
+    per_riga = {nome: np.broadcast_to(np.asarray(v).reshape(-1), (n,))
+                for nome, v in opzioni.items() if np.ndim(v) > 0}
+    booleani = frozenset(nome for nome, v in per_riga.items() if v.dtype == bool)
+    campione = MOTORI[regime](x[:1], **scalari, **{nome: v[:1] for nome, v in per_riga.items()},
+                              anno=anno)
+    intervalli = blocchi(n, processi, blocco)
+
+    with _matrice_condivisa((1 + len(per_riga), n)) as (nome_in, ingresso), \
+            _matrice_condivisa((len(campione.columns), n)) as (nome_out, uscita):
+        ingresso[0] = x
+        for j, v in enumerate(per_riga.values(), start=1):
+            ingresso[j] = v
+        with ProcessPoolExecutor(max_workers=min(processi, len(intervalli))) as pool:
+            inizi, fini = zip(*intervalli)
+            elaborate = sum(pool.map(
+                _elabora_blocco, repeat(regime), repeat((nome_in, ingresso.shape)),
+                repeat((nome_out, uscita.shape)), repeat(tuple(per_riga)), repeat(booleani),
+                repeat(scalari), repeat(anno), inizi, fini))
+        if elaborate != n:
+            raise RuntimeError(f"Elaborate {elaborate:,} righe su {n:,}")
+        risultati = pd.DataFrame(np.array(uscita).T, columns=campione.columns, index=index)
+        del ingresso, uscita
+    for colonna, tipo in campione.dtypes.items():
+        if tipo != np.float64:
+            risultati[colonna] = risultati[colonna].astype(tipo)
+    return risultati
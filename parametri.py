@@ -0,0 +1,219 @@
+"""
+Registro dei parametri normativi per anno fiscale.
+
+Ogni anno ha un set di parametri immutabile (ParametriAnno) con gli scaglioni
+IRPEF già compilati in tabelle di imposta cumulata: l'IRPEF diventa una
+ricerca binaria più una moltiplicazione, anche in versione vettoriale.
+Per aggiungere un anno: definire il dizionario e registrarlo con registra_anno().
+"""
+import hashlib
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+import numpy as np
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARAMETRI 2025
+# Fonti: D.Lgs. 36/2021; INPS Circ. 27/2025; AdE CG 14/2025; L. 190/2014
+# ─────────────────────────────────────────────────────────────────────────────
+_PARAMS_2025 = {
+    # ── SOGLIE (art. 36 c.6 e art. 35 c.8-bis D.Lgs. 36/2021) ─────────────
+    "soglia_fiscale":        15_000.0,   # No-tax area fiscale (multi-committente, anno solare)
+    "soglia_prev":            5_000.0,   # Franchigia previdenziale INPS
+    "soglia_forfettario":    85_000.0,   # Max ricavi regime forfettario (L. 190/2014)
+
+    # ── RIDUZIONE IVS (art. 35 c.8-ter D.Lgs. 36/2021) ─────────────────────
+    # ATTENZIONE: scade il 31/12/2027. Verificare rinnovo.
+    "riduzione_ivs":          0.50,
+    "scadenza_riduzione_ivs": date(2027, 12, 31),
+
+    # ── ALIQUOTE PREVIDENZIALI GS (INPS Circ. 27/2025) ──────────────────────
+    # Co.co.co. sportivo non assicurato altrove:
+    #   IVS 25% applicata su BIC_IVS (= BIC_lorda × 50%)
+    #   Aggiuntive 2,03% (DIS-COLL 1,31% + maternità 0,50% + malattia 0,22%)
+    #   applicate sull'INTERA BIC_lorda (NO riduzione 50%)
+    "aliq_ivs_cococo":        0.25,
+    "aliq_add_cococo":        0.0203,
+    "quota_lav_cococo":       1/3,        # Ripartizione: 1/3 lavoratore, 2/3 committente
+    # Co.co.co. già assicurato/pensionato: IVS 24%
+    "aliq_ivs_cococo_assicurato": 0.24,
+
+    # Autonomo P.IVA sportivo non assicurato altrove:
+    #   IVS 25% su BIC_IVS (= BIC_lorda × 50%)
+    #   Aggiuntive 1,07% (malattia 0,22% + maternità 0,50% + ISCRO 0,35%)
+    #   applicate sull'INTERA BIC_lorda (NO riduzione 50%)
+    "aliq_ivs_piva":          0.25,
+    "aliq_add_piva":          0.0107,
+
+    # Massimale / minimale GS 2025 (INPS Circ. 27/2025)
+    "massimale_gs":         120_607.0,
+    "minimale_gs":           18_555.0,
+
+    # ── FISCO FORFETTARIO (L. 190/2014; AdE CG 14/2025) ─────────────────────
+    # NOTA AdE CG 14/2025: il coefficiente si applica ai compensi AL NETTO dei
+    # 15.000 € di esenzione, non all'intero fatturato.
+    # Formula corretta: reddito_lordo = (fatturato - soglia_fiscale) × coeff_redd
+    "coeff_redditivita":      0.78,       # ATECO 85.51.09 (ex 85.51.00)
+    "aliq_forfettario_ord":   0.15,       # Regime ordinario (> 5 anni)
+    "aliq_forfettario_new":   0.05,       # Nuova attività (primi 5 anni)
+
+    # ── IRPEF ORDINARIA – Scaglioni 2025 (TUIR art. 11, L. Bilancio 2025) ───
+    # Lista di tuple: (limite_superiore, aliquota)
+    # ultimo scaglione: limite = None (illimitato)
+    "scaglioni_irpef": [
+        (28_000.0, 0.23),
+        (50_000.0, 0.35),
+        (None,     0.43),
+    ],
+
+    # ── RITENUTA D'ACCONTO (art. 25 DPR 600/1973) ───────────────────────────
+    "aliq_ritenuta_acconto":  0.20,       # Applicata dal committente sull'eccedenza 15k
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARAMETRI 2026-2028
+# Solo le voci che cambiano rispetto all'anno precedente.
+# ─────────────────────────────────────────────────────────────────────────────
+_PARAMS_2026 = {
+    **_PARAMS_2025,
+    # ── IRPEF – L. Bilancio 2026: secondo scaglione dal 35% al 33% ──────────
+    "scaglioni_irpef": [
+        (28_000.0, 0.23),
+        (50_000.0, 0.33),
+        (None,     0.43),
+    ],
+    # Aliquote GS, massimale e minimale: valori 2025 in attesa della
+    # circolare INPS 2026. Verificare e aggiornare.
+}
+
+# 2027: ultimo anno della riduzione IVS 50% (scadenza 31/12/2027).
+_PARAMS_2027 = {**_PARAMS_2026}
+
+# 2028: la riduzione IVS risulta scaduta (salvo proroga): stessi parametri,
+# ma ParametriAnno.riduzione_attiva è False perché l'anno supera la scadenza.
+_PARAMS_2028 = {**_PARAMS_2027}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARAMETRI COMPILATI PER ANNO
+# ─────────────────────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class ParametriAnno:
+    """
+    Parametri di un anno fiscale, in sola lettura.
+
+    Si legge come un dizionario (`P["soglia_fiscale"]`). Gli scaglioni IRPEF
+    sono compilati in tre tuple parallele: limite inferiore, aliquota e
+    imposta già maturata al limite inferiore di ogni scaglione.
+    """
+    anno: int
+    valori: Mapping
+    limiti_irpef: tuple
+    aliquote_irpef: tuple
+    imposta_base_irpef: tuple
+
+    @classmethod
+    def compila(cls, anno: int, valori: dict) -> "ParametriAnno":
+        limiti, aliquote, basi = [], [], []
+        prev, imposta = 0.0, 0.0
+        for limite, aliq in valori["scaglioni_irpef"]:
+            limiti.append(prev)
+            aliquote.append(aliq)
+            basi.append(imposta)
+            if limite is None:
+                break
+            # Stesso ordine di somma del vecchio ciclo a scaglioni: risultati identici.
+            imposta += (limite - prev) * aliq
+            prev = limite
+        valori = dict(valori)
+        valori["scaglioni_irpef"] = tuple(valori["scaglioni_irpef"])
+        return cls(anno, MappingProxyType(valori), tuple(limiti), tuple(aliquote), tuple(basi))
+
+    def __getitem__(self, chiave):
+        return self.valori[chiave]
+
+    @property
+    def impronta(self) -> str:
+        """Hash breve dei valori: identifica il set di parametri anche tra processi diversi."""
+        testo = repr(sorted((k, repr(v)) for k, v in self.valori.items()))
+        return hashlib.sha256(f"{self.anno}:{testo}".encode()).hexdigest()[:12]
+
+    @property
+    def riduzione_attiva(self) -> bool:
+        """Riduzione 50% IVS in vigore per tutto l'anno fiscale."""
+        return date(self.anno, 12, 31) <= self.valori["scadenza_riduzione_ivs"]
+
+    @property
+    def riduzione(self) -> float:
+        """Moltiplicatore della base IVS (0,50 con riduzione attiva, altrimenti 1)."""
+        return self.valori["riduzione_ivs"] if self.riduzione_attiva else 1.0
+
+    def irpef(self, imponibile: float) -> float:
+        """IRPEF lorda a scaglioni: ricerca dello scaglione + un'operazione."""
+        if imponibile <= 0:
+            return 0.0
+        i = bisect_left(self.limiti_irpef, imponibile) - 1
+        return round(self.imposta_base_irpef[i]
+                     + (imponibile - self.limiti_irpef[i]) * self.aliquote_irpef[i], 2)
+
+    def irpef_batch(self, imponibili: np.ndarray) -> np.ndarray:
+        """Versione vettoriale di irpef() (senza arrotondamento, vedi motore._round2)."""
+        limiti = np.asarray(self.limiti_irpef)
+        i = np.maximum(np.searchsorted(limiti, imponibili, side="left") - 1, 0)
+        imposta = (np.asarray(self.imposta_base_irpef)[i]
+                   + (imponibili - limiti[i]) * np.asarray(self.aliquote_irpef)[i])
+        return np.where(imponibili <= 0, 0.0, imposta)
+
+
+_REGISTRO = {}
+_versione_registro = 0
+
+# Anno fiscale dei calcoli in cui `anno` non è indicato. Fisso (non l'anno
+# solare): una chiamata senza anno dà sempre gli stessi numeri.
+ANNO_PREDEFINITO = 2025
+
+
+def registra_anno(anno: int, valori: dict) -> ParametriAnno:
+    """Aggiunge (o sostituisce) i parametri di un anno fiscale."""
+    global _versione_registro
+    _REGISTRO[anno] = ParametriAnno.compila(anno, valori)
+    _versione_registro += 1
+    return _REGISTRO[anno]
+
+
+for _anno, _valori in ((2025, _PARAMS_2025), (2026, _PARAMS_2026),
+                       (2027, _PARAMS_2027), (2028, _PARAMS_2028)):
+    registra_anno(_anno, _valori)
+
+
+def anni_disponibili() -> list:
+    return sorted(_REGISTRO)
+
+
+def versione_registro() -> int:
+    """Contatore incrementato a ogni registra_anno (per invalidare le cache)."""
+    return _versione_registro
+
+
+def anno_corrente() -> int:
+    """
+    Anno solare in corso, limitato agli anni presenti nel registro.
+
+    Solo per la scelta proposta nell'interfaccia: i motori senza `anno` usano
+    ANNO_PREDEFINITO, così i risultati non cambiano con il calendario.
+    """
+    anni = anni_disponibili()
+    return min(max(date.today().year, anni[0]), anni[-1])
+
+
+def parametri(anno: Optional[int] = None) -> ParametriAnno:
+    """Parametri dell'anno fiscale indicato (default: ANNO_PREDEFINITO)."""
+    anno = ANNO_PREDEFINITO if anno is None else anno
+    try:
+        return _REGISTRO[anno]
+    except KeyError:
+        raise ValueError(f"Anno fiscale {anno} non configurato "
+                         f"(disponibili: {', '.join(map(str, anni_disponibili()))})") from None
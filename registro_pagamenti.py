@@ -0,0 +1,201 @@
+"""
+Registro incrementale dei pagamenti per lavoratore (criterio di cassa).
+
+Le soglie di €15.000 (fiscale) e €5.000 (previdenziale) e il limite di €85.000
+del forfettario sono cumulativi nell'anno solare su tutti i committenti. Il
+registro tiene per ogni lavoratore/anno solo i totali progressivi: ogni nuovo
+pagamento aggiorna soglie residue, ritenuta, contributi e margine forfettario
+in tempo costante, senza rielaborare l'anno.
+
+Il registro è append-only: gli eventi restano nell'ordine di arrivo e
+possono essere riprodotti (riproduci / riproduci_df) per verifiche e audit.
+"""
+from dataclasses import dataclass, field, asdict
+from datetime import date
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from parametri import parametri
+
+
+@dataclass(frozen=True, slots=True)
+class Pagamento:
+    """Un pagamento (incasso) ricevuto da un lavoratore sportivo."""
+    lavoratore: str
+    committente: str
+    data: date
+    importo: float
+    regime: str = "cococo"            # "piva" o "cococo"
+    gia_assicurato: bool = False
+
+
+@dataclass(slots=True)
+class StatoLavoratore:
+    """Totali progressivi di un lavoratore in un anno solare."""
+    cumulato: float = 0.0
+    ultima_data: date = date.min
+    per_committente: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class Movimento:
+    """Effetti fiscali e contributivi di un singolo pagamento."""
+    lavoratore: str
+    committente: str
+    data: date
+    regime: str
+    importo: float
+    cumulato: float
+    soglia_fiscale_residua: float
+    soglia_prev_residua: float
+    eccedenza_fiscale: float          # quota del pagamento oltre i €15.000
+    ritenuta: float                   # 20% sull'eccedenza (solo co.co.co.)
+    base_contributiva: float          # quota del pagamento oltre i €5.000
+    contributi: float
+    quota_lav: float
+    quota_comm: float
+    margine_forfettario: float
+    fuori_forfettario: bool
+
+
+def _aliquota_contributiva(P, regime: str, gia_assicurato: bool) -> float:
+    """Aliquota effettiva sulla base contributiva (IVS ridotta + aggiuntive)."""
+    if regime == "piva":
+        return P.riduzione * P["aliq_ivs_piva"] + P["aliq_add_piva"]
+    aliq_ivs = P["aliq_ivs_cococo_assicurato"] if gia_assicurato else P["aliq_ivs_cococo"]
+    return P.riduzione * aliq_ivs + P["aliq_add_cococo"]
+
+
+class RegistroPagamenti:
+    """Registro append-only dei pagamenti di molti lavoratori e committenti."""
+
+    def __init__(self):
+        self._stati: Dict[tuple, StatoLavoratore] = {}
+        self.eventi: List[Pagamento] = []
+
+    def stato(self, lavoratore: str, anno: int) -> StatoLavoratore:
+        return self._stati.get((lavoratore, anno)) or StatoLavoratore()
+
+    def registra(self, pagamento: Pagamento) -> Movimento:
+        """Aggiunge un pagamento e ne restituisce gli effetti (O(1))."""
+        if pagamento.importo < 0:
+            raise ValueError("Importo negativo: registrare uno storno come evento separato.")
+        anno = pagamento.data.year
+        P = parametri(anno)
+        chiave = (pagamento.lavoratore, anno)
+        stato = self._stati.get(chiave)
+        if stato is None:
+            stato = self._stati[chiave] = StatoLavoratore()
+        if pagamento.data < stato.ultima_data:
+            raise ValueError(f"Pagamento del {pagamento.data} anteriore all'ultimo registrato "
+                             f"per {pagamento.lavoratore} ({stato.ultima_data}): il registro "
+                             "è append-only in ordine di cassa.")
+
+        prima = stato.cumulato
+        dopo = prima + pagamento.importo
+        stato.cumulato = dopo
+        stato.ultima_data = pagamento.data
+        stato.per_committente[pagamento.committente] = (
+            stato.per_committente.get(pagamento.committente, 0.0) + pagamento.importo)
+        self.eventi.append(pagamento)
+
+        soglia_fiscale, soglia_prev = P["soglia_fiscale"], P["soglia_prev"]
+        eccedenza = max(0.0, dopo - soglia_fiscale) - max(0.0, prima - soglia_fiscale)
+        base = max(0.0, dopo - soglia_prev) - max(0.0, prima - soglia_prev)
+        contributi = base * _aliquota_contributiva(P, pagamento.regime, pagamento.gia_assicurato)
+        if pagamento.regime == "piva":
+            ritenuta, quota_lav, quota_comm = 0.0, contributi, 0.0
+        else:
+            ritenuta = eccedenza * P["aliq_ritenuta_acconto"]
+            quota_lav = contributi * P["quota_lav_cococo"]
+            quota_comm = contributi * (1 - P["quota_lav_cococo"])
+
+        return Movimento(
+            lavoratore=pagamento.lavoratore, committente=pagamento.committente,
+            data=pagamento.data, regime=pagamento.regime,
+            importo=pagamento.importo, cumulato=dopo,
+            soglia_fiscale_residua=max(0.0, soglia_fiscale - dopo),
+            soglia_prev_residua=max(0.0, soglia_prev - dopo),
+            eccedenza_fiscale=eccedenza, ritenuta=ritenuta,
+            base_contributiva=base, contributi=contributi,
+            quota_lav=quota_lav, quota_comm=quota_comm,
+            margine_forfettario=P["soglia_forfettario"] - dopo,
+            fuori_forfettario=pagamento.regime == "piva" and dopo > P["soglia_forfettario"],
+        )
+
+    @classmethod
+    def riproduci(cls, pagamenti: Iterable[Pagamento]):
+        """Ricostruisce un registro da un flusso di pagamenti: (registro, movimenti)."""
+        registro = cls()
+        movimenti = [registro.registra(p) for p in pagamenti]
+        return registro, movimenti
+
+
+def riproduci_df(pagamenti: pd.DataFrame) -> pd.DataFrame:
+    """
+    Riproduzione vettoriale di un flusso di pagamenti (per audit su grandi volumi).
+
+    `pagamenti` ha le colonne di Pagamento, già in ordine di arrivo. I cumulati
+    sono somme progressive per lavoratore/anno (stesso ordine di somma del
+    registro incrementale): i risultati coincidono con quelli di registra().
+    """
+    df = pagamenti.reset_index(drop=True)
+    n = len(df)
+    anni = pd.to_datetime(df["data"]).dt.year.to_numpy()
+    importo = df["importo"].to_numpy(float)
+    regime = df["regime"].to_numpy() if "regime" in df else np.full(n, "cococo")
+    assicurato = (df["gia_assicurato"].to_numpy(bool) if "gia_assicurato" in df
+                  else np.zeros(n, bool))
+    # Somme progressive per gruppo con np.cumsum (somma sequenziale, come il
+    # registro incrementale; il cumsum di groupby pandas usa Kahan e può
+    # differire di un ulp).
+    codici = pd.MultiIndex.from_arrays([df["lavoratore"].to_numpy(), anni]).codes
+    gruppo = codici[0].astype(np.int64) * (int(codici[1].max(initial=0)) + 1) + codici[1]
+    ordine = np.argsort(gruppo, kind="stable")
+    confini = np.flatnonzero(np.diff(gruppo[ordine])) + 1
+    dopo = np.empty(n)
+    prima = np.empty(n)
+    for righe in np.split(ordine, confini):
+        cumulati = np.cumsum(importo[righe])
+        dopo[righe] = cumulati
+        prima[righe] = np.concatenate(([0.0], cumulati[:-1]))
+
+    colonne = {k: np.zeros(n) for k in (
+        "soglia_fiscale_residua", "soglia_prev_residua", "eccedenza_fiscale", "ritenuta",
+        "base_contributiva", "contributi", "quota_lav", "quota_comm", "margine_forfettario")}
+    fuori = np.zeros(n, bool)
+    for anno in np.unique(anni):
+        P = parametri(int(anno))
+        m = anni == anno
+        sf, sp = P["soglia_fiscale"], P["soglia_prev"]
+        eccedenza = np.maximum(0.0, dopo[m] - sf) - np.maximum(0.0, prima[m] - sf)
+        base = np.maximum(0.0, dopo[m] - sp) - np.maximum(0.0, prima[m] - sp)
+        piva = regime[m] == "piva"
+        aliq = np.where(piva, _aliquota_contributiva(P, "piva", False),
+                        np.where(assicurato[m], _aliquota_contributiva(P, "cococo", True),
+                                 _aliquota_contributiva(P, "cococo", False)))
+        contributi = base * aliq
+        colonne["soglia_fiscale_residua"][m] = np.maximum(0.0, sf - dopo[m])
+        colonne["soglia_prev_residua"][m] = np.maximum(0.0, sp - dopo[m])
+        colonne["eccedenza_fiscale"][m] = eccedenza
+        colonne["ritenuta"][m] = np.where(piva, 0.0, eccedenza * P["aliq_ritenuta_acconto"])
+        colonne["base_contributiva"][m] = base
+        colonne["contributi"][m] = contributi
+        colonne["quota_lav"][m] = np.where(piva, contributi, contributi * P["quota_lav_cococo"])
+        colonne["quota_comm"][m] = np.where(piva, 0.0,
+                                            contributi * (1 - P["quota_lav_cococo"]))
+        colonne["margine_forfettario"][m] = P["soglia_forfettario"] - dopo[m]
+        fuori[m] = piva & (dopo[m] > P["soglia_forfettario"])
+
+    return pd.DataFrame({
+        "lavoratore": df["lavoratore"], "committente": df["committente"],
+        "data": df["data"], "regime": regime, "importo": importo, "cumulato": dopo,
+        **colonne, "fuori_forfettario": fuori,
+    })
+
+
+def movimenti_df(movimenti: Iterable[Movimento]) -> pd.DataFrame:
+    """Movimenti del registro incrementale in forma tabellare."""
+    return pd.DataFrame([asdict(m) for m in movimenti])
@@ -0,0 +1,295 @@
+"""
+Import di rose (CSV / Excel) ed elaborazione a blocchi con i motori batch.
+
+Il file viene letto un blocco alla volta, ogni blocco passa per i motori
+P.IVA / co.co.co. vettoriali e i risultati sono scritti subito su un file CSV
+di destinazione: in memoria resta solo il blocco corrente, più i totali.
+
+Colonne riconosciute (maiuscole/minuscole indifferenti):
+    nome, importo, regime (piva / cococo), rivalsa, bollo, aliquota, assicurato
+Solo `importo` è obbligatoria; le altre hanno i default passati al chiamante.
+"""
+import csv
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from motore import PARAMS, calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import parametri
+
+DIMENSIONE_BLOCCO = 20_000
+
+COLONNE_OUTPUT = [
+    "nome", "regime", "importo", "fatturato", "inps_lavoratore", "imposte",
+    "netto", "costo_committente", "fuori_forfettario",
+]
+
+_SINONIMI = {
+    "nominativo": "nome", "collaboratore": "nome", "atleta": "nome",
+    "compenso": "importo", "lordo": "importo",
+    "gia_assicurato": "assicurato", "già assicurato": "assicurato",
+}
+
+_VERO = {"1", "true", "vero", "si", "sì", "s", "x", "y", "yes"}
+
+
+def rinomina_colonne(df: pd.DataFrame, sinonimi: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Intestazioni in minuscolo e sinonimi ai nomi canonici (sul posto).
+
+    `sinonimi` aggiunge (o sostituisce) voci a quelli della rosa, per i file
+    con colonne proprie come le paghe.
+    """
+    mappa = {**_SINONIMI, **(sinonimi or {})}
+    nomi = [str(c).strip().lower() for c in df.columns]
+    df.columns = [mappa.get(c, c) for c in nomi]
+    return df
+
+
+def _normalizza_colonne(df: pd.DataFrame) -> pd.DataFrame:
+    df = rinomina_colonne(df)
+    if "importo" not in df.columns:
+        raise ValueError("Il file deve contenere una colonna 'importo' (o 'compenso'/'lordo').")
+    return df
+
+
+def flag_colonna(df: pd.DataFrame, colonna: str, default: bool) -> np.ndarray:
+    """Flag per riga da una colonna sì/no (`default` se la colonna manca)."""
+    if colonna not in df.columns:
+        return np.full(len(df), default)
+    valori = df[colonna]
+    if valori.dtype == bool:
+        return valori.to_numpy()
+    return valori.astype(str).str.strip().str.lower().isin(_VERO).to_numpy()
+
+
+def _regime(df: pd.DataFrame, default: str) -> np.ndarray:
+    if "regime" not in df.columns:
+        return np.full(len(df), default == "cococo")
+    valori = df["regime"].astype(str).str.lower().str.replace(r"[\s.]", "", regex=True)
+    return valori.str.startswith("coco").to_numpy()
+
+
+def _valori_aliquota(df: pd.DataFrame) -> np.ndarray:
+    valori = pd.to_numeric(df["aliquota"], errors="coerce").to_numpy(float)
+    indicati = valori[~np.isnan(valori)]
+    if ((indicati < 0) | (indicati > 100)).any():
+        raise ValueError("Colonna 'aliquota' con valori negativi o maggiori di 100.")
+    return valori
+
+
+def unita_aliquote(df: pd.DataFrame, unita: Optional[str] = None) -> Optional[str]:
+    """
+    Unità della colonna `aliquota`: "percentuale" (15, 5), "frazione" (0.15, 0.05) o None.
+
+    `unita` è quella già stabilita da altre righe dello stesso file: righe
+    che la contraddicono, o che mescolano percentuali e frazioni, fanno
+    rifiutare il file. None se né `df` (nessun valore, o solo 0 e 1) né
+    `unita` la determinano.
+    """
+    if "aliquota" not in df.columns:
+        return unita
+    valori = _valori_aliquota(df)
+    percentuali = (valori > 1).any() or unita == "percentuale"
+    frazioni = ((valori > 0) & (valori < 1)).any() or unita == "frazione"
+    if percentuali and frazioni:
+        raise ValueError("Colonna 'aliquota' con percentuali (15) e frazioni (0.15) "
+                         "mescolate: usare una sola unità.")
+    return "percentuale" if percentuali else "frazione" if frazioni else None
+
+
+def aliquote_colonna(df: pd.DataFrame, default: float,
+                     unita: Optional[str] = None) -> np.ndarray:
+    """
+    Aliquota d'imposta per riga dalla colonna `aliquota` (`default` se manca o è vuota).
+
+    L'unità vale per tutta la colonna (vedi unita_aliquote); per un blocco di
+    un file si passa in `unita` quella dell'intero file. Un 1 senza unità
+    stabilita (1% o 100%?) è ambiguo e fa rifiutare il file.
+    """
+    if "aliquota" not in df.columns:
+        return np.full(len(df), default)
+    unita = unita_aliquote(df, unita)
+    valori = _valori_aliquota(df)
+    if unita == "percentuale":
+        valori = valori / 100
+    elif unita is None and (valori == 1).any():
+        raise ValueError("Colonna 'aliquota' ambigua: 1 può essere 1% o 100%. "
+                         "Scrivere le aliquote in percentuale (1, 5, 15) o in frazione (0.01).")
+    return np.where(np.isnan(valori), default, valori)
+
+
+def _importi(df: pd.DataFrame) -> np.ndarray:
+    colonna = df["importo"]
+    if colonna.dtype.kind not in "if":
+        colonna = colonna.astype(str).str.replace(",", ".", regex=False)
+    importi = pd.to_numeric(colonna, errors="coerce").to_numpy(float)
+    if np.isnan(importi).any() or (importi < 0).any():
+        raise ValueError("Colonna 'importo' con valori mancanti, negativi o non numerici.")
+    return importi
+
+
+def calcola_blocco(df: pd.DataFrame, rivalsa=True, bollo=True,
+                   aliquota=PARAMS["aliq_forfettario_new"], assicurato=False,
+                   regime="piva", anno=None, unita_aliquota=None) -> pd.DataFrame:
+    """
+    Calcola un blocco di rosa restituendo le colonne di COLONNE_OUTPUT.
+
+    `unita_aliquota`: unità della colonna aliquota dell'intero file
+    (unita_aliquote_file), se il blocco ne fa parte.
+    """
+    df = _normalizza_colonne(df)
+    importi = _importi(df)
+    cococo = _regime(df, regime)
+    nomi = df["nome"].astype(str).to_numpy() if "nome" in df.columns else np.full(len(df), "")
+
+    out = pd.DataFrame({
+        "nome": nomi,
+        "regime": np.where(cococo, "cococo", "piva"),
+        "importo": importi,
+    })
+    for col in COLONNE_OUTPUT[3:]:
+        out[col] = 0.0
+    out["fuori_forfettario"] = False
+
+    piva = ~cococo
+    if piva.any():
+        res = calcoli_avanzati_piva_batch(
+            importi[piva], flag_colonna(df, "rivalsa", rivalsa)[piva],
+            flag_colonna(df, "bollo", bollo)[piva], aliquote_colonna(df, aliquota, unita_aliquota)[piva], anno=anno)
+        out.loc[piva, "fatturato"] = res["fatturato"].to_numpy()
+        out.loc[piva, "inps_lavoratore"] = res["inps"].to_numpy()
+        out.loc[piva, "imposte"] = res["tasse"].to_numpy()
+        out.loc[piva, "netto"] = res["netto"].to_numpy()
+        out.loc[piva, "costo_committente"] = res["fatturato"].to_numpy()
+        soglia = parametri(anno)["soglia_forfettario"]
+        out.loc[piva, "fuori_forfettario"] = res["fatturato"].to_numpy() > soglia
+    if cococo.any():
+        res = calcola_cococo_batch(importi[cococo], flag_colonna(df, "assicurato", assicurato)[cococo],
+                                   anno=anno)
+        out.loc[cococo, "fatturato"] = res["lordo"].to_numpy()
+        out.loc[cococo, "inps_lavoratore"] = res["quota_lav"].to_numpy()
+        out.loc[cococo, "imposte"] = res["irpef_lorda"].to_numpy()
+        out.loc[cococo, "netto"] = res["netto"].to_numpy()
+        out.loc[cococo, "costo_committente"] = res["costo_committente"].to_numpy()
+    return out
+
+
+def leggi_a_blocchi(sorgente, nome_file: str, dimensione: int = DIMENSIONE_BLOCCO):
+    """
+    Restituisce (iteratore di DataFrame, righe_totali_stimate).
+
+    CSV: lettore a blocchi di pandas (separatore ',' o ';' rilevato).
+    Excel: openpyxl in sola lettura, righe materializzate un blocco alla volta.
+    Le righe totali servono solo per la barra di avanzamento (None se ignote).
+    """
+    if nome_file.lower().endswith((".xlsx", ".xlsm")):
+        return _leggi_excel(sorgente, dimensione)
+    return _leggi_csv(sorgente, dimensione), None
+
+
+def leggi_rosa(sorgente, nome_file: str) -> pd.DataFrame:
+    """Intera rosa in un DataFrame, con lo stesso lettore (CSV o Excel) di leggi_a_blocchi."""
+    blocchi, _ = leggi_a_blocchi(sorgente, nome_file)
+    blocchi = list(blocchi)
+    if not blocchi:
+        raise ValueError("Il file non contiene righe.")
+    return pd.concat(blocchi, ignore_index=True)
+
+
+def unita_aliquote_file(sorgente, nome_file: str) -> Optional[str]:
+    """
+    Unità della colonna `aliquota` su tutto il file (vedi unita_aliquote), poi riavvolge.
+
+    Una passata in più prima dell'elaborazione a blocchi: così l'unità non
+    dipende da dove cadono i confini dei blocchi. Del CSV si legge la sola
+    colonna aliquota.
+    """
+    unita = None
+    try:
+        if nome_file.lower().endswith((".xlsx", ".xlsm")):
+            blocchi, _ = _leggi_excel(sorgente, DIMENSIONE_BLOCCO)
+        else:
+            blocchi = _leggi_csv(sorgente, DIMENSIONE_BLOCCO,
+                                 colonne=lambda c: str(c).strip().lower() == "aliquota")
+        for blocco in blocchi:
+            blocco.columns = [str(c).strip().lower() for c in blocco.columns]
+            unita = unita_aliquote(blocco, unita)
+    finally:
+        sorgente.seek(0)
+    return unita
+
+
+def _leggi_csv(sorgente, dimensione, colonne=None):
+    inizio = sorgente.read(4096)
+    sorgente.seek(0)
+    if isinstance(inizio, bytes):
+        inizio = inizio.decode("utf-8", errors="ignore")
+    riga = inizio.splitlines()[0] if inizio else ""
+    sep = ";" if riga.count(";") > riga.count(",") else ","
+    yield from pd.read_csv(sorgente, sep=sep, chunksize=dimensione, usecols=colonne,
+                           decimal="," if sep == ";" else ".")
+
+
+def _leggi_excel(sorgente, dimensione):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(sorgente, read_only=True, data_only=True)
+    ws = wb.active
+    righe_totali = max((ws.max_row or 1) - 1, 0) or None
+
+    def blocchi():
+        try:
+            righe = ws.iter_rows(values_only=True)
+            intestazione = [str(c) for c in next(righe)]
+            blocco = []
+            for riga in righe:
+                if all(v is None for v in riga):
+                    continue
+                blocco.append(riga)
+                if len(blocco) == dimensione:
+                    yield pd.DataFrame(blocco, columns=intestazione)
+                    blocco = []
+            if blocco:
+                yield pd.DataFrame(blocco, columns=intestazione)
+        finally:
+            wb.close()
+
+    return blocchi(), righe_totali
+
+
+def elabora_roster(sorgente, nome_file: str, destinazione, on_progress=None, **opzioni) -> dict:
+    """
+    Elabora l'intera rosa scrivendo i risultati CSV su `destinazione` (file di testo).
+
+    `on_progress(frazione)` viene chiamata dopo ogni blocco (frazione in [0, 1]).
+    Restituisce i totali: righe, per regime, netto e costo committente complessivi.
+    """
+    dimensione_file = getattr(sorgente, "size", None)
+    unita = unita_aliquote_file(sorgente, nome_file)   # una sola unità per tutto il file
+    blocchi, righe_totali = leggi_a_blocchi(sorgente, nome_file)
+    writer = csv.writer(destinazione)
+    writer.writerow(COLONNE_OUTPUT)
+    totali = {"righe": 0, "piva": 0, "cococo": 0, "netto": 0.0,
+              "costo_committente": 0.0, "fuori_forfettario": 0}
+    for blocco in blocchi:
+        out = calcola_blocco(blocco, unita_aliquota=unita, **opzioni)
+        cococo = (out["regime"] == "cococo").to_numpy()
+        totali["righe"] += len(out)
+        totali["cococo"] += int(cococo.sum())
+        totali["piva"] += int((~cococo).sum())
+        totali["netto"] += float(out["netto"].sum())
+        totali["costo_committente"] += float(out["costo_committente"].sum())
+        totali["fuori_forfettario"] += int(out["fuori_forfettario"].sum())
+        importi = out[COLONNE_OUTPUT[2:8]].to_numpy().round(2)
+        writer.writerows(zip(out["nome"].tolist(), out["regime"].tolist(),
+                             *importi.T.tolist(), out["fuori_forfettario"].tolist()))
+        if on_progress:
+            if righe_totali:
+                on_progress(min(totali["righe"] / righe_totali, 1.0))
+            elif dimensione_file and hasattr(sorgente, "tell"):
+                on_progress(min(sorgente.tell() / dimensione_file, 1.0))
+    if on_progress:
+        on_progress(1.0)
+    return totali
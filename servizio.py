@@ -0,0 +1,270 @@
+"""
+Servizio HTTP locale dei motori di calcolo (Starlette + uvicorn, senza login).
+
+Espone gli stessi motori della pagina Streamlit ai gestionali paghe, senza
+rieseguire script, CSS e login a ogni richiesta. Le richieste singole usano
+i motori scalari con la cache condivisa (cache.py); i batch usano i motori
+vettoriali e, con "stream": true, restituiscono JSON Lines a blocchi
+(chunked), così la risposta parte subito e la memoria resta limitata.
+
+Endpoint (POST, corpo JSON; opzioni facoltative: rivalsa, bollo, assicurato
+come true/false, aliquota in frazione tra 0 e 1, anno):
+    /piva               {"compenso": 20000}
+    /piva/batch         {"importi": [...], "stream": false}
+    /cococo             {"lordo": 20000}
+    /cococo/batch       {"importi": [...]}
+    /inverso            {"regime": "piva", "campo": "netto", "target": 15000}
+    /inverso/batch      {"regime": "cococo", "campo": "netto", "target": [...]}
+    /confronto          {"importo": 20000}
+    /confronto/batch    {"importi": [...]}
+    /confronto/incroci  {}
+GET /salute, GET /cache, GET /metriche (testo Prometheus; tempi registrati
+solo con SIMULATORE_METRICHE=1; anche su file con SIMULATORE_PROMETHEUS_FILE)
+
+Avvio:  python servizio.py [--host 127.0.0.1] [--porta 8502]
+"""
+import argparse
+import json
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import cache
+import metriche
+from confronto import punti_incrocio, valuta
+from motore import PARAMS, calcolo_inverso, calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import anni_disponibili
+
+BLOCCO_STREAM = 10_000
+MAX_BATCH = 5_000_000
+
+
+class RichiestaNonValida(ValueError):
+    pass
+
+
+def _booleano(corpo: dict, campo: str) -> bool:
+    """Flag JSON: true/false, o le stringhe "true"/"false"; altro è un errore."""
+    valore = corpo.get(campo, False)
+    if isinstance(valore, bool):
+        return valore
+    if isinstance(valore, str) and valore.strip().lower() in ("true", "false"):
+        return valore.strip().lower() == "true"
+    raise RichiestaNonValida(f"{campo!r} deve essere true o false, non {valore!r}")
+
+
+def _aliquota(corpo: dict) -> float:
+    """Aliquota d'imposta in frazione (0.05, 0.15): 5 o 15 sarebbero il 500% e il 1500%."""
+    aliquota = float(corpo.get("aliquota", PARAMS["aliq_forfettario_new"]))
+    if not 0 <= aliquota <= 1:
+        raise RichiestaNonValida(f"'aliquota' deve essere una frazione tra 0 e 1 (es. 0.15), "
+                                 f"non {aliquota!r}")
+    return aliquota
+
+
+def _opzioni(corpo: dict) -> dict:
+    anno = corpo.get("anno")
+    if anno is not None and anno not in anni_disponibili():
+        raise RichiestaNonValida(f"Anno non disponibile: {anno} "
+                                 f"(disponibili: {', '.join(map(str, anni_disponibili()))})")
+    return {
+        "rivalsa": _booleano(corpo, "rivalsa"),
+        "bollo": _booleano(corpo, "bollo"),
+        "aliquota": _aliquota(corpo),
+        "assicurato": _booleano(corpo, "assicurato"),
+        "anno": anno,
+    }
+
+
+def _numero(corpo: dict, campo: str) -> float:
+    if campo not in corpo:
+        raise RichiestaNonValida(f"Campo obbligatorio mancante: {campo!r}")
+    valore = float(corpo[campo])
+    if not np.isfinite(valore) or valore < 0:
+        raise RichiestaNonValida(f"{campo!r} deve essere un numero non negativo")
+    return valore
+
+
+def _vettore(corpo: dict, campo: str) -> np.ndarray:
+    if not isinstance(corpo.get(campo), list):
+        raise RichiestaNonValida(f"{campo!r} deve essere una lista di importi")
+    if len(corpo[campo]) > MAX_BATCH:
+        raise RichiestaNonValida(f"Batch troppo grande (massimo {MAX_BATCH:,} importi)")
+    valori = np.asarray(corpo[campo], dtype=float)
+    if not np.isfinite(valori).all() or (valori < 0).any():
+        raise RichiestaNonValida(f"{campo!r} contiene valori negativi o non numerici")
+    return valori
+
+
+def _json(df, righe: bool = False) -> str:
+    """Record JSON (o JSON Lines) a piena precisione, come le risposte singole."""
+    testo = df.to_json(orient="records", lines=righe, double_precision=15)
+    return testo.rstrip("\n") + "\n" if righe else testo
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MOTORI BATCH: (importi, corpo, opzioni) -> DataFrame
+# ─────────────────────────────────────────────────────────────────────────────
+def _piva_batch(importi, corpo, o):
+    return calcoli_avanzati_piva_batch(importi, o["rivalsa"], o["bollo"], o["aliquota"],
+                                       anno=o["anno"])
+
+
+def _cococo_batch(importi, corpo, o):
+    return calcola_cococo_batch(importi, o["assicurato"], anno=o["anno"])
+
+
+def _inverso_batch(target, corpo, o):
+    regime = corpo.get("regime")
+    importi = calcolo_inverso(regime, corpo.get("campo", "netto"), target,
+                              apply_rivalsa=o["rivalsa"], aliquota_imp=o["aliquota"],
+                              gia_assicurato=o["assicurato"], anno=o["anno"])
+    motore = _piva_batch if regime == "piva" else _cococo_batch
+    return motore(importi, corpo, o)
+
+
+def _confronto_batch(importi, corpo, o):
+    return valuta(importi, o["aliquota"], o["assicurato"], anno=o["anno"])
+
+
+def _risposta_batch(motore, campo: str):
+    async def endpoint(request: Request):
+        corpo = await _corpo(request)
+        valori = _vettore(corpo, campo)
+        o = _opzioni(corpo)
+        if _booleano(corpo, "stream"):
+            # Convalida sul primo blocco prima di aprire lo stream: gli errori
+            # dei parametri arrivano ancora come 400 e non a risposta iniziata.
+            primo = await run_in_threadpool(motore, valori[:BLOCCO_STREAM], corpo, o)
+
+            def blocchi():
+                yield _json(primo, righe=True)
+                for inizio in range(BLOCCO_STREAM, len(valori), BLOCCO_STREAM):
+                    df = motore(valori[inizio:inizio + BLOCCO_STREAM], corpo, o)
+                    yield _json(df, righe=True)
+
+            return StreamingResponse(blocchi(), media_type="application/x-ndjson")
+        df = await run_in_threadpool(motore, valori, corpo, o)
+        return Response(_json(df), media_type="application/json")
+    return endpoint
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RICHIESTE SINGOLE: motori scalari con cache condivisa
+# ─────────────────────────────────────────────────────────────────────────────
+# I calcoli girano nel pool di thread (run_in_threadpool), come i batch: un
+# calcolo lungo (inverso, incroci) non ferma il ciclo degli eventi.
+async def _corpo(request: Request) -> dict:
+    try:
+        corpo = json.loads(await request.body() or b"{}")
+    except json.JSONDecodeError as e:
+        raise RichiestaNonValida(f"JSON non valido: {e}") from None
+    if not isinstance(corpo, dict):
+        raise RichiestaNonValida("Il corpo deve essere un oggetto JSON")
+    return corpo
+
+
+async def piva(request: Request):
+    corpo = await _corpo(request)
+    o = _opzioni(corpo)
+    res = await run_in_threadpool(cache.calcoli_avanzati_piva, _numero(corpo, "compenso"),
+                                  o["rivalsa"], o["bollo"], o["aliquota"], anno=o["anno"])
+    return JSONResponse(dict(res))
+
+
+async def cococo(request: Request):
+    corpo = await _corpo(request)
+    o = _opzioni(corpo)
+    res = await run_in_threadpool(cache.calcola_cococo, _numero(corpo, "lordo"), o["assicurato"],
+                                  anno=o["anno"])
+    return JSONResponse(dict(res))
+
+
+def _inverso(regime, campo, target, o):
+    importo = calcolo_inverso(regime, campo, target,
+                              apply_rivalsa=o["rivalsa"], aliquota_imp=o["aliquota"],
+                              gia_assicurato=o["assicurato"], anno=o["anno"])
+    if regime == "piva":
+        return cache.calcoli_avanzati_piva(importo, o["rivalsa"], o["bollo"], o["aliquota"],
+                                           anno=o["anno"])
+    return cache.calcola_cococo(importo, o["assicurato"], anno=o["anno"])
+
+
+async def inverso(request: Request):
+    corpo = await _corpo(request)
+    o = _opzioni(corpo)
+    res = await run_in_threadpool(_inverso, corpo.get("regime"), corpo.get("campo", "netto"),
+                                  _numero(corpo, "target"), o)
+    return JSONResponse(dict(res))
+
+
+async def confronto(request: Request):
+    corpo = await _corpo(request)
+    o = _opzioni(corpo)
+    df = await run_in_threadpool(valuta, [_numero(corpo, "importo")], o["aliquota"],
+                                 o["assicurato"], anno=o["anno"])
+    return JSONResponse({k: float(v) for k, v in df.iloc[0].items()})
+
+
+async def incroci(request: Request):
+    corpo = await _corpo(request)
+    o = _opzioni(corpo)
+    df = await run_in_threadpool(punti_incrocio, o["aliquota"], o["assicurato"], anno=o["anno"],
+                                 massimo=corpo.get("massimo"))
+    return Response(_json(df), media_type="application/json")
+
+
+async def salute(request: Request):
+    return JSONResponse({"stato": "ok", "anni": list(anni_disponibili())})
+
+
+async def statistiche_cache(request: Request):
+    return JSONResponse(cache.CACHE.statistiche())
+
+
+async def esporta_metriche(request: Request):
+    return Response(metriche.esporta_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def _errore(request: Request, exc: Exception):
+    return JSONResponse({"errore": str(exc)}, status_code=400)
+
+
+app = Starlette(
+    routes=[
+        Route("/salute", salute),
+        Route("/cache", statistiche_cache),
+        Route("/metriche", esporta_metriche),
+        Route("/piva", piva, methods=["POST"]),
+        Route("/piva/batch", _risposta_batch(_piva_batch, "importi"), methods=["POST"]),
+        Route("/cococo", cococo, methods=["POST"]),
+        Route("/cococo/batch", _risposta_batch(_cococo_batch, "importi"), methods=["POST"]),
+        Route("/inverso", inverso, methods=["POST"]),
+        Route("/inverso/batch", _risposta_batch(_inverso_batch, "target"), methods=["POST"]),
+        Route("/confronto", confronto, methods=["POST"]),
+        Route("/confronto/batch", _risposta_batch(_confronto_batch, "importi"), methods=["POST"]),
+        Route("/confronto/incroci", incroci, methods=["POST"]),
+    ],
+    # ValueError copre RichiestaNonValida e gli errori dei motori (regime,
+    # campo o anno non validi); TypeError i campi JSON del tipo sbagliato.
+    exception_handlers={ValueError: _errore, TypeError: _errore},
+)
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servizio HTTP locale dei motori di calcolo.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    args = parser.parse_args(argv)
+    metriche.avvia_scrittura_periodica()    # solo con SIMULATORE_PROMETHEUS_FILE
+    uvicorn.run(app, host=args.host, port=args.porta, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Simulazione Monte Carlo del reddito annuo di un lavoratore sportivo.
+
+Il compenso di ogni committente è estratto da una distribuzione scelta
+dall'utente (con probabilità che il contratto si concretizzi e un bonus
+eventuale); la somma dei compensi passa per i motori vettoriali dei due
+regimi. Come nella tab Confronto, la stessa cifra è il compenso base della
+P.IVA (senza rivalsa né bollo) e il lordo del co.co.co.; le soglie sono
+cumulative sull'anno, quindi i motori ricevono il totale dei committenti.
+Nel co.co.co. la quota contributiva del committente è ripartita tra i club
+in proporzione al compenso di ciascuno.
+
+Gli scenari sono elaborati a blocchi di BLOCCO_SCENARI e, oltre
+SOGLIA_PARALLELO, distribuiti su un pool di processi. Ogni blocco ha un seme
+figlio di SeedSequence(seme): a parità di seme il risultato è identico,
+qualunque sia il numero di processi.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from motore import calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import parametri
+
+BLOCCO_SCENARI = 200_000
+SOGLIA_PARALLELO = 500_000    # sotto questa soglia il pool costa più di quanto rende
+MASSIMO_SCENARI = 10_000_000
+DISTRIBUZIONI = ("fisso", "normale", "lognormale", "uniforme", "triangolare")
+QUANTILI = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+@dataclass(frozen=True, slots=True)
+class Committente:
+    """
+    Compenso annuo atteso da un committente.
+
+    normale / lognormale: `media` e `deviazione` del compenso;
+    uniforme: tra `minimo` e `massimo`; triangolare: `minimo`, moda `media`,
+    `massimo`; fisso: `media`. Con probabilità `probabilita` il contratto si
+    concretizza, con `probabilita_bonus` si aggiunge `bonus`.
+    """
+    nome: str
+    distribuzione: str = "normale"
+    media: float = 0.0
+    deviazione: float = 0.0
+    minimo: float = 0.0
+    massimo: float = 0.0
+    probabilita: float = 1.0
+    bonus: float = 0.0
+    probabilita_bonus: float = 0.0
+
+    def verifica(self) -> None:
+        if self.distribuzione not in DISTRIBUZIONI:
+            raise ValueError(f"{self.nome}: distribuzione {self.distribuzione!r} non prevista "
+                             f"({', '.join(DISTRIBUZIONI)})")
+        if self.media < 0 or self.deviazione < 0 or self.bonus < 0:
+            raise ValueError(f"{self.nome}: media, deviazione e bonus non possono essere negativi")
+        if not (0 <= self.probabilita <= 1 and 0 <= self.probabilita_bonus <= 1):
+            raise ValueError(f"{self.nome}: le probabilità devono essere tra 0 e 1")
+        if self.distribuzione in ("uniforme", "triangolare") and not self.minimo <= self.massimo:
+            raise ValueError(f"{self.nome}: minimo maggiore del massimo")
+        if self.distribuzione == "triangolare" and not self.minimo <= self.media <= self.massimo:
+            raise ValueError(f"{self.nome}: la moda (media) deve stare tra minimo e massimo")
+
+    def estrai(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        d = self.distribuzione
+        if d == "fisso":
+            x = np.full(n, self.media)
+        elif d == "normale":
+            x = rng.normal(self.media, self.deviazione, n)
+        elif d == "lognormale":
+            if self.media == 0:
+                x = np.zeros(n)
+            else:
+                sigma2 = np.log1p((self.deviazione / self.media) ** 2)
+                x = rng.lognormal(np.log(self.media) - sigma2 / 2, np.sqrt(sigma2), n)
+        elif d == "uniforme":
+            x = rng.uniform(self.minimo, self.massimo, n)
+        elif self.minimo == self.massimo:
+            x = np.full(n, self.minimo)
+        else:
+            x = rng.triangular(self.minimo, self.media, self.massimo, n)
+        if self.probabilita < 1:
+            x = np.where(rng.random(n) < self.probabilita, x, 0.0)
+        if self.probabilita_bonus > 0:
+            x = x + np.where(rng.random(n) < self.probabilita_bonus, self.bonus, 0.0)
+        return np.maximum(x, 0.0)
+
+
+def _simula_blocco(seme: np.random.SeedSequence, n: int, committenti: tuple,
+                   aliquota_imp: float, gia_assicurato: bool, anno: Optional[int]) -> dict:
+    """Un blocco di `n` scenari: netti per regime, ricavi e costi per committente."""
+    rng = np.random.default_rng(seme)
+    compensi = np.column_stack([c.estrai(rng, n) for c in committenti])
+    totale = compensi.sum(axis=1)
+    piva = calcoli_avanzati_piva_batch(totale, False, False, aliquota_imp, anno=anno)
+    dip = calcola_cococo_batch(totale, gia_assicurato, anno=anno)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        quote = np.where(totale[:, None] > 0, compensi / totale[:, None], 0.0)
+    costo_cococo = compensi + quote * dip["quota_comm"].to_numpy()[:, None]
+    return {
+        "netto_piva":   piva["netto"].to_numpy(),
+        "netto_cococo": dip["netto"].to_numpy(),
+        "ricavi":       piva["fatturato"].to_numpy(),
+        "compenso_sum":     compensi.sum(axis=0),
+        "costo_cococo_sum": costo_cococo.sum(axis=0),
+    }
+
+
+def _argomenti(committenti, n, blocco, seme, *altri):
+    semi = np.random.SeedSequence(seme).spawn(-(-n // blocco))
+    for i, s in enumerate(semi):
+        yield (s, min(blocco, n - i * blocco), committenti) + altri
+
+
+@cronometra("simulazione.simula")
+def simula(committenti: List[Committente], scenari: int = 100_000, aliquota_imp: float = 0.05,
+           gia_assicurato: bool = False, anno: Optional[int] = None, seme: int = 0,
+           processi: Optional[int] = None, on_progress=None,
+           blocco: int = BLOCCO_SCENARI) -> dict:
+    """
+    Esegue `scenari` estrazioni e le valuta in entrambi i regimi.
+
+    Restituisce un dict con i netti per scenario (`netto_piva`,
+    `netto_cococo`), la probabilità di superare la soglia del forfettario,
+    la quota di scenari in cui la P.IVA rende di più e, in `committenti`,
+    compenso e costo atteso per club nei due regimi.
+    """
+    committenti = tuple(committenti)
+    if not committenti:
+        raise ValueError("Indicare almeno un committente")
+    for c in committenti:
+        c.verifica()
+    scenari = int(scenari)
+    if not 1 <= scenari <= MASSIMO_SCENARI:
+        raise ValueError(f"Numero di scenari tra 1 e {MASSIMO_SCENARI:,}")
+    P = parametri(anno)
+
+    netto_piva = np.empty(scenari)
+    netto_cococo = np.empty(scenari)
+    sopra_soglia = 0
+    somme = {k: np.zeros(len(committenti))
+             for k in ("compenso_sum", "costo_cococo_sum")}
+    argomenti = list(zip(*_argomenti(committenti, scenari, blocco, seme,
+                                     aliquota_imp, gia_assicurato, P.anno)))
+    processi = processi or os.cpu_count() or 1
+    if processi > 1 and scenari >= SOGLIA_PARALLELO:
+        pool = ProcessPoolExecutor(max_workers=min(processi, len(argomenti[0])))
+        risultati = pool.map(_simula_blocco, *argomenti)
+    else:
+        pool = None
+        risultati = map(_simula_blocco, *argomenti)
+    try:
+        inizio = 0
+        for r in risultati:
+            fine = inizio + len(r["netto_piva"])
+            netto_piva[inizio:fine] = r["netto_piva"]
+            netto_cococo[inizio:fine] = r["netto_cococo"]
+            sopra_soglia += int(np.count_nonzero(r["ricavi"] > P["soglia_forfettario"]))
+            for k in somme:
+                somme[k] += r[k]
+            inizio = fine
+            if on_progress:
+                on_progress(fine / scenari)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    per_committente = pd.DataFrame({
+        "committente":        [c.nome for c in committenti],
+        "compenso_medio":     somme["compenso_sum"] / scenari,
+        "costo_medio_piva":   somme["compenso_sum"] / scenari,
+        "costo_medio_cococo": somme["costo_cococo_sum"] / scenari,
+    })
+    return {
+        "scenari":            scenari,
+        "seme":               seme,
+        "anno":               P.anno,
+        "netto_piva":         netto_piva,
+        "netto_cococo":       netto_cococo,
+        "prob_sopra_soglia":  sopra_soglia / scenari,
+        "prob_piva_migliore": float(np.mean(netto_piva >= netto_cococo)),
+        "committenti":        per_committente,
+    }
+
+
+def riepilogo_simulazione(risultato: dict) -> pd.DataFrame:
+    """Media, deviazione standard e quantili del netto nei due regimi."""
+    righe = {}
+    for regime, chiave in (("P.IVA forfettaria", "netto_piva"), ("Co.co.co.", "netto_cococo")):
+        x = risultato[chiave]
+        q = np.quantile(x, QUANTILI)
+        righe[regime] = {"media": x.mean(), "dev_std": x.std(),
+                         **{f"p{int(p * 100)}": v for p, v in zip(QUANTILI, q)}}
+    return pd.DataFrame(righe).T
+
+
+def istogramma(risultato: dict, classi: int = 60) -> pd.DataFrame:
+    """Frequenze del netto per regime su classi comuni (per il grafico)."""
+    a, b = risultato["netto_piva"], risultato["netto_cococo"]
+    estremi = np.histogram_bin_edges(np.concatenate(([a.min(), a.max()], [b.min(), b.max()])),
+                                     bins=classi)
+    centri = (estremi[:-1] + estremi[1:]) / 2
+    return pd.concat([
+        pd.DataFrame({"netto": centri, "quota": np.histogram(x, estremi)[0] / len(x),
+                      "regime": regime})
+        for regime, x in (("P.IVA forfettaria", a), ("Co.co.co.", b))
+    ], ignore_index=True)
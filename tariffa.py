@@ -0,0 +1,348 @@
+"""
+Modello tariffario compilato: ogni grandezza dei motori come funzione lineare
+a tratti dell'importo di input, con punti di rottura esatti.
+
+Per un set di parametri e una combinazione di flag, compila_modello()
+ripercorre le formule dei motori batch con un'algebra di funzioni lineari a
+tratti (somme, prodotti per costanti, max(0, …), gradino del bollo,
+composizione con la curva IRPEF): i punti di rottura emergono dalle formule
+stesse (soglie previdenziale e fiscale, limiti degli scaglioni IRPEF, soglia
+del bollo €77,47, azzeramenti dei max(0, …), compreso quello del saldo IRPEF)
+e non vanno elencati a mano.
+
+Il modello tiene, per ogni tratto, pendenza e intercetta di ogni colonna:
+valutare un array di importi è una searchsorted sui nodi più una
+moltiplicazione-somma per colonna. L'IRPEF del co.co.co. è poi arrotondata
+al centesimo come nel motore, e netto e saldo sono corretti di conseguenza.
+
+Ogni modello è confrontato con i motori batch su nodi e punti intermedi al
+momento della compilazione (verifica_modello): uno scarto oltre TOLLERANZA
+solleva RuntimeError. I modelli sono in cache per flag, anno e versione del
+registro parametri.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from metriche import cronometra
+from motore import _as_array, _round2, calcoli_avanzati_piva_batch, calcola_cococo_batch
+from parametri import parametri, versione_registro
+
+TOLLERANZA = 1e-6
+SOGLIA_BOLLO = 77.47
+# Colonne del co.co.co. che dipendono dall'IRPEF arrotondata al centesimo: un
+# arrotondamento "a metà" può cadere diversamente di un centesimo.
+_ARROTONDATE = frozenset({"irpef_lorda", "saldo_irpef", "netto"})
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ALGEBRA DELLE FUNZIONI LINEARI A TRATTI
+# ─────────────────────────────────────────────────────────────────────────────
+class _Tratti:
+    """
+    Funzione lineare a tratti su [0, ∞): sul tratto i, da nodi[i] al nodo
+    successivo (l'ultimo è illimitato), vale a[i]·x + b[i].
+    """
+    __slots__ = ("nodi", "a", "b")
+
+    def __init__(self, nodi, a, b):
+        self.nodi = np.asarray(nodi, dtype=float)
+        self.a = np.asarray(a, dtype=float)
+        self.b = np.asarray(b, dtype=float)
+
+    @classmethod
+    def retta(cls, a: float, b: float = 0.0) -> "_Tratti":
+        return cls([0.0], [a], [b])
+
+    def _su(self, nodi: np.ndarray) -> tuple:
+        """Coefficienti sui tratti che iniziano in `nodi` (un raffinamento dei propri)."""
+        i = np.searchsorted(self.nodi, nodi, side="right") - 1
+        return self.a[i], self.b[i]
+
+    def _interni(self, nodi: np.ndarray) -> np.ndarray:
+        """Un punto interno a ogni tratto (il punto medio; nodo + 1 per l'ultimo)."""
+        return np.append((nodi[:-1] + nodi[1:]) / 2, nodi[-1] + 1.0)
+
+    def valuta(self, x) -> np.ndarray:
+        i = np.maximum(np.searchsorted(self.nodi, x, side="left") - 1, 0)
+        return self.a[i] * x + self.b[i]
+
+    def _radici(self, livello: float = 0.0) -> np.ndarray:
+        """Ascisse interne ai tratti in cui la funzione vale `livello`."""
+        con_pendenza = self.a != 0
+        r = np.full(len(self.a), np.nan)
+        r[con_pendenza] = (livello - self.b[con_pendenza]) / self.a[con_pendenza]
+        fine = np.append(self.nodi[1:], np.inf)
+        return r[(r > self.nodi) & (r < fine)]
+
+    def _con_nodi(self, extra) -> "_Tratti":
+        nodi = np.union1d(self.nodi, extra)
+        return _Tratti(nodi, *self._su(nodi))
+
+    def semplifica(self) -> "_Tratti":
+        """Unisce i tratti consecutivi con gli stessi coefficienti."""
+        uguali = (np.isclose(self.a[1:], self.a[:-1], rtol=1e-12, atol=1e-15)
+                  & np.isclose(self.b[1:], self.b[:-1], rtol=1e-12, atol=1e-9))
+        tieni = np.concatenate(([True], ~uguali))
+        return _Tratti(self.nodi[tieni], self.a[tieni], self.b[tieni])
+
+    def __add__(self, altra):
+        if not isinstance(altra, _Tratti):
+            return _Tratti(self.nodi, self.a, self.b + altra)
+        nodi = np.union1d(self.nodi, altra.nodi)
+        (a1, b1), (a2, b2) = self._su(nodi), altra._su(nodi)
+        return _Tratti(nodi, a1 + a2, b1 + b2)
+
+    __radd__ = __add__
+
+    def __mul__(self, k: float):
+        return _Tratti(self.nodi, self.a * k, self.b * k)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return self * -1.0
+
+    def __sub__(self, altra):
+        return self + (-altra)
+
+    def positiva(self) -> "_Tratti":
+        """max(0, f): nuovi nodi dove f cambia segno."""
+        f = self._con_nodi(self._radici())
+        negativi = f.valuta(self._interni(f.nodi)) < 0
+        return _Tratti(f.nodi, np.where(negativi, 0.0, f.a), np.where(negativi, 0.0, f.b)).semplifica()
+
+    def gradino(self, soglia: float, valore: float) -> "_Tratti":
+        """`valore` dove f > soglia, altrimenti 0 (come np.where(f > soglia, valore, 0))."""
+        f = self._con_nodi(self._radici(soglia))
+        sopra = f.valuta(self._interni(f.nodi)) > soglia
+        return _Tratti(f.nodi, np.zeros(len(f.nodi)), np.where(sopra, valore, 0.0)).semplifica()
+
+    def componi(self, interna: "_Tratti") -> "_Tratti":
+        """self(interna(x)), con `interna` non decrescente."""
+        radici = [interna._radici(livello) for livello in self.nodi[1:]]
+        g = interna._con_nodi(np.concatenate([interna.nodi, *radici]))
+        j = np.searchsorted(self.nodi, g.valuta(g._interni(g.nodi)), side="right") - 1
+        j = np.maximum(j, 0)
+        return _Tratti(g.nodi, self.a[j] * g.a, self.a[j] * g.b + self.b[j]).semplifica()
+
+
+def _curva_irpef(P) -> _Tratti:
+    """IRPEF lorda (non arrotondata) in funzione dell'imponibile."""
+    limiti = np.asarray(P.limiti_irpef)
+    aliquote = np.asarray(P.aliquote_irpef)
+    return _Tratti(limiti, aliquote, np.asarray(P.imposta_base_irpef) - aliquote * limiti)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FORMULE DEI MOTORI (stesso ordine dei motori batch)
+# ─────────────────────────────────────────────────────────────────────────────
+def _formule_piva(P, apply_rivalsa: bool, apply_bollo: bool, aliquota_imp: float) -> dict:
+    compenso = _Tratti.retta(1.0)
+    rivalsa = compenso * 0.04 if apply_rivalsa else _Tratti.retta(0.0)
+    fatturato = compenso + rivalsa
+    BIC_lorda = (fatturato - P["soglia_prev"]).positiva()
+    BIC_IVS = BIC_lorda * P.riduzione
+    contrib_IVS = BIC_IVS * P["aliq_ivs_piva"]
+    contrib_add = BIC_lorda * P["aliq_add_piva"]
+    inps = contrib_IVS + contrib_add
+    componenti_pos = (fatturato - P["soglia_fiscale"]).positiva()
+    reddito_forf = componenti_pos * P["coeff_redditivita"]
+    imponibile_forf = (reddito_forf - inps).positiva()
+    tasse = imponibile_forf * aliquota_imp
+    bollo = fatturato.gradino(SOGLIA_BOLLO, 2.0) if apply_bollo else _Tratti.retta(0.0)
+    netto = fatturato - inps - tasse
+    return {
+        "compenso": compenso, "rivalsa": rivalsa, "fatturato": fatturato,
+        "BIC_lorda": BIC_lorda, "BIC_IVS": BIC_IVS, "contrib_IVS": contrib_IVS,
+        "contrib_add": contrib_add, "inps": inps, "componenti_pos": componenti_pos,
+        "reddito_forf": reddito_forf, "imponibile_forf": imponibile_forf, "tasse": tasse,
+        "bollo": bollo, "netto": netto,
+    }
+
+
+def _formule_cococo(P, gia_assicurato: bool) -> dict:
+    aliq_ivs = P["aliq_ivs_cococo_assicurato"] if gia_assicurato else P["aliq_ivs_cococo"]
+    lordo = _Tratti.retta(1.0)
+    BIC_lorda = (lordo - P["soglia_prev"]).positiva()
+    BIC_IVS = BIC_lorda * P.riduzione
+    contrib_IVS = BIC_IVS * aliq_ivs
+    contrib_add = BIC_lorda * P["aliq_add_cococo"]
+    contrib_tot = contrib_IVS + contrib_add
+    quota_lav = contrib_tot * P["quota_lav_cococo"]
+    quota_comm = contrib_tot * (1 - P["quota_lav_cococo"])
+    imponibile_irpef = (lordo - P["soglia_fiscale"] - quota_lav).positiva()
+    ritenuta_acconto = (lordo - P["soglia_fiscale"]).positiva() * P["aliq_ritenuta_acconto"]
+    irpef_lorda = _curva_irpef(P).componi(imponibile_irpef)
+    saldo_irpef = (irpef_lorda - ritenuta_acconto).positiva()
+    return {
+        "lordo": lordo, "BIC_lorda": BIC_lorda, "BIC_IVS": BIC_IVS,
+        "contrib_IVS": contrib_IVS, "contrib_add": contrib_add, "contrib_tot": contrib_tot,
+        "quota_lav": quota_lav, "quota_comm": quota_comm,
+        "imponibile_irpef": imponibile_irpef, "ritenuta_acconto": ritenuta_acconto,
+        "irpef_lorda": irpef_lorda, "saldo_irpef": saldo_irpef,
+        "netto": lordo - quota_lav - irpef_lorda, "costo_committente": lordo + quota_comm,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MODELLO COMPILATO
+# ─────────────────────────────────────────────────────────────────────────────
+@dataclass(frozen=True, slots=True)
+class ModelloTariffa:
+    """
+    Tutte le colonne di un motore come tabelle di tratti su nodi comuni.
+
+    `nodi[i]` è l'inizio del tratto i (nodi[0] = 0, l'ultimo tratto è
+    illimitato); `pendenze` e `intercette` hanno una riga per colonna e una
+    colonna per tratto. Gli array sono in sola lettura.
+    """
+    regime: str
+    anno: int
+    opzioni: tuple
+    riduzione_attiva: bool
+    colonne: tuple
+    nodi: np.ndarray
+    pendenze: np.ndarray
+    intercette: np.ndarray
+
+    def tratti(self, importi) -> np.ndarray:
+        """Indice del tratto di ogni importo (un importo su un nodo sta nel tratto precedente)."""
+        # Pochi nodi: contare quelli superati costa meno di searchsorted.
+        x = _as_array(importi)
+        i = np.zeros(x.shape, dtype=np.intp)
+        for nodo in self.nodi[1:]:
+            i += x > nodo
+        return i
+
+    def _colonna(self, c: int, x: np.ndarray, i: np.ndarray, out: np.ndarray) -> None:
+        """pendenza[tratto]·x + intercetta[tratto] in `out`; niente gather se il coefficiente è unico."""
+        pendenze, intercette = self.pendenze[c], self.intercette[c]
+        if (pendenze == pendenze[0]).all():
+            np.multiply(x, pendenze[0], out=out)
+        else:
+            np.take(pendenze, i, out=out)
+            out *= x
+        if (intercette == intercette[0]).all():
+            if intercette[0]:
+                out += intercette[0]
+        else:
+            out += intercette[i]
+
+    @cronometra("tariffa.valuta")
+    def valuta(self, importi, colonne=None) -> pd.DataFrame:
+        """
+        Stesse colonne (e stesso indice, per una Series) del motore batch del regime.
+
+        Con `colonne` calcola solo quelle indicate (senza riduzione_attiva): il
+        costo è proporzionale alle colonne richieste.
+        """
+        index = importi.index if isinstance(importi, pd.Series) else None
+        x = _as_array(importi)
+        i = self.tratti(x)
+        posizione = {nome: k for k, nome in enumerate(self.colonne)}
+        scelte = list(self.colonne) if colonne is None else list(colonne)
+        if self.regime == "cococo" and _ARROTONDATE.intersection(scelte):
+            # Come nel motore: IRPEF al centesimo, netto e saldo dall'IRPEF arrotondata.
+            necessarie = dict.fromkeys([*scelte, "irpef_lorda", "ritenuta_acconto"])
+        else:
+            necessarie = dict.fromkeys(scelte)
+        valori = np.empty((len(necessarie), len(x)))
+        righe = {}
+        for k, nome in enumerate(necessarie):
+            self._colonna(posizione[nome], x, i, valori[k])
+            righe[nome] = valori[k]
+        if "irpef_lorda" in righe:
+            irpef = _round2(righe["irpef_lorda"])
+            if "netto" in righe:
+                righe["netto"] += righe["irpef_lorda"] - irpef
+            if "saldo_irpef" in righe:
+                np.maximum(irpef - righe["ritenuta_acconto"], 0.0, out=righe["saldo_irpef"])
+            righe["irpef_lorda"][:] = irpef
+        df = pd.DataFrame(valori.T, columns=list(necessarie), index=index, copy=False)
+        if colonne is not None:
+            return df[scelte] if len(scelte) < len(necessarie) else df
+        df["riduzione_attiva"] = self.riduzione_attiva
+        return df
+
+    def segmenti(self) -> pd.DataFrame:
+        """Un tratto per riga: estremi e, per colonna, pendenza e intercetta."""
+        fine = np.append(self.nodi[1:], np.inf)
+        coeff = pd.DataFrame(
+            np.column_stack([np.stack([p, q], axis=1) for p, q in zip(self.pendenze, self.intercette)]),
+            columns=pd.MultiIndex.from_product([self.colonne, ("pendenza", "intercetta")]))
+        estremi = pd.DataFrame({("da", ""): self.nodi, ("a", ""): fine})
+        return pd.concat([estremi, coeff], axis=1)
+
+
+def _riferimento(regime: str, opzioni: dict, anno: int, importi: np.ndarray) -> pd.DataFrame:
+    if regime == "piva":
+        return calcoli_avanzati_piva_batch(importi, opzioni["apply_rivalsa"], opzioni["apply_bollo"],
+                                           opzioni["aliquota_imp"], anno=anno)
+    return calcola_cococo_batch(importi, opzioni["gia_assicurato"], anno=anno)
+
+
+def verifica_modello(modello: ModelloTariffa, importi=None) -> pd.Series:
+    """
+    Scarto massimo, per colonna, tra modello e motore batch di riferimento.
+
+    Senza `importi` usa nodi, punti medi dei tratti e importi oltre l'ultimo nodo.
+    """
+    if importi is None:
+        nodi = modello.nodi
+        importi = np.concatenate([nodi, (nodi[:-1] + nodi[1:]) / 2,
+                                  nodi[-1] + np.array([0.01, 1.0, 1e3, 1e5, 1e6])])
+    importi = _as_array(importi)
+    atteso = _riferimento(modello.regime, dict(modello.opzioni), modello.anno, importi)
+    ottenuto = modello.valuta(importi)
+    colonne = list(modello.colonne)
+    return (ottenuto[colonne] - atteso[colonne]).abs().max()
+
+
+@lru_cache(maxsize=256)
+def _compila(regime: str, opzioni: tuple, anno: int, versione: int) -> ModelloTariffa:
+    P = parametri(anno)
+    if regime == "piva":
+        formule = _formule_piva(P, **dict(opzioni))
+    else:
+        formule = _formule_cococo(P, **dict(opzioni))
+    nodi = np.unique(np.concatenate([f.semplifica().nodi for f in formule.values()]))
+    coefficienti = [f._su(nodi) for f in formule.values()]
+    pendenze = np.array([a for a, _ in coefficienti])
+    intercette = np.array([b for _, b in coefficienti])
+    for arr in (nodi, pendenze, intercette):
+        arr.setflags(write=False)
+    modello = ModelloTariffa(regime, P.anno, opzioni, P.riduzione_attiva, tuple(formule),
+                             nodi, pendenze, intercette)
+
+    scarti = verifica_modello(modello)
+    limite = pd.Series(TOLLERANZA, index=scarti.index)
+    if regime == "cococo":
+        limite[list(_ARROTONDATE)] += 0.01
+    if (scarti > limite).any():
+        raise RuntimeError(f"Modello {regime} {dict(opzioni)} {P.anno} non coerente col motore: "
+                           f"{scarti[scarti > limite].to_dict()}")
+    return modello
+
+
+def compila_modello(regime: str, apply_rivalsa: bool = False, apply_bollo: bool = False,
+                    aliquota_imp: float = 0.05, gia_assicurato: bool = False,
+                    anno: Optional[int] = None) -> ModelloTariffa:
+    """
+    Modello compilato del regime ("piva" o "cococo") per i flag indicati.
+
+    Per la P.IVA contano rivalsa, bollo e aliquota; per il co.co.co. solo
+    `gia_assicurato`. In cache: ricompilato solo se cambiano flag, anno o
+    parametri (registra_anno).
+    """
+    if regime == "piva":
+        opzioni = (("apply_rivalsa", bool(apply_rivalsa)), ("apply_bollo", bool(apply_bollo)),
+                   ("aliquota_imp", float(aliquota_imp)))
+    elif regime == "cococo":
+        opzioni = (("gia_assicurato", bool(gia_assicurato)),)
+    else:
+        raise ValueError(f"Regime non valido: {regime!r} (usa 'piva' o 'cococo')")
+    return _compila(regime, opzioni, parametri(anno).anno, versione_registro())